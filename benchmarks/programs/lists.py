@@ -0,0 +1,52 @@
+def make_samples(n: int) -> list[float]:
+    samples: list[float] = []
+
+    for i in range(n):
+        samples.append((i % 97) * 0.5)
+
+    return samples
+
+
+def scale(samples: list[float], factor: float) -> None:
+    for i in range(len(samples)):
+        samples[i] = samples[i] * factor
+
+
+def total(samples: list[float]) -> float:
+    s = 0.0
+
+    for x in samples:
+        s += x
+
+    return s
+
+
+def prefix_sums(values: list[int]) -> list[int]:
+    sums: list[int] = [0]
+
+    for x in values:
+        sums.append(sums[-1] + x)
+
+    return sums
+
+
+def main() -> int:
+    checksum = 0
+
+    for n in range(500000, 500001):
+        samples = make_samples(n)
+
+        for round in range(40):
+            scale(samples, 1.0001)
+            if total(samples[round:]) > 12020000.0:
+                checksum += round
+
+        values = [n % 7, n % 11, n % 13]
+
+        for _ in range(18):
+            values.extend(values)
+
+        sums = prefix_sums(values)
+        checksum += sums[-1] % 1000
+
+    return checksum % 256
@@ -0,0 +1,23 @@
+def escape_time(cr: float, ci: float, limit: int) -> int:
+    zr = 0.0
+    zi = 0.0
+    i = 0
+
+    while i < limit and zr * zr + zi * zi <= 4.0:
+        next_zr = zr * zr - zi * zi + cr
+        zi = 2.0 * zr * zi + ci
+        zr = next_zr
+        i += 1
+
+    return i
+
+
+def main() -> int:
+    size = 300
+    total = 0
+
+    for y in range(size):
+        for x in range(size):
+            total += escape_time(2.5 * x / size - 2.0, 2.5 * y / size - 1.25, 100)
+
+    return total % 256
@@ -0,0 +1,50 @@
+def count_primes(limit: int) -> int:
+    count = 0
+
+    for n in range(2, limit):
+        is_prime = True
+        d = 2
+
+        while d * d <= n:
+            if n % d == 0:
+                is_prime = False
+                break
+            d += 1
+
+        if is_prime:
+            count += 1
+
+    return count
+
+
+def sum_of_squares(n: int) -> int:
+    total = 0
+
+    for i in range(n):
+        total = (total + i * i) % 1000003
+
+    return total
+
+
+def as_float(x: int) -> float:
+    return x
+
+
+def square(x: float) -> float:
+    return x * x
+
+
+def main() -> int:
+    checksum = count_primes(300000) + sum_of_squares(3000000)
+
+    # small calls are inlined, and must still convert their int arguments and results
+    # to float
+    for k in range(1):
+        big = 3037000500 + k
+        ratio = as_float(k + 3)
+        ratio = ratio / 2
+
+        if square(big) > 9.2e18 and ratio == 1.5:
+            checksum += 1
+
+    return checksum % 256
@@ -0,0 +1,24 @@
+def fib(n: int) -> int:
+    if n < 2:
+        return n
+
+    return fib(n - 1) + fib(n - 2)
+
+
+def tak(x: int, y: int, z: int) -> int:
+    if y < x:
+        return tak(tak(x - 1, y, z), tak(y - 1, z, x), tak(z - 1, x, y))
+
+    return z
+
+
+def main() -> int:
+    total = 0
+
+    for n in range(24, 31):
+        total += fib(n)
+
+    for x in range(18, 22):
+        total += tak(x, 12, 6)
+
+    return total % 256
@@ -0,0 +1,41 @@
+def label(prefix: str, i: int) -> str:
+    if i % 3 == 0:
+        return prefix + "-fizz"
+
+    if i % 5 == 0:
+        return prefix + "-buzz"
+
+    return prefix + "-" + prefix
+
+
+def tail_label(prefix: str, rounds: int) -> int:
+    n = 0
+    tail = ""
+
+    for i in range(rounds):
+        n += len(prefix + "-")
+    else:
+        # built after the temporaries of the loop are released, and still used once
+        # other strings have been built
+        tail = prefix + "-tail"
+
+    other = "0123456789012345678901234567890123456789" + prefix
+
+    return n + len(other) if tail == "item-tail" else 0
+
+
+def main() -> int:
+    total = 0
+
+    for i in range(2000000):
+        name = label("item", i) + "." + "txt"
+
+        if name == "item-fizz.txt":
+            total += 1
+
+        total += len(name)
+
+    for rounds in range(3, 4):
+        total += tail_label("item", rounds)
+
+    return total % 256
@@ -0,0 +1,31 @@
+import math
+
+
+def integrate_cos(samples: int) -> float:
+    step = 1.5707963267948966 / samples
+    total = 0.0
+
+    for i in range(samples):
+        total += math.cos((i + 0.5) * step) * step
+
+    return total
+
+
+def count_above(samples: int, threshold: float) -> int:
+    count = 0
+
+    for i in range(samples):
+        if math.cos(i * 0.001) > threshold:
+            count += 1
+
+    return count
+
+
+def main() -> int:
+    integral = integrate_cos(2000000)
+
+    # the integral of cos over [0, pi/2] is 1
+    if integral < 0.999999 or integral > 1.000001:
+        return 255
+
+    return count_above(2000000, 0.5) % 251
@@ -0,0 +1,350 @@
+"""
+Runs the programs in benchmarks/programs as Pyrite executables, at several optimization
+levels, and with CPython, recording the run time, executable size and peak memory of
+each. Every program defines main() -> int, and its exit status must be the same in
+both implementations. Since calls to pure functions with constant arguments are
+evaluated at compile time (see pyrite.folding), programs derive the inputs of their
+workloads from loop variables rather than passing literals.
+
+Usage:
+    python benchmarks/run.py [program ...] [-O 0,2,3] [--repeat 5]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.1]
+
+Results are written as JSON with --output. A results file saved earlier can be passed
+as --baseline, in which case the run times are compared against it, and the script
+exits with status 1 if any program became slower than the baseline by more than
+--tolerance (a fraction).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+ROOT_PATH = Path(__file__).parent.parent
+PYRITE_PATH = ROOT_PATH.joinpath("pyrite.py")
+PROGRAMS_PATH = Path(__file__).parent.joinpath("programs")
+
+sys.path.insert(0, ROOT_PATH.as_posix())
+from pyrite.globals import COMPILER_VERSION
+
+# Runs the program given as its first argument with CPython, exiting with the status
+# returned by its main function, as a Pyrite executable does
+CPYTHON_DRIVER = "import runpy, sys; sys.exit(runpy.run_path(sys.argv[1])['main']())"
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class _PeakMemorySampler:
+    """
+    Samples the peak resident memory (VmHWM) of a running process on Linux. The
+    ru_maxrss reported by wait4 cannot be used there, since it includes the memory of
+    this process at the time it spawned the child. Peaks reached within the last
+    SAMPLE_INTERVAL seconds of the process's life may be missed.
+    """
+
+    SAMPLE_INTERVAL = 0.001
+
+    _path: str
+    _peak: Optional[int]
+    _stopped: threading.Event
+    _thread: threading.Thread
+
+    def __init__(self, pid: int):
+        self._path = "/proc/{}/status".format(pid)
+        self._peak = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                with open(self._path) as fl:
+                    lines = [line for line in fl if line.startswith("VmHWM:")]
+            except OSError:
+                return
+
+            # an exited process no longer reports its memory
+            if not lines:
+                return
+
+            self._peak = int(lines[0].split()[1])
+            self._stopped.wait(self.SAMPLE_INTERVAL)
+
+    def stop(self) -> Optional[int]:
+        """
+        Stop sampling, returning the peak memory in kilobytes, if it was sampled at all
+        """
+
+        self._stopped.set()
+        self._thread.join()
+
+        return self._peak
+
+
+def _run_measured(args: list[str]) -> tuple[float, int, Optional[int]]:
+    """
+    Run [args], returning its wall time in seconds, its exit status and its peak
+    resident memory in kilobytes, if it could be measured
+    """
+
+    started = time.perf_counter()
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+
+    if sys.platform.startswith("linux"):
+        sampler = _PeakMemorySampler(process.pid)
+        status = process.wait()
+        elapsed = time.perf_counter() - started
+
+        return (elapsed, status, sampler.stop())
+
+    if not hasattr(os, "wait4"):
+        # Windows
+        status = process.wait()
+        return (time.perf_counter() - started, status, None)
+
+    _, wait_status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    # in bytes on macOS
+    return (elapsed, process.returncode, usage.ru_maxrss // 1024)
+
+
+def _measure(args: list[str], repeat: int) -> dict:
+    """
+    Run [args] [repeat] times, keeping the fastest run time and the largest peak memory
+    """
+
+    runs = [_run_measured(args) for _ in range(repeat)]
+    statuses = {status for _, status, _ in runs}
+
+    if len(statuses) != 1:
+        raise BenchmarkError("exit status varies between runs: {}".format(sorted(statuses)))
+
+    memory = [max_rss for _, _, max_rss in runs if max_rss is not None]
+
+    return {
+        "time": min(elapsed for elapsed, _, _ in runs),
+        "exit_status": statuses.pop(),
+        "max_rss_kb": max(memory) if memory else None
+    }
+
+
+def _compile(program: Path, opt_level: str, work_directory: str) -> tuple[str, float]:
+    """
+    Build [program] with Pyrite at [opt_level], returning the path of the executable
+    and the time it took to build
+    """
+
+    binary = os.path.join(work_directory, "{}-O{}".format(program.stem, opt_level))
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, PYRITE_PATH.as_posix(), program.as_posix(), "-o", binary, "-O", opt_level],
+        cwd=work_directory,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True
+    )
+
+    if result.returncode != 0:
+        raise BenchmarkError("compilation failed:\n" + result.stdout)
+
+    return (binary, time.perf_counter() - started)
+
+
+def run_benchmark(program: Path, opt_levels: list[str], repeat: int, python: str, work_directory: str) -> dict:
+    """
+    Return the measurements of [program] with CPython and with Pyrite at each of
+    [opt_levels], keyed by "cpython" and "pyrite-O<level>". A configuration that fails
+    is recorded with an "error" instead.
+    """
+
+    results: dict[str, dict] = {}
+
+    try:
+        results["cpython"] = _measure([python, "-c", CPYTHON_DRIVER, program.as_posix()], repeat)
+    except BenchmarkError as err:
+        results["cpython"] = {"error": str(err)}
+
+    expected = results["cpython"].get("exit_status")
+
+    for opt_level in opt_levels:
+        config = "pyrite-O" + opt_level
+
+        try:
+            binary, compile_time = _compile(program, opt_level, work_directory)
+            result = _measure([binary], repeat)
+
+            if expected is not None and result["exit_status"] != expected:
+                raise BenchmarkError("exit status {} differs from CPython's {}".format(
+                    result["exit_status"], expected
+                ))
+
+            result["compile_time"] = compile_time
+            result["binary_size"] = os.path.getsize(binary)
+            results[config] = result
+        except BenchmarkError as err:
+            results[config] = {"error": str(err)}
+
+    return results
+
+
+def _format_size(size: Optional[int], unit: int) -> str:
+    return "{:.1f}".format(size / unit) if size is not None else "-"
+
+
+def format_results(benchmarks: dict[str, dict[str, dict]]) -> str:
+    lines = ["{:<16} {:<12} {:>10} {:>9} {:>10} {:>10}".format(
+        "Benchmark", "Config", "Time (ms)", "Speedup", "Size (KB)", "RSS (MB)"
+    )]
+
+    for name, results in benchmarks.items():
+        cpython_time = results["cpython"].get("time")
+
+        for config, result in results.items():
+            if "error" in result:
+                lines.append("{:<16} {:<12} error: {}".format(
+                    name, config, result["error"].split("\n")[0]
+                ))
+                continue
+
+            lines.append("{:<16} {:<12} {:>10.1f} {:>9} {:>10} {:>10}".format(
+                name,
+                config,
+                result["time"] * 1000,
+                "{:.2f}x".format(cpython_time / result["time"]) if cpython_time else "-",
+                _format_size(result.get("binary_size"), 1024),
+                _format_size(result["max_rss_kb"], 1024)
+            ))
+
+    return "\n".join(lines)
+
+
+def compare_with_baseline(benchmarks: dict[str, dict[str, dict]], baseline: dict, tolerance: float) -> tuple[str, bool]:
+    """
+    Compare the run times of [benchmarks] with those of the results file [baseline].
+    Return a report of the comparison, and whether any configuration became slower by
+    more than [tolerance].
+    """
+
+    lines = ["{:<16} {:<12} {:>14} {:>12} {:>8}".format(
+        "Benchmark", "Config", "Baseline (ms)", "Now (ms)", "Change"
+    )]
+    regressed = False
+
+    for name, results in benchmarks.items():
+        for config, result in results.items():
+            previous = baseline.get("benchmarks", {}).get(name, {}).get(config, {})
+
+            if "time" not in result or "time" not in previous:
+                continue
+
+            change = result["time"] / previous["time"] - 1
+            slower = change > tolerance
+            regressed = regressed or slower
+
+            lines.append("{:<16} {:<12} {:>14.1f} {:>12.1f} {:>+7.1f}%{}".format(
+                name,
+                config,
+                previous["time"] * 1000,
+                result["time"] * 1000,
+                change * 100,
+                "  REGRESSION" if slower else ""
+            ))
+
+    return ("\n".join(lines), regressed)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="benchmarks/run.py",
+        description="Compare the performance of Pyrite executables with CPython"
+    )
+    parser.add_argument(
+        "programs",
+        nargs="*",
+        help="names of the programs in benchmarks/programs to run (default: all)"
+    )
+    parser.add_argument(
+        "-O",
+        dest="opt_levels",
+        default="0,2,3",
+        help="comma-separated optimization levels to build with (default: 0,2,3)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration (default: 3)")
+    parser.add_argument("--python", default=sys.executable, help="CPython interpreter to compare with")
+    parser.add_argument("--output", metavar="FILE", help="write the results to the given JSON file")
+    parser.add_argument("--baseline", metavar="FILE", help="compare run times with a previous results file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="slowdown relative to the baseline reported as a regression (default: 0.1)"
+    )
+    args = parser.parse_args(argv)
+
+    names = args.programs or sorted(path.stem for path in PROGRAMS_PATH.glob("*.py"))
+    programs = [PROGRAMS_PATH.joinpath(name + ".py") for name in names]
+
+    for program in programs:
+        if not program.is_file():
+            parser.error("no such benchmark: {}".format(program.stem))
+
+    work_directory = tempfile.mkdtemp(prefix="pyrite-benchmarks-")
+    benchmarks: dict[str, dict[str, dict]] = {}
+
+    try:
+        for program in programs:
+            benchmarks[program.stem] = run_benchmark(
+                program, args.opt_levels.split(","), args.repeat, args.python, work_directory
+            )
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    print(format_results(benchmarks))
+
+    results = {
+        "compiler_version": COMPILER_VERSION,
+        "python_version": subprocess.run(
+            [args.python, "-c", "import sys; print(sys.version.split()[0])"],
+            stdout=subprocess.PIPE,
+            text=True
+        ).stdout.strip(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "benchmarks": benchmarks
+    }
+
+    if args.output:
+        with open(args.output, "w") as fl:
+            json.dump(results, fl, indent=2)
+
+    failed = any("error" in result for results in benchmarks.values() for result in results.values())
+
+    if args.baseline:
+        with open(args.baseline) as fl:
+            report, regressed = compare_with_baseline(benchmarks, json.load(fl), args.tolerance)
+
+        print()
+        print(report)
+        failed = failed or regressed
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,195 @@
+"""
+Measures how the compile time and memory use of the front end grow with the size of
+the program, using the synthetic programs of benchmarks/workloads.py. Each shape is
+built with Compiler.build() at increasing sizes, in this process and without building
+an executable, and a power law (time ~ n^k) is fitted to the measurements. The script
+exits with status 1 if the exponent k of any shape exceeds --max-exponent, so that
+accidentally quadratic behavior is caught before it reaches real programs.
+
+Usage:
+    python benchmarks/scaling.py [shape ...] [--sizes 250,500,1000,2000] [--repeat 3]
+        [--max-exponent 1.3] [--output results.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import math
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_PATH = Path(__file__).parent.parent
+
+sys.path.insert(0, ROOT_PATH.as_posix())
+sys.path.insert(0, Path(__file__).parent.as_posix())
+from pyrite.compiler import Compiler
+from pyrite.globals import CompilerOptions, Globals
+from workloads import SHAPES, write_program
+
+
+class ScalingError(Exception):
+    pass
+
+
+def _make_compiler(entry_path: str, directory: str) -> Compiler:
+    Globals.set_compiler_options(CompilerOptions(
+        stdlib_path=ROOT_PATH.joinpath("stdlib").as_posix(),
+        stdlib_include=[],
+        cwd=directory,
+        enable_color=False,
+        clang_command="clang",
+        cache_prelude=True
+    ))
+
+    compiler = Compiler()
+    compiler.add_source_file(entry_path, True)
+
+    # the prelude is loaded once per process, and is not part of what is measured
+    if not compiler.load_prelude():
+        raise ScalingError("the prelude failed to compile")
+
+    return compiler
+
+
+def _build(compiler: Compiler) -> None:
+    if not compiler.build():
+        raise ScalingError("the generated program failed to compile")
+
+
+def measure(shape: str, n: int, repeat: int) -> dict:
+    """
+    Build the program of [shape] at size [n], returning the fastest of [repeat] build
+    times in seconds and the peak memory allocated during a separate build, in bytes
+    """
+
+    directory = tempfile.mkdtemp(prefix="pyrite-scaling-")
+
+    try:
+        entry_path = write_program(SHAPES[shape](n), directory)
+        times = []
+
+        for _ in range(repeat):
+            compiler = _make_compiler(entry_path, directory)
+            gc.collect()
+            started = time.perf_counter()
+            _build(compiler)
+            times.append(time.perf_counter() - started)
+
+        # tracing slows allocation down, so memory is measured on its own build
+        compiler = _make_compiler(entry_path, directory)
+        gc.collect()
+        tracemalloc.start()
+
+        try:
+            _build(compiler)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {"n": n, "time": min(times), "peak_memory": peak_memory}
+
+
+def fit_exponent(sizes: list[int], values: list[float]) -> float:
+    """
+    Return the exponent k of the power law value ~ size^k that best fits the given
+    points, by least squares on a log-log scale
+    """
+
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(value) for value in values]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+
+    return (
+        sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) /
+        sum((x - mean_x) ** 2 for x in xs)
+    )
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="benchmarks/scaling.py",
+        description="Check that compile time and memory grow linearly with program size"
+    )
+    parser.add_argument(
+        "shapes",
+        nargs="*",
+        help="workload shapes to measure: {} (default: all)".format(", ".join(SHAPES))
+    )
+    parser.add_argument(
+        "--sizes",
+        default="250,500,1000,2000",
+        help="comma-separated program sizes to build (default: 250,500,1000,2000)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="builds per size (default: 3)")
+    parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=1.3,
+        help="largest scaling exponent accepted for time and memory (default: 1.3)"
+    )
+    parser.add_argument("--output", metavar="FILE", help="write the measurements to the given JSON file")
+    args = parser.parse_args(argv)
+
+    shapes = args.shapes or list(SHAPES)
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error("unknown shape {}".format(repr(shape)))
+
+    if len(sizes) < 2:
+        parser.error("at least two sizes are needed to fit an exponent")
+
+    results: dict[str, dict] = {}
+    failed = False
+
+    for shape in shapes:
+        print("{}:".format(shape))
+        points = []
+
+        for n in sizes:
+            try:
+                point = measure(shape, n, args.repeat)
+            except ScalingError as err:
+                print("  n={}: {}".format(n, err))
+                return 1
+
+            points.append(point)
+            print("  n={:<8} {:>10.1f} ms {:>10.1f} MB".format(
+                n, point["time"] * 1000, point["peak_memory"] / (1024 * 1024)
+            ))
+
+        time_exponent = fit_exponent(sizes, [point["time"] for point in points])
+        memory_exponent = fit_exponent(sizes, [point["peak_memory"] for point in points])
+        regressed = max(time_exponent, memory_exponent) > args.max_exponent
+        failed = failed or regressed
+
+        print("  exponent: time {:.2f}, memory {:.2f}{}".format(
+            time_exponent, memory_exponent, "  SUPER-LINEAR" if regressed else ""
+        ))
+
+        results[shape] = {
+            "points": points,
+            "time_exponent": time_exponent,
+            "memory_exponent": memory_exponent
+        }
+
+    if args.output:
+        with open(args.output, "w") as fl:
+            json.dump(results, fl, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
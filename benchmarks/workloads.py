@@ -0,0 +1,174 @@
+"""
+Generators of synthetic Pyrite programs whose size grows with a parameter n, used by
+benchmarks/scaling.py to check that the compiler scales linearly. Each shape stresses
+a different dimension of the front end:
+  - functions: one module with n top-level functions
+  - imports: n modules, each importing its predecessor and the module at half its
+    index
+  - long_function: one function of about n statements
+  - types: n typed module constants and functions with mixed int, float and bool
+    signatures (Pyrite has no user-defined types yet, so this exercises type
+    resolution through annotations instead)
+
+Generated programs are valid Python, and their inputs come from loop variables, so
+that the constant folder cannot evaluate them away at compile time.
+
+Usage:
+    python benchmarks/workloads.py SHAPE N DIRECTORY
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Callable
+
+# A program is a map from file names to their contents; the entry module is main.py
+Program = dict[str, str]
+
+ENTRY_FILENAME = "main.py"
+
+
+def _make_main(call: str) -> str:
+    return (
+        "def main() -> int:\n"
+        "    total = 0\n"
+        "\n"
+        "    for i in range(3):\n"
+        "        total += {}\n"
+        "\n"
+        "    return total % 256\n"
+    ).format(call)
+
+
+def _make_function(name: str, index: int, term: str) -> str:
+    return (
+        "def {name}(x: int, y: float) -> int:\n"
+        "    a = x * {index} + 1\n"
+        "    if a % 3 == 0:\n"
+        "        a = a // 3\n"
+        "    b = y * 0.5\n"
+        "    while b > 1.0:\n"
+        "        b = b - 1.0\n"
+        "    if b > 0.25:\n"
+        "        a += 1\n"
+        "    return a + {term}\n"
+    ).format(name=name, index=index, term=term)
+
+
+def generate_functions(n: int) -> Program:
+    # each function calls the one at half its index, so calls nest log(n) deep
+    functions = [
+        _make_function("f{}".format(i), i, "f{}(x + 1, y)".format(i // 2) if i > 0 else "0")
+        for i in range(n)
+    ]
+
+    return {ENTRY_FILENAME: "\n\n".join(functions) + "\n\n" + _make_main("f{}(i, 2.5)".format(n - 1))}
+
+
+def generate_imports(n: int) -> Program:
+    program: Program = {}
+
+    for i in range(n):
+        # modules import their predecessor and the module at half their index, so
+        # the graph is n levels deep and not just a list
+        dependencies = sorted({i - 1, i // 2} - {i}) if i > 0 else []
+        imports = "".join("import m{}\n".format(dependency) for dependency in dependencies)
+        calls = " + ".join(
+            ["x"] + ["m{0}.g{0}(x, y)".format(dependency) for dependency in dependencies]
+        )
+
+        program["m{}.py".format(i)] = imports + "\n\n" + _make_function("g{}".format(i), i, calls)
+
+    program[ENTRY_FILENAME] = "import m{0}\n\n\n".format(n - 1) + _make_main(
+        "m{0}.g{0}(i, 2.5)".format(n - 1)
+    )
+
+    return program
+
+
+def generate_long_function(n: int) -> Program:
+    lines = [
+        "def long_function(seed: int) -> int:",
+        *("    v{} = seed + {}".format(j, j) for j in range(16))
+    ]
+
+    for i in range(n):
+        target = "v{}".format(i % 16)
+        source = "v{}".format((i * 7 + 3) % 16)
+
+        if i % 10 == 9:
+            lines.append("    if {} > {}:".format(target, source))
+            lines.append("        {} = {} - {}".format(target, target, source))
+        else:
+            lines.append("    {} = ({} + {} * {}) % 1000003".format(target, target, source, i % 97 + 1))
+
+    lines.append("    return " + " + ".join("v{}".format(j) for j in range(16)))
+
+    return {ENTRY_FILENAME: "\n".join(lines) + "\n\n\n" + _make_main("long_function(i)")}
+
+
+_TYPE_CYCLE = [("int", "{}"), ("float", "{}.5"), ("bool", "{}")]
+
+
+def generate_types(n: int) -> Program:
+    lines: list[str] = []
+
+    for i in range(n):
+        type_name, literal = _TYPE_CYCLE[i % 3]
+        value = ("True" if i % 2 else "False") if type_name == "bool" else literal.format(i)
+        lines.append("C{}: {} = {}".format(i, type_name, value))
+
+    lines.append("")
+
+    def constant(index: int, fallback: str) -> str:
+        return "C{}".format(index) if index < n else fallback
+
+    for i in range(n):
+        # the int, float and bool constants of the group of three that i belongs to
+        group = i - i % 3
+
+        lines.extend([
+            "",
+            "def t{}(a: int, b: float, c: bool) -> float:".format(i),
+            "    x: float = a * {} + b".format(constant(group, "1")),
+            "    flag: bool = c and {}".format(constant(group + 2, "c")),
+            "    if flag:",
+            "        x = x - {}".format(constant(group + 1, "1.5")),
+            "    return x" + (" + t{}(a, b, c)".format(i // 2) if i > 0 else ""),
+            ""
+        ])
+
+    return {ENTRY_FILENAME: "\n".join(lines) + "\n\n" + _make_main(
+        "(t{}(i, 1.5, i > 0) > 0.0)".format(n - 1)
+    )}
+
+
+SHAPES: dict[str, Callable[[int], Program]] = {
+    "functions": generate_functions,
+    "imports": generate_imports,
+    "long_function": generate_long_function,
+    "types": generate_types
+}
+
+
+def write_program(program: Program, directory: str) -> str:
+    """
+    Write the files of [program] into [directory], returning the path of its entry module
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    for filename, source in program.items():
+        with open(os.path.join(directory, filename), "w") as fl:
+            fl.write(source)
+
+    return os.path.join(directory, ENTRY_FILENAME)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in SHAPES or not sys.argv[2].isdigit():
+        print("usage: python benchmarks/workloads.py {{{}}} N DIRECTORY".format(",".join(SHAPES)))
+        sys.exit(1)
+
+    print(write_program(SHAPES[sys.argv[1]](int(sys.argv[2])), sys.argv[3]))
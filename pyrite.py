@@ -1,22 +1,13 @@
-import os
-from pathlib import Path
-from pyrite.compiler import Compiler
-from pyrite.globals import CompilerOptions, Globals
 import sys
+import time
 
-if __name__ == "__main__":
-    Globals.set_compiler_options(CompilerOptions(
-        # Look for the stdlib folder in the same directory as the compiler executable
-        stdlib_path=Path(__file__).parent.joinpath("stdlib").as_posix(),
-        stdlib_include=[],
-        cwd=os.getcwd(),
-        enable_color=True,
-        clang_command="clang"
-    ))
+# recorded before the compiler is imported, for --time-startup
+STARTED = time.perf_counter()
+
+from pyrite.cli import main
 
-    compiler = Compiler()
-    compiler.add_source_file(sys.argv[1], True)
-    compiler.build()
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:], started=STARTED))
 #     compiler._llvm.compile_ll("""
 # ; ModuleID = 'test.c'
 # source_filename = "test.c"
@@ -0,0 +1,111 @@
+"""
+A minimal artifact cache server, implementing the protocol of HTTPArtifactStore on top
+of a local directory (see pyrite.artifacts). It stands in for a shared cache server,
+e.g. for a team on a local network or for testing. Uploads are only accepted if they
+are signed with the server's secret; without a secret, the server is read-only.
+"""
+
+from __future__ import annotations
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from pyrite.artifacts import KEY_PATTERN, NAMESPACE_PATTERN, ArtifactStore, LocalArtifactStore, verify_artifact
+
+# The largest artifact accepted by the server
+MAX_ARTIFACT_SIZE = 256 * 1024 * 1024
+
+
+class _ArtifactRequestHandler(BaseHTTPRequestHandler):
+    server: _ArtifactServer
+
+    def _get_address(self) -> Optional[tuple[str, str]]:
+        parts = self.path.strip("/").split("/")
+
+        if (
+            len(parts) != 2
+            or not NAMESPACE_PATTERN.match(parts[0])
+            or not KEY_PATTERN.match(parts[1])
+        ):
+            self.send_error(400, "Invalid artifact address")
+            return None
+
+        return (parts[0], parts[1])
+
+    def do_GET(self) -> None:
+        address = self._get_address()
+
+        if not address:
+            return
+
+        data = self.server.store.get(*address)
+
+        if data is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self) -> None:
+        address = self._get_address()
+
+        if not address:
+            return
+
+        if self.server.secret is None:
+            self.send_error(403, "Uploads are disabled")
+            return
+
+        length = int(self.headers.get("Content-Length") or -1)
+
+        if not 0 <= length <= MAX_ARTIFACT_SIZE:
+            self.send_error(411 if length < 0 else 413)
+            return
+
+        signed = self.rfile.read(length)
+
+        if verify_artifact(self.server.secret, *address, signed) is None:
+            self.send_error(403, "Invalid artifact signature")
+            return
+
+        # artifacts are stored with their signature, which clients check again
+        self.server.store.put(*address, signed)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class _ArtifactServer(ThreadingHTTPServer):
+    store: ArtifactStore
+    # the secret that uploaded artifacts must be signed with; uploads are rejected if
+    # it is not set
+    secret: Optional[bytes]
+
+    def __init__(self, address: tuple[str, int], store: ArtifactStore, secret: Optional[bytes]):
+        super().__init__(address, _ArtifactRequestHandler)
+        self.store = store
+        self.secret = secret
+
+
+def serve_artifact_store(directory: str, host: str, port: int, secret: Optional[bytes]) -> None:
+    """
+    Serve the artifacts in [directory] over HTTP (see HTTPArtifactStore) until
+    interrupted, accepting uploads signed with [secret]
+    """
+
+    server = _ArtifactServer((host, port), LocalArtifactStore(directory), secret)
+    print("Serving the artifacts in {} on http://{}:{}{}".format(
+        directory, host, port, "" if secret else " (read-only, since no secret was given)"
+    ))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,228 @@
+"""
+Stores for build artifacts that are shared between builds, compiler processes and
+machines: analyzed modules (see pyrite.cache) and object files (see pyrite.llvm).
+Artifacts are immutable and addressed by a key derived from everything that affects
+their contents, so a store may hold artifacts produced anywhere, and a lookup either
+finds exactly the requested artifact or misses.
+  - LocalArtifactStore keeps artifacts in a directory
+  - HTTPArtifactStore fetches an artifact with GET <url>/<namespace>/<key> and uploads
+    it with PUT to the same URL; any response other than 200 is a miss. Any server
+    implementing this can be used as a shared cache, and pyrite.artifact_server is a
+    minimal one on top of a local directory. Artifacts are signed with a secret shared
+    by everyone using the cache (see sign_artifact), and an artifact whose signature
+    does not match is a miss, so a cache server can neither be used to run code in a
+    build nor to slip object files into a program without knowing the secret.
+  - TieredArtifactStore looks artifacts up in several stores in turn, such as a local
+    directory in front of a shared server
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import re
+from typing import Optional
+from pyrite import fs
+from pyrite.errors import UserError
+from pyrite.globals import Globals
+
+# Keys are hex digests (see pyrite.util.content_hash); both patterns also keep keys
+# and namespaces from escaping the directory of a LocalArtifactStore
+KEY_PATTERN = re.compile(r"^[0-9a-f]{16,128}$")
+NAMESPACE_PATTERN = re.compile(r"^[a-z]+$")
+
+# Seconds to wait for a shared cache before treating a request as a miss
+HTTP_TIMEOUT = 5.0
+
+# Signed artifacts start with an HMAC-SHA256 signature of this size
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+
+def _check_address(namespace: str, key: str) -> None:
+    if not NAMESPACE_PATTERN.match(namespace) or not KEY_PATTERN.match(key):
+        raise ValueError("invalid artifact address {}/{}".format(repr(namespace), repr(key)))
+
+
+def _get_signature(secret: bytes, namespace: str, key: str, data: bytes) -> bytes:
+    # the address is signed along with the contents, so that a signed artifact cannot
+    # be replayed under another key
+    message = "{}/{}\0".format(namespace, key).encode("utf8") + data
+
+    return hmac.new(secret, message, hashlib.sha256).digest()
+
+
+def sign_artifact(secret: bytes, namespace: str, key: str, data: bytes) -> bytes:
+    """
+    Return the artifact [data] stored as [key] in [namespace], prefixed with its
+    signature using [secret]
+    """
+
+    return _get_signature(secret, namespace, key, data) + data
+
+
+def verify_artifact(secret: bytes, namespace: str, key: str, signed: bytes) -> Optional[bytes]:
+    """
+    Return the artifact signed by sign_artifact as [signed], or None if it was not
+    signed with [secret] for [key] in [namespace]
+    """
+
+    signature, data = signed[:SIGNATURE_SIZE], signed[SIGNATURE_SIZE:]
+
+    if not hmac.compare_digest(signature, _get_signature(secret, namespace, key, data)):
+        return None
+
+    return data
+
+
+class ArtifactStore:
+    """
+    A key-value store of artifacts, grouped into namespaces such as "modules" and
+    "objects". A store is only an optimization: implementations treat any failure as
+    a miss rather than failing the build.
+    """
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        Return the artifact stored under [key] in [namespace], or None if there is none
+        """
+
+        raise NotImplementedError()
+
+    def put(self, namespace: str, key: str, data: bytes) -> None:
+        """
+        Store [data] as the artifact [key] of [namespace]
+        """
+
+        raise NotImplementedError()
+
+
+class LocalArtifactStore(ArtifactStore):
+    _directory: str
+
+    def __init__(self, directory: str):
+        self._directory = directory
+
+    def _get_path(self, namespace: str, key: str) -> str:
+        _check_address(namespace, key)
+        return os.path.join(self._directory, namespace, key[:2], key)
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            with open(self._get_path(namespace, key), "rb") as fl:
+                return fl.read()
+        except OSError:
+            return None
+
+    def put(self, namespace: str, key: str, data: bytes) -> None:
+        try:
+            fs.write_file_atomic(path=self._get_path(namespace, key), data=data)
+        except OSError:
+            # e.g. a read-only or full disk
+            pass
+
+
+class HTTPArtifactStore(ArtifactStore):
+    """
+    An artifact cache server, whose artifacts are signed with [secret] (see
+    sign_artifact)
+    """
+
+    _url: str
+    _secret: bytes
+
+    def __init__(self, url: str, secret: bytes):
+        self._url = url.rstrip("/")
+        self._secret = secret
+
+    def _get_url(self, namespace: str, key: str) -> str:
+        _check_address(namespace, key)
+        return "{}/{}/{}".format(self._url, namespace, key)
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        # urllib is slow to import, and only needed if a shared cache is used
+        import urllib.request
+
+        try:
+            with urllib.request.urlopen(self._get_url(namespace, key), timeout=HTTP_TIMEOUT) as response:
+                if response.status != 200:
+                    return None
+
+                signed = response.read()
+        except OSError:
+            # URLError and HTTPError (e.g. for a 404), connection failures and timeouts
+            return None
+
+        # unsigned or tampered artifacts are misses
+        return verify_artifact(self._secret, namespace, key, signed)
+
+    def put(self, namespace: str, key: str, data: bytes) -> None:
+        import urllib.request
+
+        request = urllib.request.Request(
+            self._get_url(namespace, key),
+            data=sign_artifact(self._secret, namespace, key, data),
+            method="PUT",
+            headers={"Content-Type": "application/octet-stream"}
+        )
+
+        try:
+            urllib.request.urlopen(request, timeout=HTTP_TIMEOUT).close()
+        except OSError:
+            pass
+
+
+class TieredArtifactStore(ArtifactStore):
+    """
+    Looks artifacts up in [stores] in order. An artifact found in one store is copied
+    into the stores before it, and new artifacts are stored in all of them.
+    """
+
+    _stores: list[ArtifactStore]
+
+    def __init__(self, stores: list[ArtifactStore]):
+        self._stores = stores
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        for index, store in enumerate(self._stores):
+            data = store.get(namespace, key)
+
+            if data is not None:
+                for earlier in self._stores[:index]:
+                    earlier.put(namespace, key, data)
+
+                return data
+
+        return None
+
+    def put(self, namespace: str, key: str, data: bytes) -> None:
+        for store in self._stores:
+            store.put(namespace, key, data)
+
+
+def get_shared_store() -> Optional[ArtifactStore]:
+    """
+    Return the shared artifact cache set by CompilerOptions.artifact_cache_url, if any
+    """
+
+    opts = Globals.get_compiler_options()
+
+    if not opts.artifact_cache_url:
+        return None
+
+    if not opts.artifact_cache_secret:
+        raise UserError("A shared artifact cache requires a secret to sign artifacts with")
+
+    return HTTPArtifactStore(opts.artifact_cache_url, opts.artifact_cache_secret)
+
+
+def make_artifact_store(directory: str) -> ArtifactStore:
+    """
+    Return a store keeping artifacts in [directory], backed by the shared artifact
+    cache if one is configured
+    """
+
+    local = LocalArtifactStore(directory)
+    shared = get_shared_store()
+
+    return TieredArtifactStore([local, shared]) if shared else local
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import io
+import pickle
+from typing import TYPE_CHECKING, Any, Optional
+from pyrite.artifacts import ArtifactStore
+from pyrite.globals import COMPILER_VERSION, Globals
+from pyrite.interface import ModuleInterface
+from pyrite.module import ConstantValue, GlobalVariable, Module, ModulePragma, TopLevelFunction, Type
+from pyrite.util import RestrictedUnpickler, content_hash
+
+if TYPE_CHECKING:
+    from pyrite.codegen import TranslationUnit
+
+# Placeholders used in place of references to the module being serialized; these are
+# rebound to the module that the artifact is restored into
+_MODULE_REF = "module"
+_GLOBAL_SCOPE_REF = "global_scope"
+
+# The namespace of module artifacts in an ArtifactStore
+ARTIFACT_NAMESPACE = "modules"
+
+
+@dataclass
+class ModuleArtifact:
+    """
+    The analyzed result of compiling a single module
+    """
+
+    compiler_version: str
+    key: str
+    types: dict[str, Type]
+    functions: list[TopLevelFunction]
+    global_variables: dict[str, GlobalVariable]
+    pragma: ModulePragma
+    constants: dict[str, ConstantValue]
+    # the translation unit of the module, once it has been lowered
+    unit: Optional[TranslationUnit]
+    # the serialized interface of the module, once it has been optimized
+    interface: Optional[bytes]
+
+
+class _ArtifactPickler(pickle.Pickler):
+    _module: Module
+
+    def __init__(self, file: io.BytesIO, module: Module):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._module = module
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        if obj is self._module:
+            return _MODULE_REF
+        if obj is self._module.get_global_scope():
+            return _GLOBAL_SCOPE_REF
+
+        return None
+
+
+class _ArtifactUnpickler(RestrictedUnpickler):
+    _module: Module
+
+    def __init__(self, file: io.BytesIO, module: Module):
+        super().__init__(file)
+        self._module = module
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid == _MODULE_REF:
+            return self._module
+        if pid == _GLOBAL_SCOPE_REF:
+            return self._module.get_global_scope()
+
+        raise pickle.UnpicklingError("unknown persistent id {}".format(repr(pid)))
+
+
+def serialize_module(module: Module, key: str) -> bytes:
+    """
+    Return the analyzed state of a compiled [module] as bytes. References back to the
+    module itself are not serialized, so the result can be restored into any Module
+    object with the same source.
+    """
+
+    artifact = ModuleArtifact(
+        compiler_version=COMPILER_VERSION,
+        key=key,
+        types={type.name: type for type in module.get_types()},
+        functions=module.get_global_scope().get_functions(),
+        global_variables=module.get_global_scope().get_global_variables(),
+        pragma=module.get_pragma(),
+        constants=module.get_constants(),
+        unit=module.get_translation_unit(),
+        interface=module.get_interface().data if module.has_interface() else None
+    )
+
+    buffer = io.BytesIO()
+    _ArtifactPickler(buffer, module).dump(artifact)
+
+    return buffer.getvalue()
+
+
+def restore_module(module: Module, data: bytes, expected_key: Optional[str] = None) -> ModuleArtifact:
+    """
+    Restore the state serialized by serialize_module into [module], returning the
+    deserialized artifact. Raise an UnpicklingError, leaving [module] untouched, if
+    [data] is not a valid artifact for this compiler version or [expected_key], or a
+    ValueError if its interface is invalid.
+    """
+
+    artifact = _ArtifactUnpickler(io.BytesIO(data), module).load()
+
+    if not isinstance(artifact, ModuleArtifact):
+        raise pickle.UnpicklingError("not a module artifact")
+
+    if artifact.compiler_version != COMPILER_VERSION:
+        raise pickle.UnpicklingError("artifact is from a different compiler version")
+
+    if expected_key is not None and artifact.key != expected_key:
+        raise pickle.UnpicklingError("artifact key mismatch")
+
+    module.restore_analysis(
+        types=artifact.types,
+        functions=artifact.functions,
+        global_variables=artifact.global_variables,
+        pragma=artifact.pragma,
+        constants=artifact.constants,
+        unit=artifact.unit,
+        interface=ModuleInterface(artifact.interface) if artifact.interface is not None else None
+    )
+
+    return artifact
+
+
+def _get_relevant_options() -> str:
+    """
+    Return a string describing the compiler options that affect the result of
+    compiling a module
+    """
+
+    opts = Globals.get_compiler_options()
+
+    # nothing that depends on where the program is built may be included, so that
+    # keys are the same on every machine
+    return repr(sorted(opts.stdlib_include))
+
+
+def make_module_key(module: Module, prelude_hash: str, dependency_keys: list[str]) -> str:
+    """
+    Return a key identifying the result of compiling [module]: a hash of the module's
+    source, the compiler version, the relevant compiler options, the prelude and the
+    interface keys (see make_interface_key) of the modules [module] imports. Since
+    modules are compiled against the interfaces of their dependencies, a change to a
+    dependency that leaves its interface intact does not change the key.
+    """
+
+    return content_hash("\0".join([
+        COMPILER_VERSION,
+        _get_relevant_options(),
+        prelude_hash,
+        module.get_source().get_qualified_name(),
+        module.get_source_hash(),
+        *sorted(dependency_keys)
+    ]))
+
+
+def make_interface_key(interface: ModuleInterface, dependency_keys: list[str]) -> str:
+    """
+    Return a key identifying [interface] together with the interfaces it is built on:
+    the interface keys of the modules its module imports. The inlinable bodies of an
+    interface may refer to the modules it imports, whose interfaces therefore matter
+    to the modules importing it as well.
+    """
+
+    return content_hash("\0".join([interface.key, *sorted(dependency_keys)]))
+
+
+class ModuleCache:
+    """
+    A cache of compiled modules, keyed by make_module_key. A module whose key is
+    unchanged can be restored from the cache instead of being compiled again. Keys
+    do not depend on where a module is built, so the cache can be shared between
+    machines (see pyrite.artifacts).
+    """
+
+    _store: ArtifactStore
+
+    def __init__(self, store: ArtifactStore):
+        self._store = store
+
+    def load(self, module: Module, key: str) -> bool:
+        """
+        Restore [module] from the cache entry for [key]. Return False if there is no
+        usable entry, in which case [module] must be compiled normally.
+        """
+
+        data = self._store.get(ARTIFACT_NAMESPACE, key)
+
+        if data is None:
+            return False
+
+        try:
+            restore_module(module, data, expected_key=key)
+        except Exception:
+            # a corrupt or incompatible entry is treated as a cache miss
+            return False
+
+        return True
+
+    def store(self, module: Module, key: str) -> None:
+        self.store_serialized(key, serialize_module(module, key))
+
+    def store_serialized(self, key: str, data: bytes) -> None:
+        """
+        Store the output of serialize_module as the cache entry for [key]
+        """
+
+        self._store.put(ARTIFACT_NAMESPACE, key, data)
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import shlex
+import time
+from typing import TYPE_CHECKING, Optional
+from pyrite.errors import UserError
+from pyrite.globals import CompilerOptions, Globals
+
+# The command line is parsed before the rest of the compiler is imported, so that modes
+# which do not build anything in this process (--connect, --serve-cache, --help and
+# usage errors) start quickly
+if TYPE_CHECKING:
+    from pyrite.compiler import Compiler
+
+# Look for the stdlib folder in the same directory as the compiler executable
+STDLIB_PATH = Path(__file__).parent.parent.joinpath("stdlib").as_posix()
+
+
+def make_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pyrite.py",
+        description="Compile a subset of Python into a standalone executable"
+    )
+    parser.add_argument("input_file", nargs="?", help="entry module of the program")
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="number of modules to compile in parallel (default: 1)"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="path of the executable to build; if omitted, no executable is built"
+    )
+    parser.add_argument(
+        "-O",
+        dest="opt_level",
+        choices=["0", "1", "2", "3", "s"],
+        default="0",
+        help="optimization level (default: 0)"
+    )
+    parser.add_argument(
+        "--lto",
+        action="store_true",
+        help="enable link-time optimization across modules"
+    )
+    parser.add_argument(
+        "--pgo",
+        metavar="TRAINING_ARGS",
+        help="build with profile-guided optimization, collecting a profile by running "
+        "the program with the given (quoted) arguments; requires -o"
+    )
+    parser.add_argument(
+        "--pipe-ir",
+        action="store_true",
+        help="stream LLVM IR to clang over stdin instead of writing it to disk"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild whenever a source file of the program changes"
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="run a compile server listening on the given Unix socket"
+    )
+    parser.add_argument(
+        "--cache-url",
+        metavar="URL",
+        help="share analyzed modules and object files through the artifact cache "
+        "server at the given URL"
+    )
+    parser.add_argument(
+        "--cache-secret",
+        metavar="FILE",
+        help="file holding the secret that artifacts of the shared cache are signed "
+        "with; required by --cache-url, and --serve-cache only accepts uploads if it "
+        "is given"
+    )
+    parser.add_argument(
+        "--serve-cache",
+        metavar="DIRECTORY",
+        help="run an artifact cache server storing artifacts in the given directory"
+    )
+    parser.add_argument(
+        "--cache-address",
+        metavar="HOST:PORT",
+        default="127.0.0.1:8750",
+        help="address that --serve-cache listens on (default: 127.0.0.1:8750)"
+    )
+    parser.add_argument(
+        "--time-startup",
+        action="store_true",
+        help="report the time spent starting up the compiler before building"
+    )
+    parser.add_argument(
+        "--time-report",
+        action="store_true",
+        help="report the time and memory spent in each phase of the build"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="write a Chrome trace (see chrome://tracing) of the phases of the build "
+        "to the given file"
+    )
+    parser.add_argument(
+        "--alloc-stats",
+        action="store_true",
+        help="make the executable report its memory allocations to stderr on exit"
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="SOCKET",
+        help="build using the compile server listening on the given Unix socket"
+    )
+
+    return parser
+
+
+def parse_arguments(argv: list[str]) -> argparse.Namespace:
+    parser = make_argument_parser()
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    if not args.serve and not args.serve_cache and not args.input_file:
+        parser.error("an input file is required")
+
+    host, _, port = args.cache_address.rpartition(":")
+
+    if not host or not port.isdigit():
+        parser.error("--cache-address must be of the form HOST:PORT")
+
+    if args.cache_url and not args.cache_secret:
+        parser.error("--cache-url requires --cache-secret")
+
+    if args.pgo is not None and not args.output:
+        parser.error("--pgo requires -o")
+
+    if args.pgo is not None and (args.watch or args.serve or args.connect):
+        parser.error("--pgo cannot be combined with --watch, --serve or --connect")
+
+    return args
+
+
+def read_cache_secret(args: argparse.Namespace, cwd: str) -> Optional[bytes]:
+    """
+    Return the secret of the shared artifact cache, read from the file given by
+    --cache-secret (relative to [cwd]), if any
+    """
+
+    if not args.cache_secret:
+        return None
+
+    try:
+        with open(os.path.join(cwd, args.cache_secret), "rb") as fl:
+            secret = fl.read().strip()
+    except OSError as err:
+        raise UserError("Could not read the cache secret: {}".format(err.strerror))
+
+    if not secret:
+        raise UserError("The cache secret file {} is empty".format(args.cache_secret))
+
+    return secret
+
+
+def make_compiler_options(args: argparse.Namespace, cwd: str) -> CompilerOptions:
+    return CompilerOptions(
+        stdlib_path=STDLIB_PATH,
+        stdlib_include=[],
+        cwd=cwd,
+        enable_color=True,
+        clang_command="clang",
+        cache_prelude=True,
+        incremental=True,
+        jobs=args.jobs,
+        output_path=args.output,
+        pipe_ir=args.pipe_ir,
+        opt_level=args.opt_level,
+        lto=args.lto,
+        artifact_cache_url=args.cache_url,
+        artifact_cache_secret=read_cache_secret(args, cwd),
+        time_report=args.time_report,
+        trace_path=args.trace,
+        alloc_stats=args.alloc_stats
+    )
+
+
+def make_compiler(args: argparse.Namespace) -> Compiler:
+    from pyrite.compiler import Compiler
+
+    compiler = Compiler()
+    compiler.add_source_file(args.input_file, True)
+
+    return compiler
+
+
+class _StartupTimer:
+    """
+    Measures the phases of starting the compiler, for --time-startup
+    """
+
+    _started: float
+    _last: float
+    _phases: list[tuple[str, float]]
+
+    def __init__(self, started: float):
+        self._started = started
+        self._last = started
+        self._phases = []
+
+    def mark(self, phase: str) -> None:
+        """
+        Record the time since the previous phase ended as the duration of [phase]
+        """
+
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self) -> str:
+        return "Startup: {} (total {:.1f} ms)".format(
+            ", ".join(
+                "{} {:.1f} ms".format(phase, duration * 1000)
+                for phase, duration in self._phases
+            ),
+            (self._last - self._started) * 1000
+        )
+
+
+def main(argv: list[str], started: Optional[float] = None) -> int:
+    """
+    Run the Pyrite command line interface, returning the process exit status.
+    [started] is the time (see time.perf_counter) at which the process started
+    importing the compiler, for --time-startup.
+    """
+
+    timer = _StartupTimer(started if started is not None else time.perf_counter())
+    timer.mark("imports")
+    args = parse_arguments(argv)
+    timer.mark("arguments")
+
+    # the server module is only needed for these modes
+    if args.connect:
+        from pyrite.server import run_client
+        return run_client(args.connect, argv, os.getcwd())
+
+    try:
+        if args.serve_cache:
+            from pyrite.artifact_server import serve_artifact_store
+            host, _, port = args.cache_address.rpartition(":")
+            serve_artifact_store(args.serve_cache, host, int(port), read_cache_secret(args, os.getcwd()))
+            return 0
+
+        Globals.set_compiler_options(make_compiler_options(args, os.getcwd()))
+
+        if args.serve:
+            from pyrite.server import serve
+            serve(args.serve)
+            return 0
+
+        if args.pgo is not None:
+            from pyrite.pgo import build_with_pgo
+            success = build_with_pgo(
+                lambda compiler: compiler.add_source_file(args.input_file, True),
+                shlex.split(args.pgo)
+            )
+            return 0 if success else 1
+
+        compiler = make_compiler(args)
+        timer.mark("compiler imports")
+
+        if args.time_startup:
+            # these are otherwise done lazily, as part of the first build
+            if args.output:
+                compiler.get_toolchain()
+                timer.mark("toolchain")
+
+            compiler.load_prelude()
+            timer.mark("prelude")
+            print(timer.report())
+
+        if args.watch:
+            from pyrite.server import watch
+            watch(compiler)
+            return 0
+
+        return 0 if compiler.build() else 1
+    except UserError as err:
+        print("error: " + err.message)
+        return 1
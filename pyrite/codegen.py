@@ -0,0 +1,2321 @@
+"""
+Lowering of analyzed modules to LLVM IR. Every module is emitted as its own LLVM
+translation unit, so that modules can be compiled to object files independently
+and in parallel (see LLVMInterface.compile_objects). Translation units are kept per
+function (see TranslationUnit), so that the IR of an executable only defines the
+functions that its main function can reach (see pyrite.reachability).
+
+Code generation is directed by the static types of values. int, float and bool
+values are never boxed: they are lowered to i64, double and i1 SSA values, and
+local variables live in stack slots that LLVM promotes to registers. Pyrite has no
+dynamically typed values yet, so no boxing is ever necessary. Integer arithmetic
+is emitted with the same overflow semantics as signed arithmetic in C, so numeric
+code optimizes as well as the equivalent C code would.
+
+Lists store their items unboxed in a contiguous buffer typed after their item type
+(see _LIST_TYPE_DEFINITION). Indexing a list checks the index against its length and
+traps if it is out of bounds, except where the index is known to be in bounds: the
+items read by a loop over the list itself, and xs[i] in the body of a loop over
+range(len(xs)) that assigns neither xs nor i, which relies on lists never shrinking.
+
+Strings and list slices that do not escape the function creating them are allocated
+from the runtime arena (see pyrite.escape): the function takes an arena mark on entry and releases it
+before returning, and loops whose iterations allocate from the arena take their own
+mark and release it at the start of every iteration and when they end.
+"""
+
+from __future__ import annotations
+
+import ast
+from dataclasses import dataclass
+from functools import lru_cache
+import os
+import re
+import struct
+from typing import TYPE_CHECKING, Callable, Collection, Optional, Union
+from pyrite import fs
+from pyrite.errors import CompileError, ErrorCollector, SemanticError, UserError
+from pyrite.escape import find_arena_allocations, lends_slices
+from pyrite.globals import Globals
+from pyrite.module import Module, ModuleConstant, TopLevelFunction, Type, get_element_type, make_builtin_type, make_list_type
+from pyrite.resolution import FunctionSymbols, clear_symbols, get_conversions, get_origin, get_slot, get_symbol, resolve_symbols
+from pyrite.util import content_hash, unwrap
+
+if TYPE_CHECKING:
+    from pyrite.interface import ModuleView
+
+_LLVM_TYPES = {
+    "int": "i64",
+    "float": "double",
+    "bool": "i1",
+    "None": "void",
+    "str": "%pyrite.str*",
+    # pointers are held as pointer-sized integers; see stdlib/_compiler_defined
+    "_ext_Pointer": "i64",
+    "_ext_Char": "i8"
+}
+
+# types whose values are integers, which are widened to int for arithmetic
+_INTEGER_TYPES = {"int", "bool", "_ext_Pointer", "_ext_Char"}
+
+_INT_ARITHMETIC = {
+    ast.Add: "add nsw",
+    ast.Sub: "sub nsw",
+    ast.Mult: "mul nsw",
+    ast.LShift: "shl",
+    ast.RShift: "ashr",
+    ast.BitAnd: "and",
+    ast.BitOr: "or",
+    ast.BitXor: "xor"
+}
+
+_FLOAT_ARITHMETIC = {
+    ast.Add: "fadd",
+    ast.Sub: "fsub",
+    ast.Mult: "fmul",
+    ast.Div: "fdiv"
+}
+
+_INT_COMPARISONS = {
+    ast.Eq: "eq",
+    ast.NotEq: "ne",
+    ast.Lt: "slt",
+    ast.LtE: "sle",
+    ast.Gt: "sgt",
+    ast.GtE: "sge"
+}
+
+# != is true for NaN operands, as in Python
+_FLOAT_COMPARISONS = {
+    ast.Eq: "oeq",
+    ast.NotEq: "une",
+    ast.Lt: "olt",
+    ast.LtE: "ole",
+    ast.Gt: "ogt",
+    ast.GtE: "oge"
+}
+
+# Functions that implement Python semantics which have no single LLVM instruction.
+# They are defined in every translation unit that uses them, and all but the string
+# and list allocating ones are always inlined. Division by zero traps, since Pyrite
+# does not support exceptions yet.
+_HELPERS = {
+    "pyrite.floordiv": """define linkonce_odr i64 @pyrite.floordiv(i64 %a, i64 %b) #1 {
+entry:
+  %zero = icmp eq i64 %b, 0
+  br i1 %zero, label %trap, label %divide
+trap:
+  call void @llvm.trap()
+  unreachable
+divide:
+  %q = sdiv i64 %a, %b
+  %r = srem i64 %a, %b
+  %nonzero = icmp ne i64 %r, 0
+  %signs = xor i64 %r, %b
+  %differ = icmp slt i64 %signs, 0
+  %adjust = and i1 %nonzero, %differ
+  %adjust.int = zext i1 %adjust to i64
+  %result = sub i64 %q, %adjust.int
+  ret i64 %result
+}""",
+    "pyrite.mod": """define linkonce_odr i64 @pyrite.mod(i64 %a, i64 %b) #1 {
+entry:
+  %zero = icmp eq i64 %b, 0
+  br i1 %zero, label %trap, label %divide
+trap:
+  call void @llvm.trap()
+  unreachable
+divide:
+  %r = srem i64 %a, %b
+  %nonzero = icmp ne i64 %r, 0
+  %signs = xor i64 %r, %b
+  %differ = icmp slt i64 %signs, 0
+  %adjust = and i1 %nonzero, %differ
+  %adjusted = add i64 %r, %b
+  %result = select i1 %adjust, i64 %adjusted, i64 %r
+  ret i64 %result
+}""",
+    "pyrite.fmod": """define linkonce_odr double @pyrite.fmod(double %a, double %b) #1 {
+entry:
+  %r = frem double %a, %b
+  %nonzero = fcmp une double %r, 0.0
+  %r.negative = fcmp olt double %r, 0.0
+  %b.negative = fcmp olt double %b, 0.0
+  %differ = xor i1 %r.negative, %b.negative
+  %adjust = and i1 %nonzero, %differ
+  %adjusted = fadd double %r, %b
+  %result = select i1 %adjust, double %adjusted, double %r
+  ret double %result
+}""",
+    "pyrite.ipow": """define linkonce_odr i64 @pyrite.ipow(i64 %base, i64 %exp) #1 {
+entry:
+  %negative = icmp slt i64 %exp, 0
+  br i1 %negative, label %trap, label %loop
+trap:
+  call void @llvm.trap()
+  unreachable
+loop:
+  %result = phi i64 [ 1, %entry ], [ %result.next, %body ]
+  %b = phi i64 [ %base, %entry ], [ %b.next, %body ]
+  %e = phi i64 [ %exp, %entry ], [ %e.next, %body ]
+  %done = icmp eq i64 %e, 0
+  br i1 %done, label %exit, label %body
+body:
+  %bit = and i64 %e, 1
+  %odd = icmp ne i64 %bit, 0
+  %product = mul i64 %result, %b
+  %result.next = select i1 %odd, i64 %product, i64 %result
+  %b.next = mul i64 %b, %b
+  %e.next = ashr i64 %e, 1
+  br label %loop
+exit:
+  ret i64 %result
+}""",
+    "pyrite.str_alloc": """define linkonce_odr %pyrite.str* @pyrite.str_alloc(i64 %size, i64 %length) #0 {
+entry:
+  %allocation = add i64 %size, 17
+  %memory = call i8* @pyrite_alloc(i64 %allocation)
+  %object = bitcast i8* %memory to %pyrite.str*
+  %size.field = getelementptr inbounds %pyrite.str, %pyrite.str* %object, i32 0, i32 0
+  store i64 %size, i64* %size.field
+  %length.field = getelementptr inbounds %pyrite.str, %pyrite.str* %object, i32 0, i32 1
+  store i64 %length, i64* %length.field
+  %end = getelementptr inbounds %pyrite.str, %pyrite.str* %object, i32 0, i32 2, i64 %size
+  store i8 0, i8* %end
+  ret %pyrite.str* %object
+}""",
+    "pyrite.str_concat": """define linkonce_odr %pyrite.str* @pyrite.str_concat(%pyrite.str* %a, %pyrite.str* %b) #0 {
+entry:
+  %a.size.field = getelementptr inbounds %pyrite.str, %pyrite.str* %a, i32 0, i32 0
+  %a.size = load i64, i64* %a.size.field
+  %a.length.field = getelementptr inbounds %pyrite.str, %pyrite.str* %a, i32 0, i32 1
+  %a.length = load i64, i64* %a.length.field
+  %a.data = getelementptr inbounds %pyrite.str, %pyrite.str* %a, i32 0, i32 2, i64 0
+  %b.size.field = getelementptr inbounds %pyrite.str, %pyrite.str* %b, i32 0, i32 0
+  %b.size = load i64, i64* %b.size.field
+  %b.length.field = getelementptr inbounds %pyrite.str, %pyrite.str* %b, i32 0, i32 1
+  %b.length = load i64, i64* %b.length.field
+  %b.data = getelementptr inbounds %pyrite.str, %pyrite.str* %b, i32 0, i32 2, i64 0
+  %size = add i64 %a.size, %b.size
+  %length = add i64 %a.length, %b.length
+  %result = call %pyrite.str* @pyrite.str_alloc(i64 %size, i64 %length)
+  %data = getelementptr inbounds %pyrite.str, %pyrite.str* %result, i32 0, i32 2, i64 0
+  call void @llvm.memcpy.p0i8.p0i8.i64(i8* %data, i8* %a.data, i64 %a.size, i1 false)
+  %tail = getelementptr inbounds i8, i8* %data, i64 %a.size
+  call void @llvm.memcpy.p0i8.p0i8.i64(i8* %tail, i8* %b.data, i64 %b.size, i1 false)
+  ret %pyrite.str* %result
+}""",
+    # the number of code points in the UTF-8 encoded [size] bytes at [data]: every
+    # byte but continuation bytes (10xxxxxx) starts one
+    "pyrite.utf8_length": """define linkonce_odr i64 @pyrite.utf8_length(i8* %data, i64 %size) #0 {
+entry:
+  br label %loop
+loop:
+  %i = phi i64 [ 0, %entry ], [ %i.next, %body ]
+  %length = phi i64 [ 0, %entry ], [ %length.next, %body ]
+  %done = icmp eq i64 %i, %size
+  br i1 %done, label %exit, label %body
+body:
+  %pointer = getelementptr inbounds i8, i8* %data, i64 %i
+  %byte = load i8, i8* %pointer
+  %top = and i8 %byte, -64
+  %continuation = icmp eq i8 %top, -128
+  %starts = select i1 %continuation, i64 0, i64 1
+  %length.next = add i64 %length, %starts
+  %i.next = add i64 %i, 1
+  br label %loop
+exit:
+  ret i64 %length
+}""",
+    # only called on strings created by pyrite.str_alloc, never on literals
+    "pyrite.str_free": """define linkonce_odr void @pyrite.str_free(%pyrite.str* %s) #1 {
+entry:
+  %size.field = getelementptr inbounds %pyrite.str, %pyrite.str* %s, i32 0, i32 0
+  %size = load i64, i64* %size.field
+  %allocation = add i64 %size, 17
+  %memory = bitcast %pyrite.str* %s to i8*
+  call void @pyrite_free(i8* %memory, i64 %allocation)
+  ret void
+}""",
+    # interned literals compare equal by address
+    "pyrite.str_eq": """define linkonce_odr i1 @pyrite.str_eq(%pyrite.str* %a, %pyrite.str* %b) #1 {
+entry:
+  %same = icmp eq %pyrite.str* %a, %b
+  br i1 %same, label %equal, label %sizes
+sizes:
+  %a.size.field = getelementptr inbounds %pyrite.str, %pyrite.str* %a, i32 0, i32 0
+  %a.size = load i64, i64* %a.size.field
+  %b.size.field = getelementptr inbounds %pyrite.str, %pyrite.str* %b, i32 0, i32 0
+  %b.size = load i64, i64* %b.size.field
+  %same.size = icmp eq i64 %a.size, %b.size
+  br i1 %same.size, label %compare, label %different
+compare:
+  %a.data = getelementptr inbounds %pyrite.str, %pyrite.str* %a, i32 0, i32 2, i64 0
+  %b.data = getelementptr inbounds %pyrite.str, %pyrite.str* %b, i32 0, i32 2, i64 0
+  %order = call i32 @memcmp(i8* %a.data, i8* %b.data, i64 %a.size)
+  %result = icmp eq i32 %order, 0
+  ret i1 %result
+equal:
+  ret i1 true
+different:
+  ret i1 false
+}"""
+}
+
+# Lists (see _LIST_TYPE_DEFINITION) are handled through untyped headers: the helpers
+# take the size of the items of the list in bytes
+_HELPERS.update({
+    "pyrite.list_new": """define linkonce_odr %pyrite.list* @pyrite.list_new(i64 %length, i64 %size) #0 {
+entry:
+  %memory = call i8* @pyrite_alloc(i64 24)
+  %list = bitcast i8* %memory to %pyrite.list*
+  %length.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 0
+  store i64 %length, i64* %length.field
+  %capacity.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 1
+  store i64 %length, i64* %capacity.field
+  %empty = icmp eq i64 %length, 0
+  br i1 %empty, label %done, label %allocate
+allocate:
+  %bytes = mul i64 %length, %size
+  %items = call i8* @pyrite_alloc(i64 %bytes)
+  br label %done
+done:
+  %data = phi i8* [ null, %entry ], [ %items, %allocate ]
+  %data.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 2
+  store i8* %data, i8** %data.field
+  ret %pyrite.list* %list
+}""",
+    # gives the list a buffer of its own for at least %needed items, growing it
+    # geometrically; a shared buffer is left to the views that use it. It is only
+    # called on the slow paths of appending and storing items, which it is kept out of.
+    "pyrite.list_reserve": """define linkonce_odr void @pyrite.list_reserve(%pyrite.list* %list, i64 %needed, i64 %size) #2 {
+entry:
+  %length.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 0
+  %length = load i64, i64* %length.field
+  %capacity.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 1
+  %capacity = load i64, i64* %capacity.field
+  %data.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 2
+  %data = load i8*, i8** %data.field
+  %shared = icmp slt i64 %capacity, 0
+  %negated = sub i64 0, %capacity
+  %current = select i1 %shared, i64 %negated, i64 %capacity
+  %full = icmp sgt i64 %needed, %current
+  %doubled = shl i64 %current, 1
+  %grown = select i1 %full, i64 %doubled, i64 %current
+  %too.small = icmp sgt i64 %needed, %grown
+  %enough = select i1 %too.small, i64 %needed, i64 %grown
+  %tiny = icmp slt i64 %enough, 4
+  %new.capacity = select i1 %tiny, i64 4, i64 %enough
+  %bytes = mul i64 %new.capacity, %size
+  %items = call i8* @pyrite_alloc(i64 %bytes)
+  %used = mul i64 %length, %size
+  call void @llvm.memcpy.p0i8.p0i8.i64(i8* %items, i8* %data, i64 %used, i1 false)
+  %owned = icmp sgt i64 %capacity, 0
+  br i1 %owned, label %free, label %done
+free:
+  %old.bytes = mul i64 %capacity, %size
+  call void @pyrite_free(i8* %data, i64 %old.bytes)
+  br label %done
+done:
+  store i8* %items, i8** %data.field
+  store i64 %new.capacity, i64* %capacity.field
+  ret void
+}""",
+    # bounds are clamped as in Python; if %share is set, the list becomes shared unless
+    # it is a view
+    "pyrite.list_slice": """define linkonce_odr %pyrite.list* @pyrite.list_slice(%pyrite.list* %list, i64 %start, i64 %stop, i64 %size, i1 %share) #0 {
+entry:
+  %length.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 0
+  %length = load i64, i64* %length.field
+  %start.negative = icmp slt i64 %start, 0
+  %start.wrapped = add i64 %start, %length
+  %start.1 = select i1 %start.negative, i64 %start.wrapped, i64 %start
+  %start.low = icmp slt i64 %start.1, 0
+  %start.2 = select i1 %start.low, i64 0, i64 %start.1
+  %start.high = icmp sgt i64 %start.2, %length
+  %start.3 = select i1 %start.high, i64 %length, i64 %start.2
+  %stop.negative = icmp slt i64 %stop, 0
+  %stop.wrapped = add i64 %stop, %length
+  %stop.1 = select i1 %stop.negative, i64 %stop.wrapped, i64 %stop
+  %stop.low = icmp slt i64 %stop.1, 0
+  %stop.2 = select i1 %stop.low, i64 0, i64 %stop.1
+  %stop.high = icmp sgt i64 %stop.2, %length
+  %stop.3 = select i1 %stop.high, i64 %length, i64 %stop.2
+  %empty = icmp slt i64 %stop.3, %start.3
+  %difference = sub i64 %stop.3, %start.3
+  %count = select i1 %empty, i64 0, i64 %difference
+  %capacity.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 1
+  %capacity = load i64, i64* %capacity.field
+  %owned = icmp sgt i64 %capacity, 0
+  %shares = and i1 %owned, %share
+  %negated = sub i64 0, %capacity
+  %shared = select i1 %shares, i64 %negated, i64 %capacity
+  store i64 %shared, i64* %capacity.field
+  %data.field = getelementptr inbounds %pyrite.list, %pyrite.list* %list, i32 0, i32 2
+  %data = load i8*, i8** %data.field
+  %offset = mul i64 %start.3, %size
+  %items = getelementptr i8, i8* %data, i64 %offset
+  %memory = call i8* @pyrite_alloc(i64 24)
+  %view = bitcast i8* %memory to %pyrite.list*
+  %view.length = getelementptr inbounds %pyrite.list, %pyrite.list* %view, i32 0, i32 0
+  store i64 %count, i64* %view.length
+  %view.capacity = getelementptr inbounds %pyrite.list, %pyrite.list* %view, i32 0, i32 1
+  store i64 0, i64* %view.capacity
+  %view.data = getelementptr inbounds %pyrite.list, %pyrite.list* %view, i32 0, i32 2
+  store i8* %items, i8** %view.data
+  ret %pyrite.list* %view
+}"""
+})
+
+# the same, allocating from the arena (see pyrite.escape)
+_HELPERS["pyrite.str_arena_alloc"] = _HELPERS["pyrite.str_alloc"].replace(
+    "@pyrite.str_alloc(", "@pyrite.str_arena_alloc("
+).replace("@pyrite_alloc(", "@pyrite_arena_alloc(")
+_HELPERS["pyrite.str_arena_concat"] = _HELPERS["pyrite.str_concat"].replace(
+    "@pyrite.str_concat(", "@pyrite.str_arena_concat("
+).replace("@pyrite.str_alloc(", "@pyrite.str_arena_alloc(")
+_HELPERS["pyrite.list_arena_slice"] = _HELPERS["pyrite.list_slice"].replace(
+    "@pyrite.list_slice(", "@pyrite.list_arena_slice("
+).replace("@pyrite_alloc(", "@pyrite_arena_alloc(")
+
+# Strings are immutable objects holding their size in bytes and their length in code
+# points, followed by their characters: UTF-8 encoded and terminated by a null byte.
+# The length is counted when a string is created, so that len() does not have to.
+# Literals are constants (see _ModuleEmitter.use_string); strings built at run time
+# are allocated by the runtime allocator, taking a single allocation each (see
+# pyrite.str_alloc).
+_STR_TYPE_DEFINITION = "%pyrite.str = type { i64, i64, [0 x i8] }"
+
+# Lists hold their length, their capacity and a pointer to their items, which are
+# stored unboxed, with the LLVM type of their Pyrite type: the header is the same for
+# all lists, and the pointer is cast to the item type where items are accessed. A
+# capacity of 0 means that the list owns no buffer, as is the case for views (see
+# pyrite.list_slice), and a negative capacity that its buffer is shared with views.
+_LIST_TYPE_DEFINITION = "%pyrite.list = type { i64, i64, i8* }"
+
+_LIST_TYPE = "%pyrite.list*"
+
+# The stop of a slice whose upper bound is omitted, which is clamped to its length
+_SLICE_END = str(2 ** 63 - 1)
+
+_INTRINSICS = {
+    "llvm.trap": "declare void @llvm.trap()",
+    "llvm.memcpy.p0i8.p0i8.i64": "declare void @llvm.memcpy.p0i8.p0i8.i64(i8* noalias nocapture writeonly, i8* noalias nocapture readonly, i64, i1 immarg)",
+    "llvm.floor.f64": "declare double @llvm.floor.f64(double)",
+    "llvm.pow.f64": "declare double @llvm.pow.f64(double, double)"
+}
+
+# The entry points of the runtime allocator, stdlib/allocator.ll
+_RUNTIME_FUNCTIONS = {
+    "pyrite_alloc": "declare i8* @pyrite_alloc(i64)",
+    "pyrite_alloc_zeroed": "declare i8* @pyrite_alloc_zeroed(i64)",
+    "pyrite_free": "declare void @pyrite_free(i8*, i64)",
+    "pyrite_arena_alloc": "declare i8* @pyrite_arena_alloc(i64)",
+    "pyrite_arena_mark": "declare i8* @pyrite_arena_mark()",
+    "pyrite_arena_release": "declare void @pyrite_arena_release(i8*)",
+    "pyrite_alloc_report": "declare void @pyrite_alloc_report()"
+}
+
+_HELPER_DEPENDENCIES = {
+    "pyrite.floordiv": ["llvm.trap"],
+    "pyrite.mod": ["llvm.trap"],
+    "pyrite.ipow": ["llvm.trap"],
+    "pyrite.fmod": [],
+    # libc functions are declared from stdlib/libc.ll
+    "pyrite.str_alloc": ["pyrite_alloc"],
+    "pyrite.str_free": ["pyrite_free"],
+    "pyrite.str_arena_alloc": ["pyrite_arena_alloc"],
+    "pyrite.str_arena_concat": ["pyrite.str_arena_alloc", "llvm.memcpy.p0i8.p0i8.i64"],
+    "pyrite.str_concat": ["pyrite.str_alloc", "llvm.memcpy.p0i8.p0i8.i64"],
+    "pyrite.str_eq": ["memcmp"],
+    "pyrite.utf8_length": [],
+    "pyrite.list_new": ["pyrite_alloc"],
+    "pyrite.list_reserve": ["pyrite_alloc", "pyrite_free", "llvm.memcpy.p0i8.p0i8.i64"],
+    "pyrite.list_slice": ["pyrite_alloc"],
+    "pyrite.list_arena_slice": ["pyrite_arena_alloc"]
+}
+
+_ATTRIBUTES = [
+    "attributes #0 = { nounwind }",
+    "attributes #1 = { alwaysinline nounwind }",
+    "attributes #2 = { cold noinline nounwind }"
+]
+
+_SIMPLE_IDENTIFIER = re.compile(r"[A-Za-z_.][A-Za-z0-9_.]*")
+
+
+@lru_cache(maxsize=None)
+def _read_libc_declarations(stdlib_path: str) -> dict[str, str]:
+    """
+    Return the declarations of stdlib/libc.ll, by function name
+    """
+
+    declarations: dict[str, str] = {}
+
+    for line in fs.read_file(os.path.join(stdlib_path, "libc.ll")).split("\n"):
+        match = re.match(r"declare .*@([A-Za-z_.0-9]+)\(", line)
+
+        if match:
+            declarations[match.group(1)] = line
+
+    return declarations
+
+
+def get_symbol_name(function: TopLevelFunction) -> str:
+    """
+    Return the LLVM symbol of [function]. Symbols are derived from module names, which
+    are unique within a program; stdlib symbols are kept apart from user symbols.
+    """
+
+    module = function.get_module()
+    prefix = "pyrite.std." if module.is_stdlib_module() else "pyrite."
+
+    return '@"{}{}.{}"'.format(prefix, module.get_name(), function.name)
+
+
+def get_llvm_type(type: Type, node: ast.AST) -> str:
+    llvm_type = _LLVM_TYPES.get(type.name)
+
+    if llvm_type is None and get_element_type(type) is not None:
+        llvm_type = _LIST_TYPE
+
+    if llvm_type is None:
+        raise SemanticError(
+            node, "Values of type {} are not supported yet".format(repr(type.name))
+        )
+
+    return llvm_type
+
+
+def _local_name(name: str) -> str:
+    if _SIMPLE_IDENTIFIER.fullmatch(name):
+        return name
+
+    return '"{}"'.format(name)
+
+
+def _format_float(value: float) -> str:
+    # LLVM only accepts decimal literals that are exactly representable
+    return "0x{:016X}".format(struct.unpack("<Q", struct.pack("<d", value))[0])
+
+
+def _escape_bytes(data: bytes) -> str:
+    """
+    Return [data] as the contents of an LLVM c"..." string constant
+    """
+
+    return "".join(
+        chr(byte) if 0x20 <= byte < 0x7F and byte not in (0x22, 0x5C) else "\\{:02X}".format(byte)
+        for byte in data
+    )
+
+
+class _Value:
+    __slots__ = ("ir", "type")
+
+    ir: str
+    type: Type
+
+    def __init__(self, ir: str, type: Type):
+        self.ir = ir
+        self.type = type
+
+
+class _Variable:
+    __slots__ = ("pointer", "type")
+
+    pointer: str
+    type: Type
+
+    def __init__(self, pointer: str, type: Type):
+        self.pointer = pointer
+        self.type = type
+
+
+class _ArenaScope:
+    """
+    A loop whose iterations release the blocks that they allocated from the arena
+    """
+
+    __slots__ = ("start", "releases", "used")
+
+    # the position in _FunctionEmitter._lines that the arena mark is taken at, before
+    # the loop, or None if the loop is unreachable from there
+    start: Optional[int]
+    # the positions that the mark is released at
+    releases: list[int]
+    # whether the loop allocates from the arena
+    used: bool
+
+    def __init__(self, start: Optional[int]):
+        self.start = start
+        self.releases = []
+        self.used = False
+
+
+@dataclass
+class TranslationUnit:
+    """
+    The LLVM IR emitted for a module. Function definitions are kept apart, along with
+    the declarations and helpers that each of them uses, so that a translation unit
+    defining only some of the module's functions can be assembled without emitting
+    them again.
+    """
+
+    module_id: str
+    module_name: str
+    # the definition of each function, by name, in definition order, and the symbols
+    # of the declarations and helpers it uses
+    functions: dict[str, tuple[str, tuple[str, ...]]]
+    declarations: dict[str, str]
+    helpers: dict[str, str]
+
+    def get_ir(self, function_names: Optional[Collection[str]] = None) -> str:
+        """
+        Return the translation unit as LLVM IR, defining only the functions
+        [function_names] if given
+        """
+
+        definitions: list[str] = []
+        used: set[str] = set()
+
+        for name, (definition, symbols) in self.functions.items():
+            if function_names is None or name in function_names:
+                definitions.append(definition)
+                used.update(symbols)
+
+        lines = [
+            "; ModuleID = '{}'".format(self.module_id),
+            "source_filename = \"{}\"".format(self.module_name),
+            "",
+            _STR_TYPE_DEFINITION,
+            _LIST_TYPE_DEFINITION,
+            ""
+        ]
+
+        declarations = sorted(symbol for symbol in used if symbol in self.declarations)
+
+        if declarations:
+            lines.extend(self.declarations[symbol] for symbol in declarations)
+            lines.append("")
+
+        helpers = sorted(symbol for symbol in used if symbol in self.helpers)
+
+        for definition in definitions + [self.helpers[name] for name in helpers]:
+            lines.append(definition)
+            lines.append("")
+
+        lines.extend(_ATTRIBUTES)
+        lines.append("")
+
+        return "\n".join(lines)
+
+
+class _ModuleEmitter:
+    module: Module
+    modules: dict[str, ModuleView]
+    # declarations and helper definitions needed by the translation unit, by symbol
+    declarations: dict[str, str]
+    helpers: dict[str, str]
+    # the symbols of the declarations and helpers used by the function being emitted
+    used: set[str]
+
+    def __init__(self, module: Module, modules: dict[str, ModuleView]):
+        self.module = module
+        self.modules = modules
+        self.declarations = {}
+        self.helpers = {}
+        self.used = set()
+
+    def get_type(self, name: str) -> Type:
+        return self.module.get_type(name) or make_builtin_type(name)
+
+    def use_function(self, function: TopLevelFunction, node: ast.AST) -> str:
+        """
+        Return the symbol of [function], declaring it if it is defined elsewhere
+        """
+
+        symbol = get_symbol_name(function)
+
+        if function.get_module() is not self.module:
+            parameters = ", ".join(
+                get_llvm_type(argument.type, node)
+                for argument in function.get_arguments().values()
+            )
+            self.declarations[symbol] = "declare {} {}({})".format(
+                get_llvm_type(function.return_type, node), symbol, parameters
+            )
+            self.used.add(symbol)
+
+        return symbol
+
+    def use_libc_function(self, name: str) -> str:
+        stdlib_path = Globals.get_compiler_options().stdlib_path
+        self.declarations[name] = _read_libc_declarations(stdlib_path)[name]
+        self.used.add(name)
+
+        return "@" + name
+
+    def use_helper(self, name: str) -> str:
+        self.used.add(name)
+
+        if name in _INTRINSICS:
+            self.declarations[name] = _INTRINSICS[name]
+        elif name in _RUNTIME_FUNCTIONS:
+            self.declarations[name] = _RUNTIME_FUNCTIONS[name]
+        elif name in _HELPERS:
+            self.helpers[name] = _HELPERS[name]
+
+            for dependency in _HELPER_DEPENDENCIES[name]:
+                self.use_helper(dependency)
+        else:
+            return self.use_libc_function(name)
+
+        return "@" + name
+
+    def use_string(self, value: str) -> str:
+        """
+        Return the symbol of the constant str object for the literal [value]. Literals
+        are named after their contents and merged by the linker, so that each distinct
+        literal exists once in the program and is never copied or allocated.
+        """
+
+        data = value.encode("utf-8")
+        name = "pyrite.str.{}".format(content_hash(value)[:16])
+        symbol = '@"{}"'.format(name)
+
+        # the constant holds the characters themselves, so its type has to spell out
+        # their number and is cast to %pyrite.str where the literal is used
+        literal_type = "{{ i64, i64, [{} x i8] }}".format(len(data) + 1)
+
+        if symbol not in self.declarations:
+            self.declarations[symbol] = '{} = linkonce_odr unnamed_addr constant {} {{ i64 {}, i64 {}, [{} x i8] c"{}\\00" }}'.format(
+                symbol, literal_type, len(data), len(value), len(data) + 1, _escape_bytes(data)
+            )
+
+        self.used.add(symbol)
+
+        return "bitcast ({}* {} to %pyrite.str*)".format(literal_type, symbol)
+
+    def emit(self) -> TranslationUnit:
+        functions: dict[str, tuple[str, tuple[str, ...]]] = {}
+        errors = ErrorCollector()
+
+        for function in self.module.get_global_scope().get_functions():
+            self.used = set()
+
+            try:
+                definition = _FunctionEmitter(self, function).emit()
+            except CompileError as err:
+                errors.add(err)
+                continue
+
+            functions[function.name] = (definition, tuple(sorted(self.used)))
+
+        errors.raise_errors()
+
+        return TranslationUnit(
+            module_id=self.module.id,
+            module_name=self.module.get_name(),
+            functions=functions,
+            declarations=self.declarations,
+            helpers=self.helpers
+        )
+
+
+class _FunctionEmitter:
+    _module_emitter: _ModuleEmitter
+    _module: Module
+    _function: TopLevelFunction
+    _symbols: FunctionSymbols
+    _allocas: list[str]
+    _lines: list[str]
+    # the stack slots and SSA values of the local variables, by slot index; arguments
+    # that are never assigned to are used directly as SSA values
+    _variables: list[Optional[_Variable]]
+    _arguments: list[Optional[_Value]]
+    # (continue label, break label) of the enclosing loops
+    _loops: list[tuple[str, str]]
+    _block: str
+    _terminated: bool
+    _counter: int
+    # the concatenations allocated from the arena (see pyrite.escape), the arena
+    # scopes of the enclosing loops, and whether the function allocates from the arena
+    _arena_sites: set[ast.AST]
+    _arena_loops: list[_ArenaScope]
+    _uses_arena: bool
+    # the (list slot, index slot) pairs of the enclosing loops over range(len(xs)) with
+    # loop variable i, whose items xs[i] are known to be in bounds
+    _unchecked_indexes: list[tuple[int, int]]
+    # the positions in _lines of the ret instructions of the function
+    _returns: list[int]
+    # instructions inserted into _lines once the function is emitted, along with the
+    # position they are inserted at
+    _insertions: list[tuple[int, str]]
+
+    def __init__(self, module_emitter: _ModuleEmitter, function: TopLevelFunction):
+        self._module_emitter = module_emitter
+        self._module = module_emitter.module
+        self._function = function
+        self._allocas = []
+        self._lines = []
+        self._loops = []
+        self._block = "entry"
+        self._terminated = False
+        self._counter = 0
+        self._arena_loops = []
+        self._uses_arena = False
+        self._unchecked_indexes = []
+        self._returns = []
+        self._insertions = []
+
+    # Basic blocks and instructions
+
+    def _new_temp(self) -> str:
+        self._counter += 1
+        return "%t{}".format(self._counter)
+
+    def _new_label(self, prefix: str) -> str:
+        self._counter += 1
+        return "{}{}".format(prefix, self._counter)
+
+    def _start_block(self, label: str) -> None:
+        if not self._terminated:
+            self._lines.append("  br label %{}".format(label))
+
+        self._lines.append("{}:".format(label))
+        self._block = label
+        self._terminated = False
+
+    def _emit(self, instruction: str) -> None:
+        if self._terminated:
+            # code following a terminator is unreachable, but must still be placed
+            # in a basic block
+            self._start_block(self._new_label("dead"))
+
+        self._lines.append("  " + instruction)
+
+    def _emit_value(self, instruction: str, type: Type) -> _Value:
+        temp = self._new_temp()
+        self._emit("{} = {}".format(temp, instruction))
+
+        return _Value(temp, type)
+
+    def _terminate(self, instruction: str) -> None:
+        self._emit(instruction)
+        self._terminated = True
+
+    def _jump(self, label: str) -> None:
+        if not self._terminated:
+            self._terminate("br label %{}".format(label))
+
+    def _branch(self, condition: _Value, if_true: str, if_false: str) -> None:
+        self._terminate("br i1 {}, label %{}, label %{}".format(condition.ir, if_true, if_false))
+
+    def _type(self, name: str) -> Type:
+        return self._module_emitter.get_type(name)
+
+    def _llvm_type(self, type: Type, node: ast.AST) -> str:
+        return get_llvm_type(type, node)
+
+    # Functions
+
+    def emit(self) -> str:
+        function = self._function
+        self._symbols = resolve_symbols(function, self._module_emitter.modules)
+        self._arena_sites = find_arena_allocations(function)
+        self._variables = [None] * len(self._symbols.names)
+        self._arguments = [None] * len(self._symbols.names)
+
+        try:
+            return self._emit_function()
+        finally:
+            clear_symbols(function)
+
+    def _emit_function(self) -> str:
+        function = self._function
+        node = function.node
+        parameters: list[str] = []
+
+        # the arguments occupy the first slots
+        for slot, (name, argument) in enumerate(function.get_arguments().items()):
+            llvm_type = self._llvm_type(argument.type, node)
+            value = _Value("%" + _local_name("arg." + name), argument.type)
+            parameters.append("{} {}".format(llvm_type, value.ir))
+
+            if self._symbols.assigned[slot]:
+                self._store(self._declare_variable(slot, argument.type, node), value, node)
+            else:
+                self._arguments[slot] = value
+
+        self._emit_block(node.body)
+
+        if not self._terminated:
+            if function.return_type.name == "None":
+                self._return("ret void")
+            else:
+                # falling off the end of a function that returns a value
+                self._terminate("unreachable")
+
+        if self._uses_arena:
+            mark = "%arena.mark"
+            self._insertions.append((0, "{} = call i8* {}()".format(
+                mark, self._module_emitter.use_helper("pyrite_arena_mark")
+            )))
+            self._insertions.extend((index, self._make_arena_release(mark)) for index in self._returns)
+
+        return "\n".join([
+            "define {} {}({}) #0 {{".format(
+                self._llvm_type(function.return_type, node),
+                get_symbol_name(function),
+                ", ".join(parameters)
+            ),
+            "entry:",
+            *self._allocas,
+            *self._apply_insertions(),
+            "}"
+        ])
+
+    def _apply_insertions(self) -> list[str]:
+        insertions: dict[int, list[str]] = {}
+
+        for index, instruction in self._insertions:
+            insertions.setdefault(index, []).append("  " + instruction)
+
+        lines: list[str] = []
+
+        for index, line in enumerate(self._lines):
+            lines.extend(insertions.get(index, []))
+            lines.append(line)
+
+        return lines
+
+    def _return(self, instruction: str) -> None:
+        if not self._terminated:
+            self._returns.append(len(self._lines))
+
+        self._terminate(instruction)
+
+    # Arena
+
+    def _make_arena_release(self, mark: str) -> str:
+        return "call void {}(i8* {})".format(
+            self._module_emitter.use_helper("pyrite_arena_release"), mark
+        )
+
+    def _allocates_from_arena(self, node: ast.AST) -> bool:
+        """
+        Return True if the object created by [node] is allocated from the arena, and
+        record that the function and the innermost loop use the arena if so
+        """
+
+        if node not in self._arena_sites:
+            return False
+
+        self._uses_arena = True
+
+        if self._arena_loops:
+            self._arena_loops[-1].used = True
+
+        return True
+
+    def _open_arena_scope(self) -> _ArenaScope:
+        """
+        Return the arena scope of a loop starting at the current position, before its
+        condition block
+        """
+
+        scope = _ArenaScope(None if self._terminated else len(self._lines))
+        self._arena_loops.append(scope)
+
+        return scope
+
+    def _release_arena_scope(self, scope: _ArenaScope) -> None:
+        """
+        Release the allocations of [scope] at the current position, which must be at
+        the start of a basic block
+        """
+
+        scope.releases.append(len(self._lines))
+
+    def _close_arena_scope(self, scope: _ArenaScope) -> None:
+        """
+        Take the arena mark of [scope] and release it, if its loop allocates from the
+        arena. The scope must have been left already, after the loop body.
+        """
+
+        if not scope.used or scope.start is None:
+            return
+
+        mark = self._new_label("%arena.mark")
+        self._insertions.append((scope.start, "{} = call i8* {}()".format(
+            mark, self._module_emitter.use_helper("pyrite_arena_mark")
+        )))
+        self._insertions.extend((index, self._make_arena_release(mark)) for index in scope.releases)
+
+    # Variables
+
+    def _declare_variable(self, slot: int, type: Type, node: ast.AST) -> _Variable:
+        pointer = "%" + _local_name(self._symbols.names[slot] + ".addr")
+        variable = _Variable(pointer, type)
+        self._allocas.append("  {} = alloca {}".format(pointer, self._llvm_type(type, node)))
+        self._variables[slot] = variable
+
+        return variable
+
+    def _store(self, variable: _Variable, value: _Value, node: ast.AST) -> None:
+        value = self._coerce(value, variable.type, node)
+        llvm_type = self._llvm_type(variable.type, node)
+        self._emit("store {} {}, {}* {}".format(llvm_type, value.ir, llvm_type, variable.pointer))
+
+    def _load(self, variable: _Variable, node: ast.AST) -> _Value:
+        llvm_type = self._llvm_type(variable.type, node)
+
+        return self._emit_value(
+            "load {}, {}* {}".format(llvm_type, llvm_type, variable.pointer), variable.type
+        )
+
+    def _get_target_type(self, target: ast.expr) -> Optional[Type]:
+        """
+        Return the type that values assigned to [target] are converted to, if it is
+        known before the value is evaluated
+        """
+
+        if isinstance(target, ast.Subscript):
+            sequence = self._get_target_type(target.value) if isinstance(target.value, ast.Name) else None
+            return get_element_type(sequence) if sequence else None
+
+        slot = get_slot(target) if isinstance(target, ast.Name) else None
+
+        if slot is None:
+            return None
+
+        variable = self._variables[slot]
+        argument = self._arguments[slot]
+
+        return variable.type if variable else argument.type if argument else None
+
+    def _assign(self, target: ast.expr, value: _Value, annotation: Optional[ast.expr] = None) -> None:
+        if isinstance(target, ast.Subscript) and not isinstance(target.slice, ast.Slice):
+            sequence = self._emit_expression(target.value)
+            value = self._coerce(value, self._get_item_type(sequence, target), target)
+            self._store_item(sequence, self._emit_index(target, sequence), value, target)
+            return
+
+        slot = get_slot(target) if isinstance(target, ast.Name) else None
+
+        if slot is None:
+            raise SemanticError(target, "Unsupported assignment target")
+
+        type = self._module.resolve_type(annotation) if annotation is not None else None
+        variable = self._variables[slot]
+
+        if variable and type and variable.type != type:
+            raise SemanticError(
+                target, "Variable {} was already declared with type {}".format(
+                    repr(target.id), repr(variable.type.name)
+                )
+            )
+
+        if not variable:
+            variable = self._declare_variable(slot, type or value.type, target)
+
+        self._store(variable, value, target)
+
+    # Statements
+
+    def _emit_block(self, statements: list[ast.stmt]) -> None:
+        for statement in statements:
+            self._emit_statement(statement)
+
+    def _emit_statement(self, node: ast.stmt) -> None:
+        if isinstance(node, ast.Expr):
+            # docstrings and other constant expressions have no effect
+            if not isinstance(node.value, ast.Constant):
+                self._emit_expression(node.value, allow_none=True)
+        elif isinstance(node, ast.Pass):
+            pass
+        elif isinstance(node, ast.Assign):
+            if len(node.targets) != 1:
+                raise SemanticError(node, "Chained assignments are not supported yet")
+
+            target = node.targets[0]
+            self._assign(target, self._emit_expression(node.value, expected=self._get_target_type(target)))
+        elif isinstance(node, ast.AnnAssign):
+            if node.value is None:
+                raise SemanticError(node, "Variable declarations must have a value")
+
+            value = self._emit_expression(node.value, expected=self._module.resolve_type(node.annotation))
+            self._assign(node.target, value, node.annotation)
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Subscript):
+            self._emit_item_update(node, node.target)
+        elif isinstance(node, ast.AugAssign):
+            current = self._emit_expression(node.target)
+            value = self._emit_binary_operator(node.op, current, self._emit_expression(node.value), node)
+            self._assign(node.target, value)
+        elif isinstance(node, ast.Return):
+            self._emit_return(node)
+        elif isinstance(node, ast.If):
+            self._emit_if(node)
+        elif isinstance(node, ast.While):
+            self._emit_while(node)
+        elif isinstance(node, ast.For):
+            self._emit_for(node)
+        elif isinstance(node, (ast.Break, ast.Continue)):
+            if not self._loops:
+                raise SemanticError(node, "{} outside of a loop".format(
+                    "break" if isinstance(node, ast.Break) else "continue"
+                ))
+
+            continue_label, break_label = self._loops[-1]
+            self._terminate("br label %{}".format(
+                break_label if isinstance(node, ast.Break) else continue_label
+            ))
+        else:
+            raise SemanticError(node, "Unsupported statement")
+
+    def _emit_return(self, node: ast.Return) -> None:
+        return_type = self._function.return_type
+        returns_none = node.value is None or (
+            isinstance(node.value, ast.Constant) and node.value.value is None
+        )
+
+        if return_type.name == "None":
+            if not returns_none:
+                raise SemanticError(node, "Function does not return a value")
+
+            self._return("ret void")
+            return
+
+        if returns_none:
+            raise SemanticError(node, "Function must return a value of type {}".format(
+                repr(return_type.name)
+            ))
+
+        value = self._coerce(self._emit_expression(unwrap(node.value), expected=return_type), return_type, node)
+        self._return("ret {} {}".format(self._llvm_type(return_type, node), value.ir))
+
+    def _emit_if(self, node: ast.If) -> None:
+        then_label = self._new_label("if.then")
+        else_label = self._new_label("if.else")
+        end_label = self._new_label("if.end")
+
+        self._branch(self._emit_condition(node.test), then_label, else_label if node.orelse else end_label)
+
+        self._start_block(then_label)
+        self._emit_block(node.body)
+
+        if node.orelse:
+            self._jump(end_label)
+            self._start_block(else_label)
+            self._emit_block(node.orelse)
+
+        self._start_block(end_label)
+
+    def _emit_loop_body(self, node: ast.stmt, body: list[ast.stmt], continue_label: str, break_label: str) -> None:
+        self._loops.append((continue_label, break_label))
+        self._emit_block(body)
+        self._loops.pop()
+
+    def _emit_while(self, node: ast.While) -> None:
+        condition_label = self._new_label("while.cond")
+        body_label = self._new_label("while.body")
+        else_label = self._new_label("while.else")
+        end_label = self._new_label("while.end")
+        arena = self._open_arena_scope()
+
+        self._start_block(condition_label)
+        self._release_arena_scope(arena)
+        self._branch(self._emit_condition(node.test), body_label, else_label)
+
+        self._start_block(body_label)
+        self._emit_loop_body(node, node.body, condition_label, end_label)
+        self._jump(condition_label)
+        self._arena_loops.pop()
+        self._emit_loop_exit(node, arena, else_label, end_label)
+
+    def _emit_loop_exit(self, node: Union[ast.While, ast.For], arena: _ArenaScope, else_label: str, end_label: str) -> None:
+        """
+        Emit the else clause of the loop [node], which runs when the loop ends without a
+        break, and the end of the loop, where a break jumps to. The allocations of the
+        last iteration are released before the else clause, which does not belong to
+        the iterations (see pyrite.escape).
+        """
+
+        self._start_block(else_label)
+
+        if node.orelse:
+            exit_label = self._new_label("loop.exit")
+            self._release_arena_scope(arena)
+            self._emit_block(node.orelse)
+            self._jump(exit_label)
+            self._start_block(end_label)
+            self._release_arena_scope(arena)
+            self._start_block(exit_label)
+        else:
+            self._start_block(end_label)
+            self._release_arena_scope(arena)
+
+        self._close_arena_scope(arena)
+
+    def _emit_for(self, node: ast.For) -> None:
+        """
+        Lower a loop over range(...) or over the items of a list. The loop counter is
+        kept separately from the loop variable, so that assigning to the loop variable
+        does not affect the iteration, as in Python.
+        """
+
+        iterator = node.iter
+
+        if (
+            isinstance(iterator, ast.Call)
+            and isinstance(iterator.func, ast.Name)
+            and iterator.func.id == "range"
+            and get_slot(iterator.func) is None
+            and get_symbol(iterator.func) is None
+        ):
+            self._emit_for_range(node, iterator)
+            return
+
+        iterable = self._emit_expression(iterator)
+        item_type = get_element_type(iterable.type)
+
+        if item_type is None:
+            raise SemanticError(iterator, "Only loops over range() and lists are supported yet")
+
+        int_type = self._type("int")
+
+        # the length is read again by every iteration, since the body may append to the
+        # list, as in Python; items below it need no bounds check
+        def condition(current: _Value) -> _Value:
+            length = self._list_field(iterable, 0, int_type)
+            return self._emit_value("icmp slt i64 {}, {}".format(current.ir, length.ir), self._type("bool"))
+
+        self._emit_counting_loop(
+            node, _Value("0", int_type), _Value("1", int_type), condition,
+            lambda current: self._load_item(iterable, current, node)
+        )
+
+    def _emit_for_range(self, node: ast.For, iterator: ast.Call) -> None:
+        if iterator.keywords or not 1 <= len(iterator.args) <= 3:
+            raise SemanticError(iterator, "range() takes 1 to 3 positional arguments")
+
+        int_type = self._type("int")
+        bool_type = self._type("bool")
+        bounds = [
+            self._coerce(self._emit_expression(arg), int_type, arg)
+            for arg in iterator.args
+        ]
+
+        if len(bounds) == 1:
+            start, stop, step = _Value("0", int_type), bounds[0], _Value("1", int_type)
+        elif len(bounds) == 2:
+            start, stop, step = bounds[0], bounds[1], _Value("1", int_type)
+        else:
+            start, stop, step = bounds
+
+        step_node = iterator.args[2] if len(iterator.args) == 3 else None
+        constant_step = (
+            step_node.value if isinstance(step_node, ast.Constant) else
+            1 if step_node is None else None
+        )
+
+        if constant_step == 0:
+            raise SemanticError(step_node, "range() step must not be zero")
+
+        def condition(current: _Value) -> _Value:
+            if constant_step is not None:
+                return self._emit_value("icmp {} i64 {}, {}".format(
+                    "slt" if constant_step > 0 else "sgt", current.ir, stop.ir
+                ), bool_type)
+
+            ascending = self._emit_value("icmp sgt i64 {}, 0".format(step.ir), bool_type)
+            below = self._emit_value("icmp slt i64 {}, {}".format(current.ir, stop.ir), bool_type)
+            above = self._emit_value("icmp sgt i64 {}, {}".format(current.ir, stop.ir), bool_type)
+            return self._emit_value("select i1 {}, i1 {}, i1 {}".format(
+                ascending.ir, below.ir, above.ir
+            ), bool_type)
+
+        self._emit_counting_loop(
+            node, start, step, condition, lambda current: current, self._get_unchecked_index(node, iterator)
+        )
+
+    def _emit_counting_loop(
+        self,
+        node: ast.For,
+        start: _Value,
+        step: _Value,
+        condition: Callable[[_Value], _Value],
+        item: Callable[[_Value], _Value],
+        unchecked_index: Optional[tuple[int, int]] = None
+    ) -> None:
+        """
+        Lower the for loop [node] as a loop over a counter going from [start] by [step]
+        while [condition] holds for it. Each iteration assigns [item] of the counter to
+        the loop variable. If [unchecked_index] is given, indexing the list of its
+        slot with the variable of its index slot needs no bounds check in the body.
+        """
+
+        int_type = self._type("int")
+        counter = self._new_label("%for.counter")
+        self._allocas.append("  {} = alloca i64".format(counter))
+        self._emit("store i64 {}, i64* {}".format(start.ir, counter))
+
+        condition_label = self._new_label("for.cond")
+        body_label = self._new_label("for.body")
+        increment_label = self._new_label("for.inc")
+        else_label = self._new_label("for.else")
+        end_label = self._new_label("for.end")
+        arena = self._open_arena_scope()
+
+        self._start_block(condition_label)
+        self._release_arena_scope(arena)
+        current = self._emit_value("load i64, i64* {}".format(counter), int_type)
+        self._branch(condition(current), body_label, else_label)
+
+        self._start_block(body_label)
+        self._assign(node.target, item(current))
+
+        if unchecked_index:
+            self._unchecked_indexes.append(unchecked_index)
+
+        self._emit_loop_body(node, node.body, increment_label, end_label)
+
+        if unchecked_index:
+            self._unchecked_indexes.pop()
+
+        self._start_block(increment_label)
+        current = self._emit_value("load i64, i64* {}".format(counter), int_type)
+        following = self._emit_value("add nsw i64 {}, {}".format(current.ir, step.ir), int_type)
+        self._emit("store i64 {}, i64* {}".format(following.ir, counter))
+        self._terminate("br label %{}".format(condition_label))
+        self._arena_loops.pop()
+        self._emit_loop_exit(node, arena, else_label, end_label)
+
+    def _get_unchecked_index(self, node: ast.For, iterator: ast.Call) -> Optional[tuple[int, int]]:
+        """
+        Return the (list slot, index slot) pair if [node] is a loop over range(len(xs))
+        or range(start, len(xs)), with a non-negative constant start, whose variable i
+        indexes xs within bounds throughout the body. Lists never shrink, so this holds
+        as long as the body assigns neither xs nor i.
+        """
+
+        args = iterator.args
+
+        if len(args) == 2 and not (
+            isinstance(args[0], ast.Constant) and type(args[0].value) is int and args[0].value >= 0
+        ):
+            return None
+
+        if not 1 <= len(args) <= 2 or not isinstance(node.target, ast.Name):
+            return None
+
+        length = args[-1]
+        index_slot = get_slot(node.target)
+
+        # len(xs) is inlined as _ext_len(xs)
+        if (
+            not isinstance(length, ast.Call)
+            or not isinstance(length.func, ast.Name)
+            or length.func.id != "_ext_len"
+            or not self._is_compiler_defined(length.func)
+            or len(length.args) != 1
+            or not isinstance(length.args[0], ast.Name)
+        ):
+            return None
+
+        list_slot = get_slot(length.args[0])
+
+        if list_slot is None or index_slot is None:
+            return None
+
+        for statement in node.body:
+            for child in ast.walk(statement):
+                if (
+                    isinstance(child, ast.Name)
+                    and not isinstance(child.ctx, ast.Load)
+                    and get_slot(child) in (list_slot, index_slot)
+                ):
+                    return None
+
+        return (list_slot, index_slot)
+
+    # Expressions
+
+    def _coerce(self, value: _Value, type: Type, node: ast.AST) -> _Value:
+        """
+        Convert [value] to [type] where Python would treat it as one implicitly
+        """
+
+        source = value.type.name
+        target = type.name
+
+        if source == target:
+            return value
+
+        if target == "float" and re.fullmatch(r"-?[0-9]+", value.ir):
+            return _Value(_format_float(float(value.ir)), type)
+
+        if target == "float" and source in _INTEGER_TYPES:
+            widened = self._widen_integer(value, node)
+            return self._emit_value("sitofp i64 {} to double".format(widened.ir), type)
+
+        if target in ("int", "_ext_Pointer") and source in _INTEGER_TYPES:
+            return _Value(self._widen_integer(value, node).ir, type)
+
+        if target == "_ext_Char" and source in ("int", "_ext_Pointer"):
+            return self._emit_value("trunc i64 {} to i8".format(value.ir), type)
+
+        raise SemanticError(node, "Expected a value of type {}, but got {}".format(
+            repr(target), repr(source)
+        ))
+
+    def _widen_integer(self, value: _Value, node: ast.AST) -> _Value:
+        """
+        Return the integer-like [value] as an int
+        """
+
+        int_type = self._type("int")
+
+        if value.type.name == "bool":
+            return self._emit_value("zext i1 {} to i64".format(value.ir), int_type)
+        if value.type.name == "_ext_Char":
+            return self._emit_value("zext i8 {} to i64".format(value.ir), int_type)
+        if value.type.name in _INTEGER_TYPES:
+            return _Value(value.ir, int_type)
+
+        raise SemanticError(node, "Expected an integer, but got {}".format(repr(value.type.name)))
+
+    def _str_field(self, value: _Value, index: int, type: Type) -> _Value:
+        """
+        Load the size in bytes (0) or the length in code points (1) of the str [value]
+        """
+
+        pointer = self._emit_value("getelementptr inbounds %pyrite.str, %pyrite.str* {}, i32 0, i32 {}".format(
+            value.ir, index
+        ), type)
+
+        return self._emit_value("load i64, i64* {}".format(pointer.ir), type)
+
+    # Lists
+
+    def _list_field_pointer(self, value: _Value, index: int) -> _Value:
+        return self._emit_value("getelementptr inbounds %pyrite.list, %pyrite.list* {}, i32 0, i32 {}".format(
+            value.ir, index
+        ), self._type("_ext_Pointer"))
+
+    def _list_field(self, value: _Value, index: int, type: Type) -> _Value:
+        """
+        Load the length (0), the capacity (1) or the item pointer (2) of the list
+        [value]
+        """
+
+        field_type = "i8*" if index == 2 else "i64"
+        pointer = self._list_field_pointer(value, index)
+
+        return self._emit_value("load {0}, {0}* {1}".format(field_type, pointer.ir), type)
+
+    def _get_item_type(self, sequence: _Value, node: ast.AST) -> Type:
+        item_type = get_element_type(sequence.type)
+
+        if item_type is None:
+            raise SemanticError(node, "Values of type {} cannot be indexed".format(repr(sequence.type.name)))
+
+        return item_type
+
+    def _item_pointer(self, sequence: _Value, index: _Value, node: ast.AST) -> _Value:
+        """
+        Return a pointer to the item of the list [sequence] at [index], which must be
+        in bounds
+        """
+
+        item_type = self._get_item_type(sequence, node)
+        llvm_type = self._llvm_type(item_type, node)
+        data = self._list_field(sequence, 2, self._type("_ext_Pointer"))
+        items = self._emit_value("bitcast i8* {} to {}*".format(data.ir, llvm_type), data.type)
+
+        return self._emit_value("getelementptr inbounds {0}, {0}* {1}, i64 {2}".format(
+            llvm_type, items.ir, index.ir
+        ), data.type)
+
+    def _load_item(self, sequence: _Value, index: _Value, node: ast.AST) -> _Value:
+        item_type = self._get_item_type(sequence, node)
+        llvm_type = self._llvm_type(item_type, node)
+        pointer = self._item_pointer(sequence, index, node)
+
+        return self._emit_value("load {0}, {0}* {1}".format(llvm_type, pointer.ir), item_type)
+
+    def _store_item(self, sequence: _Value, index: _Value, value: _Value, node: ast.AST) -> None:
+        """
+        Store [value] into the list [sequence] at [index], which must be in bounds. A
+        list that does not own its items, or shares them with views, copies them
+        first.
+        """
+
+        int_type = self._type("int")
+        item_type = self._get_item_type(sequence, node)
+        capacity = self._list_field(sequence, 1, int_type)
+        owned = self._emit_value("icmp sgt i64 {}, 0".format(capacity.ir), self._type("bool"))
+        copy_label = self._new_label("list.copy")
+        store_label = self._new_label("list.store")
+        self._branch(owned, store_label, copy_label)
+
+        self._start_block(copy_label)
+        length = self._list_field(sequence, 0, int_type)
+        self._reserve(sequence, length, item_type)
+        self._jump(store_label)
+
+        self._start_block(store_label)
+        pointer = self._item_pointer(sequence, index, node)
+        llvm_type = self._llvm_type(item_type, node)
+        self._emit("store {0} {1}, {0}* {2}".format(llvm_type, value.ir, pointer.ir))
+
+    def _reserve(self, sequence: _Value, needed: _Value, item_type: Type) -> None:
+        self._emit("call void {}(%pyrite.list* {}, i64 {}, i64 {})".format(
+            self._module_emitter.use_helper("pyrite.list_reserve"), sequence.ir, needed.ir, item_type.size_bytes
+        ))
+
+    def _trap_unless(self, condition: _Value, prefix: str) -> None:
+        ok_label = self._new_label(prefix + ".ok")
+        trap_label = self._new_label(prefix + ".error")
+        self._branch(condition, ok_label, trap_label)
+
+        self._start_block(trap_label)
+        self._emit("call void {}()".format(self._module_emitter.use_helper("llvm.trap")))
+        self._terminate("unreachable")
+
+        self._start_block(ok_label)
+
+    def _emit_index(self, node: ast.Subscript, sequence: _Value) -> _Value:
+        """
+        Return the index of the item of the list [sequence] that [node] refers to.
+        Negative indexes count from the end, as in Python, and indexes out of bounds
+        trap, since Pyrite does not support exceptions yet.
+        """
+
+        int_type = self._type("int")
+        index = self._coerce(self._emit_expression(node.slice), int_type, node.slice)
+
+        if (
+            isinstance(node.value, ast.Name)
+            and isinstance(node.slice, ast.Name)
+            and (get_slot(node.value), get_slot(node.slice)) in self._unchecked_indexes
+        ):
+            return index
+
+        length = self._list_field(sequence, 0, int_type)
+
+        if not re.fullmatch(r"[0-9]+", index.ir):
+            negative = self._emit_value("icmp slt i64 {}, 0".format(index.ir), self._type("bool"))
+            wrapped = self._emit_value("add i64 {}, {}".format(index.ir, length.ir), int_type)
+            index = self._emit_value("select i1 {}, i64 {}, i64 {}".format(
+                negative.ir, wrapped.ir, index.ir
+            ), int_type)
+
+        in_bounds = self._emit_value("icmp ult i64 {}, {}".format(index.ir, length.ir), self._type("bool"))
+        self._trap_unless(in_bounds, "index")
+
+        return index
+
+    def _emit_subscript(self, node: ast.Subscript, share: bool = True) -> _Value:
+        """
+        Lower an item or slice of a list. Unless [share] is unset, which is only valid
+        for slices whose list cannot change while they are in use (see
+        pyrite.escape.lends_slices), a slice marks its list as shared.
+        """
+
+        sequence = self._emit_expression(node.value)
+        item_type = self._get_item_type(sequence, node)
+
+        if not isinstance(node.slice, ast.Slice):
+            return self._load_item(sequence, self._emit_index(node, sequence), node)
+
+        bounds = node.slice
+        int_type = self._type("int")
+
+        if bounds.step is not None:
+            raise SemanticError(bounds.step, "Slices with a step are not supported yet")
+
+        start, stop = [
+            self._coerce(self._emit_expression(bound), int_type, bound) if bound else _Value(default, int_type)
+            for bound, default in ((bounds.lower, "0"), (bounds.upper, _SLICE_END))
+        ]
+
+        return self._emit_value("call %pyrite.list* {}(%pyrite.list* {}, i64 {}, i64 {}, i64 {}, i1 {})".format(
+            self._module_emitter.use_helper(
+                "pyrite.list_arena_slice" if self._allocates_from_arena(node) else "pyrite.list_slice"
+            ),
+            sequence.ir,
+            start.ir,
+            stop.ir,
+            item_type.size_bytes,
+            "true" if share else "false"
+        ), sequence.type)
+
+    def _emit_item_update(self, node: ast.AugAssign, target: ast.Subscript) -> None:
+        """
+        Lower xs[i] op= value, evaluating xs and i once
+        """
+
+        if isinstance(target.slice, ast.Slice):
+            raise SemanticError(target, "Unsupported assignment target")
+
+        sequence = self._emit_expression(target.value)
+        index = self._emit_index(target, sequence)
+        current = self._load_item(sequence, index, target)
+        value = self._emit_binary_operator(node.op, current, self._emit_expression(node.value), node)
+        self._store_item(sequence, index, self._coerce(value, current.type, node), target)
+
+    def _emit_list(self, node: ast.List, item_type: Optional[Type]) -> _Value:
+        """
+        Lower the list display [node]. The type of its items is [item_type] if it is
+        known from where the list is used, or otherwise inferred from the items.
+        """
+
+        if any(isinstance(item, ast.Starred) for item in node.elts):
+            raise SemanticError(node, "Unpacking in list displays is not supported yet")
+
+        values = [self._emit_expression(item, expected=item_type) for item in node.elts]
+
+        if item_type is None:
+            names = {value.type.name for value in values}
+
+            if not values:
+                raise SemanticError(node, "The type of an empty list must be declared, as in xs: list[int] = []")
+
+            if len(names) == 1:
+                item_type = values[0].type
+            elif names <= _INTEGER_TYPES:
+                item_type = self._type("int")
+            elif names <= _INTEGER_TYPES | {"float"}:
+                item_type = self._type("float")
+            else:
+                raise SemanticError(node, "The items of a list must have the same type")
+
+        items = [self._coerce(value, item_type, item) for value, item in zip(values, node.elts)]
+        sequence = self._emit_value("call %pyrite.list* {}(i64 {}, i64 {})".format(
+            self._module_emitter.use_helper("pyrite.list_new"), len(items), item_type.size_bytes
+        ), make_list_type(item_type))
+
+        for index, item in enumerate(items):
+            pointer = self._item_pointer(sequence, _Value(str(index), self._type("int")), node)
+            llvm_type = self._llvm_type(item_type, node)
+            self._emit("store {0} {1}, {0}* {2}".format(llvm_type, item.ir, pointer.ir))
+
+        return sequence
+
+    def _emit_method_call(self, func: ast.Attribute, node: ast.Call) -> _Value:
+        """
+        Lower a call to a method of a list: xs.append(x) or xs.extend(ys)
+        """
+
+        receiver = self._emit_expression(func.value)
+        item_type = get_element_type(receiver.type)
+
+        if item_type is None:
+            raise SemanticError(func, "Values of type {} have no methods yet".format(repr(receiver.type.name)))
+
+        if func.attr not in ("append", "extend"):
+            raise SemanticError(func, "Unsupported list method {}".format(repr(func.attr)))
+
+        if len(node.args) != 1:
+            raise SemanticError(node, "{} expects 1 argument, but got {}".format(repr(func.attr), len(node.args)))
+
+        arg = node.args[0]
+        expected = item_type if func.attr == "append" else receiver.type
+        value = self._coerce(self._emit_expression(arg, expected=expected), expected, arg)
+
+        if func.attr == "append":
+            self._emit_append(receiver, value, node)
+        else:
+            self._emit_extend(receiver, value, node)
+
+        return _Value("", self._type("None"))
+
+    def _emit_append(self, sequence: _Value, value: _Value, node: ast.AST) -> None:
+        int_type = self._type("int")
+        item_type = self._get_item_type(sequence, node)
+        length = self._list_field(sequence, 0, int_type)
+        capacity = self._list_field(sequence, 1, int_type)
+        following = self._emit_value("add nsw i64 {}, 1".format(length.ir), int_type)
+
+        # lists without a buffer of their own have a capacity of 0 or less
+        full = self._emit_value("icmp sge i64 {}, {}".format(length.ir, capacity.ir), self._type("bool"))
+        grow_label = self._new_label("append.grow")
+        store_label = self._new_label("append.store")
+        self._branch(full, grow_label, store_label)
+
+        self._start_block(grow_label)
+        self._reserve(sequence, following, item_type)
+        self._jump(store_label)
+
+        self._start_block(store_label)
+        pointer = self._item_pointer(sequence, length, node)
+        llvm_type = self._llvm_type(item_type, node)
+        self._emit("store {0} {1}, {0}* {2}".format(llvm_type, value.ir, pointer.ir))
+        self._emit("store i64 {}, i64* {}".format(following.ir, self._list_field_pointer(sequence, 0).ir))
+
+    def _emit_extend(self, sequence: _Value, other: _Value, node: ast.AST) -> None:
+        """
+        Append the items of the list [other] to [sequence] with a single copy. The
+        items of [other] are read after [sequence] has grown, so that xs.extend(xs)
+        copies the items of xs into its new buffer.
+        """
+
+        int_type = self._type("int")
+        item_type = self._get_item_type(sequence, node)
+        length = self._list_field(sequence, 0, int_type)
+        count = self._list_field(other, 0, int_type)
+        needed = self._emit_value("add nsw i64 {}, {}".format(length.ir, count.ir), int_type)
+        capacity = self._list_field(sequence, 1, int_type)
+        full = self._emit_value("icmp sgt i64 {}, {}".format(needed.ir, capacity.ir), self._type("bool"))
+        grow_label = self._new_label("extend.grow")
+        copy_label = self._new_label("extend.copy")
+        self._branch(full, grow_label, copy_label)
+
+        self._start_block(grow_label)
+        self._reserve(sequence, needed, item_type)
+        self._jump(copy_label)
+
+        self._start_block(copy_label)
+        pointer_type = self._type("_ext_Pointer")
+        data = self._list_field(sequence, 2, pointer_type)
+        offset = self._emit_value("mul nsw i64 {}, {}".format(length.ir, item_type.size_bytes), int_type)
+        destination = self._emit_value("getelementptr inbounds i8, i8* {}, i64 {}".format(data.ir, offset.ir), pointer_type)
+        source = self._list_field(other, 2, pointer_type)
+        size = self._emit_value("mul nsw i64 {}, {}".format(count.ir, item_type.size_bytes), int_type)
+        self._emit("call void {}(i8* {}, i8* {}, i64 {}, i1 false)".format(
+            self._module_emitter.use_helper("llvm.memcpy.p0i8.p0i8.i64"), destination.ir, source.ir, size.ir
+        ))
+        self._emit("store i64 {}, i64* {}".format(needed.ir, self._list_field_pointer(sequence, 0).ir))
+
+    def _truth_value(self, value: _Value, node: ast.AST) -> _Value:
+        bool_type = self._type("bool")
+        name = value.type.name
+
+        if name == "bool":
+            return value
+        if name == "float":
+            return self._emit_value("fcmp une double {}, 0.0".format(value.ir), bool_type)
+        if name in _INTEGER_TYPES:
+            return self._emit_value("icmp ne {} {}, 0".format(_LLVM_TYPES[name], value.ir), bool_type)
+        if name == "str":
+            length = self._str_field(value, 0, self._type("int"))
+            return self._emit_value("icmp ne i64 {}, 0".format(length.ir), bool_type)
+        if get_element_type(value.type) is not None:
+            length = self._list_field(value, 0, self._type("int"))
+            return self._emit_value("icmp ne i64 {}, 0".format(length.ir), bool_type)
+
+        raise SemanticError(node, "Values of type {} cannot be used as a condition".format(repr(name)))
+
+    def _emit_condition(self, node: ast.expr) -> _Value:
+        return self._truth_value(self._emit_expression(node), node)
+
+    def _emit_expression(self, node: ast.expr, allow_none: bool = False, expected: Optional[Type] = None) -> _Value:
+        """
+        Lower the expression [node]. [expected] is the type its value is converted to,
+        if known, which list displays take their item type from.
+        """
+
+        conversions = get_conversions(node)
+        value = self._convert_inlined(
+            self._emit_expression_value(node, conversions[0] if conversions else expected),
+            node
+        )
+
+        if value.type.name == "None" and not allow_none:
+            raise SemanticError(node, "Expression does not have a value")
+
+        return value
+
+    def _convert_inlined(self, value: _Value, node: ast.expr) -> _Value:
+        """
+        Apply the conversions of the inlined expression [node] (see pyrite.inliner) to
+        its [value]
+        """
+
+        for type in get_conversions(node):
+            value = self._coerce(value, type, node)
+
+        return value
+
+    def _emit_expression_value(self, node: ast.expr, expected: Optional[Type]) -> _Value:
+        if isinstance(node, ast.Constant):
+            return self._emit_constant(node.value, node)
+
+        if isinstance(node, ast.Name):
+            slot = get_slot(node)
+
+            if slot is None:
+                return self._emit_global(node)
+
+            variable = self._variables[slot]
+            argument = self._arguments[slot]
+
+            if variable:
+                return self._load(variable, node)
+            if argument:
+                return argument
+
+            raise SemanticError(node, "Variable {} is used before it is assigned".format(repr(node.id)))
+
+        if isinstance(node, ast.Attribute):
+            return self._emit_global(node)
+
+        if isinstance(node, ast.BinOp):
+            left = self._emit_expression(node.left)
+            right = self._emit_expression(node.right)
+
+            return self._emit_binary_operator(node.op, left, right, node)
+
+        if isinstance(node, ast.UnaryOp):
+            return self._emit_unary_operator(node)
+
+        if isinstance(node, ast.Compare):
+            return self._emit_comparison(node)
+
+        if isinstance(node, ast.BoolOp):
+            return self._emit_boolean_operator(node)
+
+        if isinstance(node, ast.IfExp):
+            return self._emit_conditional_expression(node)
+
+        if isinstance(node, ast.Call):
+            return self._emit_call(node)
+
+        if isinstance(node, ast.List):
+            return self._emit_list(node, get_element_type(expected) if expected else None)
+
+        if isinstance(node, ast.Subscript):
+            return self._emit_subscript(node)
+
+        raise SemanticError(node, "Unsupported expression")
+
+    def _emit_constant(self, value: object, node: ast.AST) -> _Value:
+        if isinstance(value, bool):
+            return _Value("true" if value else "false", self._type("bool"))
+
+        if isinstance(value, int):
+            if not -(2 ** 63) <= value < 2 ** 63:
+                raise SemanticError(node, "Integer constant does not fit into 64 bits")
+
+            return _Value(str(value), self._type("int"))
+
+        if isinstance(value, float):
+            return _Value(_format_float(value), self._type("float"))
+
+        if isinstance(value, str):
+            return _Value(self._module_emitter.use_string(value), self._type("str"))
+
+        raise SemanticError(node, "Unsupported constant")
+
+    def _emit_global(self, node: ast.expr) -> _Value:
+        symbol = get_symbol(node)
+
+        if not isinstance(symbol, ModuleConstant):
+            raise SemanticError(node, "Unresolved symbol {}".format(repr(ast.unparse(node))))
+
+        return self._emit_constant(symbol.value, node)
+
+    def _emit_binary_operator(self, op: ast.operator, left: _Value, right: _Value, node: ast.AST) -> _Value:
+        int_type = self._type("int")
+        float_type = self._type("float")
+        bool_type = self._type("bool")
+        names = {left.type.name, right.type.name}
+
+        if names == {"bool"} and isinstance(op, (ast.BitAnd, ast.BitOr, ast.BitXor)):
+            return self._emit_value("{} i1 {}, {}".format(
+                _INT_ARITHMETIC[type(op)], left.ir, right.ir
+            ), bool_type)
+
+        if names == {"str"} and isinstance(op, ast.Add):
+            result = self._emit_value("call %pyrite.str* {}(%pyrite.str* {}, %pyrite.str* {})".format(
+                self._module_emitter.use_helper(
+                    "pyrite.str_arena_concat" if self._allocates_from_arena(node) else "pyrite.str_concat"
+                ),
+                left.ir,
+                right.ir
+            ), left.type)
+            operands = (
+                [(node.left, left), (node.right, right)] if isinstance(node, ast.BinOp) else
+                [(node.value, right)] if isinstance(node, ast.AugAssign) else
+                []
+            )
+
+            # a string operand that is itself a concatenation is a new string which
+            # nothing else refers to: it is freed as soon as it has been copied, so
+            # that chained concatenations reuse its block
+            for operand, value in operands:
+                if (
+                    isinstance(operand, ast.BinOp)
+                    and isinstance(operand.op, ast.Add)
+                    and operand not in self._arena_sites
+                ):
+                    self._emit("call void {}(%pyrite.str* {})".format(
+                        self._module_emitter.use_helper("pyrite.str_free"), value.ir
+                    ))
+
+            return result
+
+        if names <= _INTEGER_TYPES:
+            left = self._widen_integer(left, node)
+            right = self._widen_integer(right, node)
+
+            if type(op) in _INT_ARITHMETIC:
+                return self._emit_value("{} i64 {}, {}".format(
+                    _INT_ARITHMETIC[type(op)], left.ir, right.ir
+                ), int_type)
+
+            if isinstance(op, ast.Div):
+                return self._emit_binary_operator(
+                    op, self._coerce(left, float_type, node), self._coerce(right, float_type, node), node
+                )
+
+            helper = {ast.FloorDiv: "pyrite.floordiv", ast.Mod: "pyrite.mod", ast.Pow: "pyrite.ipow"}.get(type(op))
+
+            if helper:
+                return self._emit_value("call i64 {}(i64 {}, i64 {})".format(
+                    self._module_emitter.use_helper(helper), left.ir, right.ir
+                ), int_type)
+        elif names <= _INTEGER_TYPES | {"float"}:
+            left = self._coerce(left, float_type, node)
+            right = self._coerce(right, float_type, node)
+
+            if type(op) in _FLOAT_ARITHMETIC:
+                return self._emit_value("{} double {}, {}".format(
+                    _FLOAT_ARITHMETIC[type(op)], left.ir, right.ir
+                ), float_type)
+
+            if isinstance(op, ast.FloorDiv):
+                quotient = self._emit_value("fdiv double {}, {}".format(left.ir, right.ir), float_type)
+                return self._emit_value("call double {}(double {})".format(
+                    self._module_emitter.use_helper("llvm.floor.f64"), quotient.ir
+                ), float_type)
+
+            helper = {ast.Mod: "pyrite.fmod", ast.Pow: "llvm.pow.f64"}.get(type(op))
+
+            if helper:
+                return self._emit_value("call double {}(double {}, double {})".format(
+                    self._module_emitter.use_helper(helper), left.ir, right.ir
+                ), float_type)
+
+        raise SemanticError(node, "Unsupported operand types for {}: {} and {}".format(
+            type(op).__name__, repr(left.type.name), repr(right.type.name)
+        ))
+
+    def _emit_unary_operator(self, node: ast.UnaryOp) -> _Value:
+        operand = self._emit_expression(node.operand)
+
+        if isinstance(node.op, ast.Not):
+            truth = self._truth_value(operand, node)
+            return self._emit_value("xor i1 {}, true".format(truth.ir), self._type("bool"))
+
+        if operand.type.name == "float":
+            if isinstance(node.op, ast.USub):
+                return self._emit_value("fneg double {}".format(operand.ir), operand.type)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+        elif operand.type.name in _INTEGER_TYPES:
+            operand = self._widen_integer(operand, node)
+
+            if isinstance(node.op, ast.USub):
+                return self._emit_value("sub nsw i64 0, {}".format(operand.ir), operand.type)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            if isinstance(node.op, ast.Invert):
+                return self._emit_value("xor i64 {}, -1".format(operand.ir), operand.type)
+
+        raise SemanticError(node, "Unsupported operand type for {}: {}".format(
+            type(node.op).__name__, repr(operand.type.name)
+        ))
+
+    def _compare(self, op: ast.cmpop, left: _Value, right: _Value, node: ast.AST) -> _Value:
+        bool_type = self._type("bool")
+        names = {left.type.name, right.type.name}
+
+        if type(op) not in _INT_COMPARISONS:
+            raise SemanticError(node, "Unsupported comparison")
+
+        if names <= _INTEGER_TYPES:
+            left = self._widen_integer(left, node)
+            right = self._widen_integer(right, node)
+
+            return self._emit_value("icmp {} i64 {}, {}".format(
+                _INT_COMPARISONS[type(op)], left.ir, right.ir
+            ), bool_type)
+
+        if names <= _INTEGER_TYPES | {"float"}:
+            float_type = self._type("float")
+            left = self._coerce(left, float_type, node)
+            right = self._coerce(right, float_type, node)
+
+            return self._emit_value("fcmp {} double {}, {}".format(
+                _FLOAT_COMPARISONS[type(op)], left.ir, right.ir
+            ), bool_type)
+
+        if names == {"str"} and isinstance(op, (ast.Eq, ast.NotEq)):
+            equal = self._emit_value("call i1 {}(%pyrite.str* {}, %pyrite.str* {})".format(
+                self._module_emitter.use_helper("pyrite.str_eq"), left.ir, right.ir
+            ), bool_type)
+
+            if isinstance(op, ast.Eq):
+                return equal
+
+            return self._emit_value("xor i1 {}, true".format(equal.ir), bool_type)
+
+        raise SemanticError(node, "Cannot compare values of types {} and {}".format(
+            repr(left.type.name), repr(right.type.name)
+        ))
+
+    def _emit_comparison(self, node: ast.Compare) -> _Value:
+        left = self._emit_expression(node.left)
+
+        if len(node.ops) == 1:
+            return self._compare(node.ops[0], left, self._emit_expression(node.comparators[0]), node)
+
+        # a < b < c evaluates b once, and stops at the first false comparison
+        end_label = self._new_label("cmp.end")
+        incoming: list[tuple[str, str]] = []
+
+        for index, (op, comparator) in enumerate(zip(node.ops, node.comparators)):
+            right = self._emit_expression(comparator)
+            result = self._compare(op, left, right, node)
+
+            if index == len(node.ops) - 1:
+                incoming.append((result.ir, self._block))
+                self._terminate("br label %{}".format(end_label))
+            else:
+                next_label = self._new_label("cmp.next")
+                incoming.append(("false", self._block))
+                self._branch(result, next_label, end_label)
+                self._start_block(next_label)
+
+            left = right
+
+        self._start_block(end_label)
+
+        return self._emit_value("phi i1 {}".format(", ".join(
+            "[ {}, %{} ]".format(value, label) for value, label in incoming
+        )), self._type("bool"))
+
+    def _emit_boolean_operator(self, node: ast.BoolOp) -> _Value:
+        """
+        Lower [and] and [or], which evaluate to one of their operands, as in Python.
+        All operands must have the same type.
+        """
+
+        end_label = self._new_label("bool.end")
+        incoming: list[tuple[str, str]] = []
+        result_type: Optional[Type] = None
+
+        for index, operand in enumerate(node.values):
+            value = self._emit_expression(operand)
+
+            if result_type is None:
+                result_type = value.type
+            elif value.type != result_type:
+                raise SemanticError(operand, "Operands of {} must have the same type".format(
+                    "and" if isinstance(node.op, ast.And) else "or"
+                ))
+
+            if index == len(node.values) - 1:
+                incoming.append((value.ir, self._block))
+                self._terminate("br label %{}".format(end_label))
+                break
+
+            truth = self._truth_value(value, operand)
+            next_label = self._new_label("bool.next")
+            incoming.append((value.ir, self._block))
+
+            if isinstance(node.op, ast.And):
+                self._branch(truth, next_label, end_label)
+            else:
+                self._branch(truth, end_label, next_label)
+
+            self._start_block(next_label)
+
+        self._start_block(end_label)
+        result_type = result_type or self._type("bool")
+
+        return self._emit_value("phi {} {}".format(
+            self._llvm_type(result_type, node),
+            ", ".join("[ {}, %{} ]".format(value, label) for value, label in incoming)
+        ), result_type)
+
+    def _emit_conditional_expression(self, node: ast.IfExp) -> _Value:
+        then_label = self._new_label("cond.then")
+        else_label = self._new_label("cond.else")
+        end_label = self._new_label("cond.end")
+
+        self._branch(self._emit_condition(node.test), then_label, else_label)
+
+        self._start_block(then_label)
+        then_value = self._emit_expression(node.body)
+        then_block = self._block
+        self._terminate("br label %{}".format(end_label))
+
+        self._start_block(else_label)
+        else_value = self._emit_expression(node.orelse)
+        else_block = self._block
+        self._terminate("br label %{}".format(end_label))
+
+        if then_value.type != else_value.type:
+            raise SemanticError(node, "Both branches of a conditional expression must have the same type")
+
+        self._start_block(end_label)
+
+        return self._emit_value("phi {} [ {}, %{} ], [ {}, %{} ]".format(
+            self._llvm_type(then_value.type, node),
+            then_value.ir, then_block, else_value.ir, else_block
+        ), then_value.type)
+
+    def _emit_call(self, node: ast.Call) -> _Value:
+        if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise SemanticError(node, "Only positional arguments are supported yet")
+
+        function = get_symbol(node.func)
+
+        if not isinstance(function, TopLevelFunction):
+            func = node.func
+
+            if isinstance(func, ast.Name) and self._is_compiler_defined(func):
+                return self._emit_extern_call(func.id, node)
+
+            # a method of a value, rather than a function of a module
+            if isinstance(func, ast.Attribute) and not (
+                isinstance(func.value, ast.Name) and get_slot(func.value) is None
+            ):
+                return self._emit_method_call(func, node)
+
+            raise SemanticError(node.func, "Unresolved function {}".format(repr(ast.unparse(node.func))))
+
+        parameters = list(function.get_arguments().values())
+
+        if len(parameters) != len(node.args):
+            raise SemanticError(node, "{} expects {} arguments, but got {}".format(
+                repr(function.name), len(parameters), len(node.args)
+            ))
+
+        lent = lends_slices(node)
+        args = [
+            self._coerce(
+                self._convert_inlined(self._emit_subscript(arg, share=False), arg)
+                if lent and isinstance(arg, ast.Subscript) and isinstance(arg.slice, ast.Slice) else
+                self._emit_expression(arg, expected=parameter.type),
+                parameter.type,
+                arg
+            )
+            for arg, parameter in zip(node.args, parameters)
+        ]
+        symbol = self._module_emitter.use_function(function, node)
+        arg_list = ", ".join(
+            "{} {}".format(self._llvm_type(arg.type, node), arg.ir) for arg in args
+        )
+
+        if function.return_type.name == "None":
+            self._emit("call void {}({})".format(symbol, arg_list))
+            return _Value("", function.return_type)
+
+        return self._emit_value("call {} {}({})".format(
+            self._llvm_type(function.return_type, node), symbol, arg_list
+        ), function.return_type)
+
+    def _is_compiler_defined(self, func: ast.Name) -> bool:
+        # compiler-defined functions are only available to stdlib/_internal and to code
+        # inlined from it
+        return func.id.startswith("_ext_") and (
+            self._module.is_internal_module() or get_origin(func) == "_internal"
+        )
+
+    def _emit_extern_call(self, name: str, node: ast.Call) -> _Value:
+        """
+        Lower a call to a compiler-defined function of stdlib/_compiler_defined
+        """
+
+        args = [self._emit_expression(arg) for arg in node.args]
+        expected = {
+            "_ext_to_ptr": 1, "_ext_malloc": 1, "_ext_calloc": 1, "_ext_free": 1,
+            "_ext_abort": 0, "_ext_cos": 1, "_ext_get_byte": 1, "_ext_strlen": 1,
+            "_ext_memcpy": 3, "_ext_str_alloc": 2, "_ext_str_data": 1, "_ext_str_size": 1,
+            "_ext_utf8_length": 2,
+            "_ext_alloc": 1, "_ext_alloc_zeroed": 1, "_ext_dealloc": 2, "_ext_len": 1
+        }
+
+        if name not in expected:
+            raise SemanticError(node, "Unsupported compiler-defined function {}".format(repr(name)))
+
+        if len(args) != expected[name]:
+            raise SemanticError(node, "{} expects {} arguments".format(repr(name), expected[name]))
+
+        pointer_type = self._type("_ext_Pointer")
+        emitter = self._module_emitter
+
+        if name == "_ext_to_ptr":
+            return self._coerce(args[0], pointer_type, node)
+
+        if name in ("_ext_malloc", "_ext_calloc"):
+            size = self._coerce(args[0], pointer_type, node)
+            call = (
+                "call i8* {}(i64 {})".format(emitter.use_libc_function("malloc"), size.ir)
+                if name == "_ext_malloc" else
+                "call i8* {}(i64 {}, i64 1)".format(emitter.use_libc_function("calloc"), size.ir)
+            )
+            pointer = self._emit_value(call, pointer_type)
+            return self._emit_value("ptrtoint i8* {} to i64".format(pointer.ir), pointer_type)
+
+        if name in ("_ext_alloc", "_ext_alloc_zeroed"):
+            size = self._coerce(args[0], pointer_type, node)
+            pointer = self._emit_value("call i8* {}(i64 {})".format(
+                emitter.use_helper("pyrite_alloc" if name == "_ext_alloc" else "pyrite_alloc_zeroed"), size.ir
+            ), pointer_type)
+            return self._emit_value("ptrtoint i8* {} to i64".format(pointer.ir), pointer_type)
+
+        if name == "_ext_dealloc":
+            address = self._coerce(args[0], pointer_type, node)
+            size = self._coerce(args[1], pointer_type, node)
+            pointer = self._emit_value("inttoptr i64 {} to i8*".format(address.ir), pointer_type)
+            self._emit("call void {}(i8* {}, i64 {})".format(emitter.use_helper("pyrite_free"), pointer.ir, size.ir))
+            return _Value("", self._type("None"))
+
+        if name == "_ext_free":
+            address = self._coerce(args[0], pointer_type, node)
+            pointer = self._emit_value("inttoptr i64 {} to i8*".format(address.ir), pointer_type)
+            self._emit("call void {}(i8* {})".format(emitter.use_libc_function("free"), pointer.ir))
+            return _Value("", self._type("None"))
+
+        if name == "_ext_abort":
+            self._emit("call void {}()".format(emitter.use_libc_function("abort")))
+            return _Value("", self._type("None"))
+
+        if name == "_ext_cos":
+            x = self._coerce(args[0], self._type("float"), node)
+            return self._emit_value("call double {}(double {})".format(
+                emitter.use_libc_function("cos"), x.ir
+            ), self._type("float"))
+
+        if name == "_ext_strlen":
+            address = self._coerce(args[0], pointer_type, node)
+            pointer = self._emit_value("inttoptr i64 {} to i8*".format(address.ir), pointer_type)
+            return self._emit_value("call i64 {}(i8* {})".format(
+                emitter.use_libc_function("strlen"), pointer.ir
+            ), self._type("int"))
+
+        if name == "_ext_memcpy":
+            destination, source = [
+                self._emit_value("inttoptr i64 {} to i8*".format(self._coerce(arg, pointer_type, node).ir), pointer_type)
+                for arg in args[:2]
+            ]
+            size = self._coerce(args[2], self._type("int"), node)
+            self._emit("call void {}(i8* {}, i8* {}, i64 {}, i1 false)".format(
+                emitter.use_helper("llvm.memcpy.p0i8.p0i8.i64"), destination.ir, source.ir, size.ir
+            ))
+            return _Value("", self._type("None"))
+
+        if name == "_ext_str_alloc":
+            size, length = [self._coerce(arg, self._type("int"), node) for arg in args]
+            return self._emit_value("call %pyrite.str* {}(i64 {}, i64 {})".format(
+                emitter.use_helper("pyrite.str_alloc"), size.ir, length.ir
+            ), self._type("str"))
+
+        if name == "_ext_utf8_length":
+            address = self._coerce(args[0], pointer_type, node)
+            pointer = self._emit_value("inttoptr i64 {} to i8*".format(address.ir), pointer_type)
+            size = self._coerce(args[1], self._type("int"), node)
+            return self._emit_value("call i64 {}(i8* {}, i64 {})".format(
+                emitter.use_helper("pyrite.utf8_length"), pointer.ir, size.ir
+            ), self._type("int"))
+
+        if name == "_ext_len":
+            if get_element_type(args[0].type) is not None:
+                return self._list_field(args[0], 0, self._type("int"))
+
+            if args[0].type.name != "str":
+                raise SemanticError(node, "Values of type {} have no length".format(repr(args[0].type.name)))
+
+            return self._str_field(args[0], 1, self._type("int"))
+
+        if name in ("_ext_str_data", "_ext_str_size"):
+            s = self._coerce(args[0], self._type("str"), node)
+
+            if name == "_ext_str_size":
+                return self._str_field(s, 0, self._type("int"))
+
+            data = self._emit_value("getelementptr inbounds %pyrite.str, %pyrite.str* {}, i32 0, i32 2, i64 0".format(
+                s.ir
+            ), pointer_type)
+            return self._emit_value("ptrtoint i8* {} to i64".format(data.ir), pointer_type)
+
+        # _ext_get_byte
+        address = self._coerce(args[0], pointer_type, node)
+        pointer = self._emit_value("inttoptr i64 {} to i8*".format(address.ir), pointer_type)
+        return self._emit_value("load i8, i8* {}".format(pointer.ir), self._type("_ext_Char"))
+
+
+def emit_module(module: Module, modules: dict[str, ModuleView]) -> TranslationUnit:
+    """
+    Return the LLVM IR translation unit for the analyzed [module]. [modules] maps the
+    names of the modules of the program to the modules themselves or their interfaces.
+    """
+
+    return _ModuleEmitter(module, modules).emit()
+
+
+def emit_entry_point(module: Module) -> str:
+    """
+    Return a translation unit defining the C entry point of a program whose entry
+    module is [module]. The program starts by calling the module's main() function,
+    whose return value, if any, is the exit status of the process. With
+    CompilerOptions.alloc_stats, the allocator statistics are reported once main()
+    returns.
+    """
+
+    main = next(
+        (function for function in module.get_global_scope().get_functions() if function.name == "main"),
+        None
+    )
+
+    if main is None or main.get_arguments() or main.return_type.name not in ("int", "None"):
+        raise UserError(
+            "The entry module {} must define a function main() -> int".format(
+                repr(module.get_name())
+            )
+        )
+
+    symbol = get_symbol_name(main)
+    report = Globals.get_compiler_options().alloc_stats
+    lines = [
+        "; ModuleID = 'pyrite_entry'",
+        "source_filename = \"pyrite_entry\"",
+        ""
+    ]
+
+    if report:
+        lines.append(_RUNTIME_FUNCTIONS["pyrite_alloc_report"])
+
+    if main.return_type.name == "None":
+        lines.extend([
+            "declare void {}()".format(symbol),
+            "",
+            "define i32 @main() {",
+            "  call void {}()".format(symbol)
+        ])
+        status = "0"
+    else:
+        lines.extend([
+            "declare i64 {}()".format(symbol),
+            "",
+            "define i32 @main() {",
+            "  %status = call i64 {}()".format(symbol),
+            "  %code = trunc i64 %status to i32"
+        ])
+        status = "%code"
+
+    if report:
+        lines.append("  call void @pyrite_alloc_report()")
+
+    lines.extend([
+        "  ret i32 {}".format(status),
+        "}"
+    ])
+
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,9 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 import subprocess
+import threading
+from typing import Optional
 import pyrite.util as util
 import shutil
 
@@ -8,16 +12,63 @@ import shutil
 class CommandOutput:
     stdout: str
     stderr: str
+    returncode: int
 
 
-def run_command(args: list[str]) -> CommandOutput:
-    """Run a command, returning the output of the child process"""
+class PendingCommand:
+    """
+    A child process started by run_command_async. Its input is written and its output
+    collected on a background thread, so the caller can keep working in the meantime.
+    """
+
+    _process: subprocess.Popen
+    _thread: threading.Thread
+    _output: Optional[CommandOutput]
+
+    def __init__(self, args: list[str], input: Optional[str]):
+        self._output = None
+        self._process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        self._thread = threading.Thread(
+            target=self._communicate,
+            args=(input.encode("utf8") if input is not None else None,),
+            daemon=True
+        )
+        self._thread.start()
+
+    def _communicate(self, input: Optional[bytes]) -> None:
+        stdout, stderr = self._process.communicate(input)
+
+        self._output = CommandOutput(
+            util.with_unix_endl(stdout.decode("utf8")),
+            util.with_unix_endl(stderr.decode("utf8")),
+            self._process.returncode
+        )
 
-    p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    def is_done(self) -> bool:
+        return not self._thread.is_alive()
 
-    stdout, stderr = p.communicate()
+    def wait(self) -> CommandOutput:
+        """Block until the child process exits, returning its output"""
 
-    stdout = util.with_unix_endl(stdout.decode("utf8"))
-    stderr = util.with_unix_endl(stderr.decode("utf8"))
+        self._thread.join()
+        return util.unwrap(self._output)
+
+
+def run_command_async(args: list[str], input: Optional[str] = None) -> PendingCommand:
+    """
+    Start a command without waiting for it to finish. If [input] is given, it is
+    streamed to the child process's stdin.
+    """
+
+    return PendingCommand(args, input)
+
+
+def run_command(args: list[str], input: Optional[str] = None) -> CommandOutput:
+    """Run a command, returning the output of the child process"""
 
-    return CommandOutput(stdout, stderr)
+    return run_command_async(args, input).wait()
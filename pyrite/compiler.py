@@ -1,55 +1,388 @@
+from __future__ import annotations
+
+from concurrent.futures import Executor
+from os.path import join
 from pathlib import Path
 from typing import Optional
+from pyrite import instrumentation
+from pyrite.artifacts import make_artifact_store
+from pyrite.cache import ModuleCache, make_interface_key, make_module_key, restore_module
+from pyrite.codegen import emit_entry_point
 from pyrite.console import CompileLogger
 from pyrite.errors import CompileError, UserError
 from pyrite.globals import CompilerOptions, Globals
+from pyrite.instrumentation import phase
+from pyrite.interface import ModuleInterface
 from pyrite.llvm import LLVMInterface
 from pyrite.module import Module, ModuleSource, ModuleType
+from pyrite.prelude import Prelude, load_prelude, make_internal_module
+from pyrite.reachability import find_reachable_functions
+from pyrite.runtime import get_runtime_library
+from pyrite.scheduler import ModuleGraph, compile_in_pool, compile_module, make_worker_pool, report_cycle
+from pyrite.toolchain import Toolchain
+
+
+def _get_warm_key(source: ModuleSource) -> str:
+    if source.type == ModuleType.SOURCE_STRING:
+        return source.get_qualifier()
+
+    return source.get_source_path()
 
 
 class Compiler:
+    """
+    A Compiler may be built any number of times. Modules whose source and dependencies
+    are unchanged since the previous build are kept analyzed in memory and are not
+    compiled again.
+    """
+
+    _root_sources: list[ModuleSource]
+    _entry_source: Optional[ModuleSource]
     _modules: list[Module]
     _entry_module: Optional[Module]
     _llvm: LLVMInterface
+    _prelude: Optional[Prelude]
+
+    # modules of the previous build, by source path
+    _warm_modules: dict[str, Module]
 
     def __init__(self):
+        self._root_sources = []
+        self._entry_source = None
         self._modules = []
         self._entry_module = None
         self._llvm = LLVMInterface()
+        self._prelude = None
+        self._warm_modules = {}
 
-    def _register_module(self, source: ModuleSource) -> Module:
-        module = Module(source)
-        self._modules.append(module)
-
-        return module
+    def _register_module(self, source: ModuleSource) -> None:
+        self._root_sources.append(source)
 
-    def _stdlib_include(self, module_name: str) -> None:
-        self._register_module(ModuleSource(
+    def _stdlib_include(self, module_name: str) -> ModuleSource:
+        return ModuleSource(
             type=ModuleType.STDLIB,
             qualifier=module_name
-        ))
+        )
 
     def add_source_file(self, path: str, is_main: bool) -> None:
-        module = self._register_module(ModuleSource(
+        source = ModuleSource(
             type=ModuleType.SOURCE_FILE,
             qualifier=path
-        ))
+        )
+        self._register_module(source)
 
         if is_main:
-            self._entry_module = module
+            self._entry_source = source
+
+    def _make_module(self, source: ModuleSource) -> Module:
+        """
+        Return the module for [source], reusing the module of the previous build if its
+        source code has not changed since
+        """
+
+        warm = self._warm_modules.get(_get_warm_key(source))
+
+        if warm and not warm.has_source_changed():
+            return warm
+
+        return Module(source)
+
+    def get_source_paths(self) -> list[str]:
+        """
+        Return the paths of the source files of every module in the last build
+        """
+
+        return [
+            module.get_source_path()
+            for module in self._modules
+            if module.get_source().type != ModuleType.SOURCE_STRING
+        ]
+
+    def _get_prelude(self, logger: CompileLogger) -> Optional[Prelude]:
+        """
+        Return the stdlib/_internal prelude, building it on first use. The prelude is
+        shared by every module compiled during this session.
+        """
+
+        if self._prelude:
+            return self._prelude
+
+        internal = make_internal_module()
+
+        try:
+            with phase("prelude"):
+                self._prelude = load_prelude(internal)
+        except CompileError as err:
+            logger.log_compile_error(internal, err)
+        except UserError as err:
+            logger.log_user_error(err)
+
+        return self._prelude
 
-    def build(self) -> None:
-        logger = CompileLogger(
-            enable_color=Globals.get_compiler_options().enable_color
+    def load_prelude(self) -> bool:
+        """
+        Load the prelude ahead of the first build, which otherwise loads it on demand.
+        Return False, after reporting the error, if it fails to compile.
+        """
+
+        logger = CompileLogger(enable_color=Globals.get_compiler_options().enable_color)
+
+        return self._get_prelude(logger) is not None
+
+    def get_toolchain(self) -> Toolchain:
+        """
+        Return the clang toolchain, discovering it if this has not been done yet
+        """
+
+        return self._llvm.get_toolchain()
+
+    def build(self) -> bool:
+        """
+        Compile every module and, if CompilerOptions.output_path is set, build the
+        executable. Return True if no errors occurred.
+        """
+
+        opts = Globals.get_compiler_options()
+        recording = opts.time_report or bool(opts.trace_path)
+
+        if recording:
+            instrumentation.start_recording()
+
+        try:
+            return self._build()
+        finally:
+            self._llvm.cleanup()
+
+            if recording:
+                self._report_phases(instrumentation.stop_recording())
+
+    def _report_phases(self, events: list[instrumentation.PhaseEvent]) -> None:
+        """
+        Print and/or save the phases recorded during a build, as requested by
+        CompilerOptions.time_report and CompilerOptions.trace_path
+        """
+
+        opts = Globals.get_compiler_options()
+
+        if opts.time_report:
+            print(instrumentation.format_report(events))
+
+        if opts.trace_path:
+            instrumentation.write_chrome_trace(events, join(opts.cwd, opts.trace_path))
+
+    def _build(self) -> bool:
+        opts = Globals.get_compiler_options()
+        logger = CompileLogger(enable_color=opts.enable_color)
+
+        prelude = self._get_prelude(logger)
+
+        if not prelude:
+            return False
+
+        roots = self._root_sources + [
+            self._stdlib_include(module_name)
+            for module_name in opts.stdlib_include
+        ]
+
+        with phase("discovery"):
+            graph = ModuleGraph([self._make_module(source) for source in roots], self._make_module)
+
+        self._modules = graph.get_modules()
+        self._warm_modules = {
+            _get_warm_key(module.get_source()): module
+            for module in self._modules
+        }
+        self._entry_module = (
+            self._warm_modules[_get_warm_key(self._entry_source)]
+            if self._entry_source else None
         )
 
-        for module in self._modules:
+        diagnostics = list(graph.diagnostics)
+        cycle = graph.find_cycle()
+
+        if cycle:
+            diagnostics.append(report_cycle(cycle))
+        else:
             try:
-                module.compile()
-            except CompileError as err:
-                logger.log_compile_error(module, err)
+                diagnostics.extend(self._compile_graph(graph, prelude))
             except UserError as err:
                 logger.log_user_error(err)
-    
+                return False
+
+        logger.log_diagnostics(diagnostics)
+
+        if diagnostics:
+            return False
+
+        if not opts.output_path:
+            return True
+
+        try:
+            self._build_executable(prelude, opts.output_path)
+        except UserError as err:
+            logger.log_user_error(err)
+            return False
+
+        return True
+
+    def _build_executable(self, prelude: Prelude, output_path: str) -> None:
+        """
+        Compile every user module to a separate object file, reusing unchanged objects
+        from previous builds, and link them against the prebuilt runtime library into
+        [output_path]. Only the functions reachable from main are compiled (see
+        pyrite.reachability).
+        """
+
+        opts = Globals.get_compiler_options()
+
+        if not self._entry_module:
+            raise UserError("An executable can only be built with an entry module")
+
+        entry_point = self._llvm.submit_object("pyrite_entry", emit_entry_point(self._entry_module))
+
+        with phase("tree shaking"):
+            reachable = find_reachable_functions(
+                self._entry_module,
+                {module.get_name(): module for module in self._modules}
+            )
+
+        # objects are compiled in the background while the runtime library is loaded
+        objects = [
+            self._llvm.submit_object(module.get_name(), module.get_ir(reachable[module.get_name()]))
+            for module in self._modules
+            if not module.is_stdlib_module() and module.get_name() in reachable
+        ]
+        runtime_library = get_runtime_library(self._llvm, prelude)
+        object_paths = [future.result() for future in objects] + [entry_point.result()]
+
+        self._llvm.link(
+            object_paths,
+            join(opts.cwd, output_path),
+            libraries=[runtime_library]
+        )
+
+    def _compile_graph(self, graph: ModuleGraph, prelude: Prelude) -> list[tuple[Module, CompileError]]:
+        """
+        Compile every module of [graph] in dependency order, returning the resulting
+        diagnostics in a stable order. Independent modules are compiled concurrently
+        if CompilerOptions.jobs allows it.
+        """
+
+        jobs = Globals.get_compiler_options().jobs
+        cache = self._get_module_cache()
+        diagnostics: list[tuple[Module, CompileError]] = []
+        pool: Optional[Executor] = None
+        levels = graph.get_levels()
+        # the interfaces of the modules compiled so far, by name, and their interface
+        # keys (see make_interface_key), by module id
+        interfaces: dict[str, ModuleInterface] = {}
+        interface_keys: dict[str, str] = {}
+
+        self._modules = [module for level in levels for module in level]
+
+        try:
+            for level in levels:
+                pending: list[tuple[Module, str, list[Module]]] = []
+                compiled: list[Module] = []
+
+                for module in level:
+                    dependencies = graph.get_dependencies(module)
+
+                    # a module is not checked against a dependency that failed to
+                    # compile, whose errors have been reported already
+                    if any(dependency.id not in interface_keys for dependency in dependencies):
+                        continue
+
+                    module.attach_prelude(prelude)
+                    key = make_module_key(module, prelude.source_hash, [
+                        interface_keys[dependency.id] for dependency in dependencies
+                    ])
+                    compiled.append(module)
+
+                    # still analyzed from the previous build
+                    if module.analysis_key == key:
+                        continue
+
+                    module.analysis_key = None
+
+                    if cache:
+                        with phase("cache load", module.get_name()):
+                            loaded = cache.load(module, key)
+
+                        if loaded:
+                            module.analysis_key = key
+                            continue
+
+                    pending.append((module, key, graph.get_transitive_dependencies(module)))
+
+                # modules are optimized and lowered along with their analysis, against
+                # the interfaces of the modules they import
+                if jobs > 1 and len(pending) > 1:
+                    pool = pool or make_worker_pool(
+                        jobs,
+                        prelude,
+                        self._get_module_cache_directory()
+                    )
+                    results = compile_in_pool(pool, [
+                        (module, key, [
+                            (dependency.get_name(), interfaces[dependency.get_name()].data)
+                            for dependency in dependencies
+                        ])
+                        for module, key, dependencies in pending
+                    ])
+                else:
+                    results = [compile_module(module, interfaces) for module, _, _ in pending]
+
+                failed: set[str] = set()
+
+                for (module, key, _), result in zip(pending, results):
+                    if isinstance(result, UserError):
+                        raise result
+                    if isinstance(result, CompileError):
+                        diagnostics.append((module, result))
+                        failed.add(module.id)
+                        continue
+
+                    if isinstance(result, bytes):
+                        # compiled and stored in the module cache by a worker process
+                        with phase("restore", module.get_name()):
+                            restore_module(module, result)
+                    elif cache:
+                        with phase("cache store", module.get_name()):
+                            cache.store(module, key)
+
+                    module.analysis_key = key
+
+                for module in compiled:
+                    if module.id in failed:
+                        continue
+
+                    interface = module.get_interface()
+                    interface.attach_prelude(prelude)
+                    interfaces[module.get_name()] = interface
+                    interface_keys[module.id] = make_interface_key(interface, [
+                        interface_keys[dependency.id]
+                        for dependency in graph.get_dependencies(module)
+                    ])
+        finally:
+            if pool:
+                pool.shutdown()
+
+        return diagnostics
+
+    def _get_module_cache_directory(self) -> Optional[str]:
+        if not Globals.get_compiler_options().incremental:
+            return None
+
+        return join(self._llvm.get_build_directory(), "cache")
+
+    def _get_module_cache(self) -> Optional[ModuleCache]:
+        directory = self._get_module_cache_directory()
+
+        if not directory:
+            return None
+
+        return ModuleCache(make_artifact_store(directory))
+
     def get_global_options(self) -> CompilerOptions:
         return Globals.get_compiler_options()
\ No newline at end of file
@@ -1,9 +1,18 @@
+import sys
 from typing import Any, Optional
-from termcolor import colored
-from pyrite.errors import CompileError, SemanticError, UserError
+from pyrite.errors import CompileError, SemanticError, UserError, flatten_errors
 from pyrite.module import Module
 
 
+def _get_error_location(error: CompileError) -> tuple[int, int]:
+    # errors without a location come first
+    if isinstance(error, SemanticError):
+        node = error.offending_node
+        return (getattr(node, "lineno", 0), getattr(node, "col_offset", 0))
+
+    return (0, 0)
+
+
 class CompileLogger:
     enable_color: bool
 
@@ -12,6 +21,8 @@ class CompileLogger:
 
     def _colored(self, text: Any, color: Optional[str] = None) -> str:
         if self.enable_color:
+            # termcolor is only imported if color is enabled
+            from termcolor import colored
             return colored(str(text), color)
 
         return str(text)
@@ -22,31 +33,56 @@ class CompileLogger:
             for line in text.split("\n")
         )
 
-    def log_compile_error(self, module: Module, error: CompileError) -> None:
-        print(self._colored(
-            'Error in module {}:'.format(
-                self._colored(module.get_source_path(), color="cyan"),
-            ),
-            color="red"
-        ))
-
+    def _format_error(self, module: Module, error: CompileError) -> str:
         if isinstance(error, SemanticError):
             line_no = error.offending_node.lineno
 
-            print(self._colored(self._indented(
+            return self._colored(self._indented(
                 "on line {}: {}\n| {}".format(
                     line_no,
                     error.message,
                     module.get_source().get_line_content(line_no)
                 )
-            ), color="red"))
-        else:
-            print(self._colored(self._indented(
-                "error: {}".format(
-                    error.message
-                )
-            ), color="red"))
-    
+            ), color="red")
+
+        return self._colored(self._indented(
+            "error: {}".format(
+                error.message
+            )
+        ), color="red")
+
+    def log_compile_error(self, module: Module, error: CompileError) -> None:
+        self.log_diagnostics([(module, error)])
+
+    def log_diagnostics(self, diagnostics: list[tuple[Module, CompileError]]) -> None:
+        """
+        Print every error of [diagnostics], grouped by module in the order the modules
+        first appear and sorted by location within each module, in a single write
+        """
+
+        errors_by_module: dict[str, tuple[Module, list[CompileError]]] = {}
+
+        for module, error in diagnostics:
+            errors_by_module.setdefault(module.id, (module, []))[1].extend(flatten_errors(error))
+
+        lines: list[str] = []
+
+        for module, errors in errors_by_module.values():
+            lines.append(self._colored(
+                'Error in module {}:'.format(
+                    self._colored(module.get_source_path(), color="cyan"),
+                ),
+                color="red"
+            ))
+            lines.extend(
+                self._format_error(module, error)
+                for error in sorted(errors, key=_get_error_location)
+            )
+
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+
     def log_user_error(self, err: UserError):
         print(self._colored(
             "error: "+err.message,
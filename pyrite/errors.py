@@ -24,6 +24,61 @@ class SemanticError(CompileError):
         self.offending_node = offending_node
         self.message = message
 
+    def __reduce__(self):
+        # errors are passed between worker processes during parallel builds
+        return (type(self), (self.offending_node, self.message))
+
+
+class CompileErrorGroup(CompileError):
+    """
+    Class for the code errors found in a single module, when there is more than one
+    """
+    errors: list[CompileError]
+
+    def __init__(self, errors: list[CompileError]):
+        super().__init__("{} errors".format(len(errors)))
+        self.errors = errors
+
+    def __reduce__(self):
+        return (type(self), (self.errors,))
+
+
+def flatten_errors(error: CompileError) -> list[CompileError]:
+    """
+    Return the individual errors that [error] consists of
+    """
+
+    if isinstance(error, CompileErrorGroup):
+        return [child for err in error.errors for child in flatten_errors(err)]
+
+    return [error]
+
+
+class ErrorCollector:
+    """
+    Collects code errors, so that analysis can continue past an error and report every
+    error of a module at once. Independent units of work, such as the top-level
+    functions of a module, should each be wrapped in a try block that passes any
+    CompileError to add(); raise_errors() is called once all of them are done.
+    """
+    errors: list[CompileError]
+
+    def __init__(self):
+        self.errors = []
+
+    def add(self, error: CompileError) -> None:
+        self.errors.extend(flatten_errors(error))
+
+    def raise_errors(self) -> None:
+        """
+        Raise the collected errors, if any: a single error is raised as is
+        """
+
+        if len(self.errors) == 1:
+            raise self.errors[0]
+        if self.errors:
+            raise CompileErrorGroup(list(self.errors))
+
 
 class UserError(Exception):
     """
@@ -0,0 +1,340 @@
+"""
+Escape analysis of the objects allocated by a function. The analysis is concerned with
+the strings created by concatenation (a + b, s += a) and the list views created by
+slicing (xs[a:b]), which only hold a pointer into the items of the sliced list. Such an
+object escapes its function if it is returned, stored into a list, or may be returned
+or stored by a function it is passed to; otherwise, it can only be used until the
+function returns, and is allocated from the runtime arena (see stdlib/allocator.ll)
+instead of the heap: the arena works like a second stack, whose blocks are released
+all at once when the function returns.
+
+Inside a loop, the temporaries created by each iteration must not add up, so a
+string is only allocated from the arena if its last use is always within the same
+iteration of the innermost loop around it, which releases the blocks allocated by
+each iteration when it ends. This is the case for strings that are only consumed by
+the expression or statement creating them (len(a + b), a + b == c), and for strings
+stored in a variable that is only used in the loop body, and assigned at the top of
+it before any other use. Other strings that do not escape are still allocated from
+the heap.
+
+Since Pyrite has no globals yet, an object passed to a function can only outlive the
+call if the function returns an object, or takes a list that objects can be stored
+into. The analysis does not depend on the types of expressions: it considers every
+concatenation, slice and variable, and code generation only uses its results for
+string concatenations and list slices.
+"""
+
+from __future__ import annotations
+
+import ast
+from typing import Union
+from pyrite.module import TopLevelFunction, Type, get_element_type
+from pyrite.resolution import get_slot, get_symbol
+
+# Where the value of an expression goes: it is used up by its parent expression or
+# statement, or it is stored in the local variable of a slot, or it escapes
+_CONSUMED = -1
+_ESCAPES = -2
+
+# Compiler-defined functions that only read the object passed to them
+_CONSUMING_BUILTINS = {"_ext_str_size", "_ext_len"}
+
+_Loop = Union[ast.For, ast.While]
+
+
+def _is_concatenation(node: ast.AST) -> bool:
+    return (
+        isinstance(node, (ast.BinOp, ast.AugAssign))
+        and isinstance(node.op, ast.Add)
+    )
+
+
+def _is_slice(node: ast.AST) -> bool:
+    return isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice)
+
+
+def _is_object(type: Type) -> bool:
+    return type.name == "str" or get_element_type(type) is not None
+
+
+def _holds_objects(type: Type) -> bool:
+    element = get_element_type(type)
+
+    return element is not None and _is_object(element)
+
+
+def _get_target_slot(target: ast.expr) -> int:
+    if isinstance(target, ast.Name):
+        slot = get_slot(target)
+
+        if slot is not None:
+            return slot
+
+    return _ESCAPES
+
+
+class _EscapeAnalyzer:
+    # the destination of the result of each concatenation, and the loops enclosing it,
+    # innermost last
+    _sites: list[tuple[ast.AST, int, tuple[_Loop, ...]]]
+    # the slots of the variables whose value may escape
+    _escaping_slots: set[int]
+    # the loops enclosing the uses of each slot
+    _slot_loops: dict[int, list[tuple[_Loop, ...]]]
+    # the slots used by the condition of each while loop
+    _test_slots: dict[_Loop, set[int]]
+    _loops: list[_Loop]
+
+    def __init__(self):
+        self._sites = []
+        self._escaping_slots = set()
+        self._slot_loops = {}
+        self._test_slots = {}
+        self._loops = []
+
+    def analyze(self, function: TopLevelFunction) -> set[ast.AST]:
+        self._visit_block(function.node.body)
+
+        arena_sites: set[ast.AST] = set()
+        heap_sites: set[ast.AST] = set()
+
+        for site, destination, loops in self._sites:
+            if (
+                destination == _ESCAPES
+                or destination in self._escaping_slots
+                or (loops and destination != _CONSUMED and not self._is_iteration_local(destination, loops[-1]))
+            ):
+                heap_sites.add(site)
+            else:
+                arena_sites.add(site)
+
+        # a node may occur more than once if it was substituted by the inliner
+        return arena_sites - heap_sites
+
+    def _is_iteration_local(self, slot: int, loop: _Loop) -> bool:
+        """
+        Return True if the variable of [slot] is only used in the body of [loop], and
+        every iteration assigns it before using it
+        """
+
+        if slot in self._test_slots.get(loop, ()):
+            return False
+
+        if any(loop not in loops for loops in self._slot_loops.get(slot, [])):
+            return False
+
+        for statement in loop.body:
+            mentions = [
+                node for node in ast.walk(statement)
+                if isinstance(node, ast.Name) and get_slot(node) == slot
+            ]
+
+            if not mentions:
+                continue
+
+            return (
+                isinstance(statement, (ast.Assign, ast.AnnAssign))
+                and len(mentions) == 1
+                and _get_target_slot(
+                    statement.targets[0] if isinstance(statement, ast.Assign) else statement.target
+                ) == slot
+            )
+
+        return False
+
+    # Statements
+
+    def _visit_block(self, statements: list[ast.stmt]) -> None:
+        for statement in statements:
+            self._visit_statement(statement)
+
+    def _visit_statement(self, node: ast.stmt) -> None:
+        if isinstance(node, ast.Expr):
+            self._visit(node.value, _CONSUMED)
+        elif isinstance(node, ast.Assign):
+            destination = _get_target_slot(node.targets[0]) if len(node.targets) == 1 else _ESCAPES
+
+            for target in node.targets:
+                self._visit_target(target)
+
+            self._visit(node.value, destination)
+        elif isinstance(node, ast.AnnAssign):
+            self._visit_target(node.target)
+
+            if node.value:
+                self._visit(node.value, _get_target_slot(node.target))
+        elif isinstance(node, ast.AugAssign):
+            # the current value of the target is copied into the result
+            self._visit_target(node.target)
+            self._visit(node.target, _CONSUMED)
+            self._visit(node.value, _CONSUMED)
+
+            if _is_concatenation(node):
+                self._add_site(node, _get_target_slot(node.target))
+        elif isinstance(node, ast.Return):
+            if node.value:
+                self._visit(node.value, _ESCAPES)
+        elif isinstance(node, ast.If):
+            self._visit(node.test, _CONSUMED)
+            self._visit_block(node.body)
+            self._visit_block(node.orelse)
+        elif isinstance(node, (ast.While, ast.For)):
+            if isinstance(node, ast.For):
+                self._visit_target(node.target)
+                self._visit(node.iter, _CONSUMED)
+
+            self._loops.append(node)
+
+            # the condition of a while loop is evaluated once per iteration, before
+            # the body, so that its temporaries belong to the iteration as well;
+            # however, the variables it reads are used across iterations
+            if isinstance(node, ast.While):
+                self._visit(node.test, _CONSUMED)
+                self._test_slots[node] = {
+                    slot for slot in map(get_slot, ast.walk(node.test)) if slot is not None
+                }
+
+            self._visit_block(node.body)
+            self._loops.pop()
+
+            # the else clause runs once, after the allocations of the last iteration
+            # are released
+            self._visit_block(node.orelse)
+        else:
+            # anything else, such as pass, break and continue, holds no expression the
+            # analysis is concerned with; unsupported statements are rejected later by
+            # code generation
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    self._visit(child, _ESCAPES)
+
+    def _visit_target(self, target: ast.expr) -> None:
+        if isinstance(target, ast.Subscript):
+            # storing an item reads the list and the index
+            self._visit(target.value, _CONSUMED)
+            self._visit(target.slice, _CONSUMED)
+            return
+
+        slot = _get_target_slot(target)
+
+        if slot != _ESCAPES:
+            self._slot_loops.setdefault(slot, []).append(tuple(self._loops))
+
+    # Expressions
+
+    def _add_site(self, node: ast.AST, destination: int) -> None:
+        self._sites.append((node, destination, tuple(self._loops)))
+
+    def _visit(self, node: ast.expr, destination: int) -> None:
+        """
+        Visit the expression [node], whose value goes to [destination]
+        """
+
+        if isinstance(node, ast.Name):
+            slot = get_slot(node)
+
+            if slot is not None:
+                self._slot_loops.setdefault(slot, []).append(tuple(self._loops))
+
+                # copying a variable to another one makes them aliases, which the
+                # analysis does not track
+                if destination != _CONSUMED:
+                    self._escaping_slots.add(slot)
+        elif isinstance(node, ast.BinOp):
+            if _is_concatenation(node):
+                self._add_site(node, destination)
+
+            # operands of arithmetic are copied
+            self._visit(node.left, _CONSUMED)
+            self._visit(node.right, _CONSUMED)
+        elif isinstance(node, (ast.BoolOp, ast.IfExp)):
+            # the value is one of the operands or branches
+            if isinstance(node, ast.IfExp):
+                self._visit(node.test, _CONSUMED)
+                values = [node.body, node.orelse]
+            else:
+                values = node.values
+
+            for value in values:
+                self._visit(value, destination)
+        elif isinstance(node, ast.Subscript):
+            if _is_slice(node):
+                self._add_site(node, destination)
+
+            # an item or a view is read from the list, which stays where it is
+            self._visit(node.value, _CONSUMED)
+            index = node.slice
+            bounds = [index.lower, index.upper, index.step] if isinstance(index, ast.Slice) else [index]
+
+            for bound in bounds:
+                if bound:
+                    self._visit(bound, _CONSUMED)
+        elif isinstance(node, ast.Call):
+            # the receiver of a method call, as in xs.append(x)
+            if isinstance(node.func, ast.Attribute):
+                self._visit(node.func.value, _CONSUMED)
+
+            destination = _CONSUMED if self._is_consuming_call(node) else _ESCAPES
+
+            for arg in node.args:
+                self._visit(arg, destination)
+
+            for keyword in node.keywords:
+                self._visit(keyword.value, _ESCAPES)
+        elif isinstance(node, (ast.Compare, ast.UnaryOp)):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    self._visit(child, _CONSUMED)
+        else:
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    self._visit(child, _ESCAPES)
+
+    def _is_consuming_call(self, node: ast.Call) -> bool:
+        """
+        Return True if the arguments of the call [node] cannot outlive it
+        """
+
+        function = get_symbol(node.func)
+
+        if isinstance(function, TopLevelFunction):
+            return not _is_object(function.return_type) and not any(
+                _holds_objects(argument.type) for argument in function.get_arguments().values()
+            )
+
+        return isinstance(node.func, ast.Name) and node.func.id in _CONSUMING_BUILTINS
+
+
+def lends_slices(call: ast.Call) -> bool:
+    """
+    Return True if the slices passed to the call [call] cannot outlive it, and the
+    function called cannot reach the lists they were taken from: every list it takes is
+    passed a slice, and it cannot return or store any of them. Such a slice does not
+    need to mark its list as shared, since the list cannot change while the slice is
+    in use. The names in [call] must have been resolved (see resolve_symbols).
+    """
+
+    function = get_symbol(call.func)
+
+    if not isinstance(function, TopLevelFunction) or _is_object(function.return_type):
+        return False
+
+    parameters = list(function.get_arguments().values())
+
+    return not any(_holds_objects(parameter.type) for parameter in parameters) and all(
+        _is_slice(arg)
+        for arg, parameter in zip(call.args, parameters)
+        if get_element_type(parameter.type) is not None
+    )
+
+
+def find_arena_allocations(function: TopLevelFunction) -> set[ast.AST]:
+    """
+    Return the concatenations (ast.BinOp and ast.AugAssign nodes) and slices
+    (ast.Subscript nodes) of [function] whose results can be allocated from the arena: they are released when the innermost
+    loop containing them starts its next iteration or ends, or when [function]
+    returns if they are not in a loop. The names in the body of [function] must have
+    been resolved (see resolve_symbols).
+    """
+
+    return _EscapeAnalyzer().analyze(function)
@@ -0,0 +1,494 @@
+"""
+A small interpreter over the typed AST, used to evaluate calls to pure top-level
+functions with constant arguments at compile time. Only the side-effect free subset
+of Pyrite is supported: arithmetic on int, float, bool and str values, local
+variables, if/while/for-range statements and calls to other such functions. Anything
+else, as well as any operation whose result would differ at runtime (such as integer
+overflow) or that would fail at runtime (such as a division by zero), makes the
+evaluation fail, and the expression is left to be computed at runtime.
+"""
+
+from __future__ import annotations
+
+import ast
+import math
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, Union
+from pyrite.module import ConstantValue, TopLevelFunction, Type
+from pyrite.resolution import NameResolver, get_conversions, get_local_names, get_origin
+
+if TYPE_CHECKING:
+    from pyrite.interface import ModuleView
+
+# Pyrite integers are 64-bit
+INT_MIN = -(2 ** 63)
+INT_MAX = 2 ** 63 - 1
+
+MAX_STRING_LENGTH = 4096
+
+# The number of expressions and statements a single compile-time evaluation may
+# execute, and the depth of nested calls it may make
+MAX_STEPS = 100000
+MAX_CALL_DEPTH = 32
+
+_TYPES: dict[str, type] = {
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "str": str
+}
+
+_BINARY_OPERATORS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.Pow: lambda a, b: a ** b,
+    ast.LShift: lambda a, b: a << b,
+    ast.RShift: lambda a, b: a >> b,
+    ast.BitAnd: lambda a, b: a & b,
+    ast.BitOr: lambda a, b: a | b,
+    ast.BitXor: lambda a, b: a ^ b
+}
+
+_COMPARISON_OPERATORS: dict[type, Callable[[Any, Any], bool]] = {
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b
+}
+
+
+# Compiler-defined functions of stdlib/_compiler_defined that can be evaluated at
+# compile time, with the types of their arguments. Strings are stored as UTF-8; their
+# size is counted in bytes, and their length in code points.
+_COMPILER_DEFINED: dict[str, tuple[tuple[type, ...], Callable[..., Any]]] = {
+    "_ext_str_size": ((str,), lambda s: len(s.encode("utf-8"))),
+    # lists are never constants
+    "_ext_len": ((str,), len)
+}
+
+
+class NotConstant(Exception):
+    """
+    Raised when an expression cannot be evaluated at compile time
+    """
+
+
+class _Return(Exception):
+    value: ConstantValue
+
+    def __init__(self, value: ConstantValue):
+        self.value = value
+
+
+class _Break(Exception):
+    pass
+
+
+class _Continue(Exception):
+    pass
+
+
+def check_value(value: Any) -> ConstantValue:
+    """
+    Return [value] if it can be represented as a Pyrite constant; otherwise raise
+    NotConstant
+    """
+
+    if type(value) is bool:
+        return value
+    if type(value) is int and INT_MIN <= value <= INT_MAX:
+        return value
+    if type(value) is float and math.isfinite(value):
+        return value
+    if type(value) is str and len(value) <= MAX_STRING_LENGTH:
+        return value
+
+    raise NotConstant()
+
+
+def _is_number(value: ConstantValue) -> bool:
+    return type(value) in (int, float)
+
+
+def _evaluate_binary_operator(op: ast.operator, left: ConstantValue, right: ConstantValue) -> ConstantValue:
+    operator = _BINARY_OPERATORS.get(type(op))
+
+    if not operator:
+        raise NotConstant()
+
+    if type(left) is bool or type(right) is bool:
+        # bools only support logical bitwise operators
+        if not (type(left) is bool and type(right) is bool and isinstance(op, (ast.BitAnd, ast.BitOr, ast.BitXor))):
+            raise NotConstant()
+    elif isinstance(left, str) or isinstance(right, str):
+        if isinstance(op, ast.Add) and isinstance(left, str) and isinstance(right, str):
+            if len(left) + len(right) > MAX_STRING_LENGTH:
+                raise NotConstant()
+        elif isinstance(op, ast.Mult) and isinstance(left, str) and type(right) is int:
+            if len(left) * max(right, 0) > MAX_STRING_LENGTH:
+                raise NotConstant()
+        else:
+            raise NotConstant()
+    elif isinstance(op, (ast.LShift, ast.RShift, ast.BitAnd, ast.BitOr, ast.BitXor)):
+        if type(left) is not int or type(right) is not int:
+            raise NotConstant()
+        if isinstance(op, (ast.LShift, ast.RShift)) and not 0 <= right < 64:
+            raise NotConstant()
+    elif isinstance(op, ast.Pow) and type(left) is int and type(right) is int:
+        # a negative exponent traps at runtime (see pyrite.ipow) instead of producing a
+        # float, and for a large one the result would not fit into 64 bits anyway
+        if right < 0 or (right > 64 and abs(left) > 1):
+            raise NotConstant()
+
+    try:
+        return check_value(operator(left, right))
+    except (ArithmeticError, ValueError, TypeError):
+        raise NotConstant()
+
+
+def _evaluate_unary_operator(op: ast.unaryop, operand: ConstantValue) -> ConstantValue:
+    if isinstance(op, ast.Not):
+        return not operand
+
+    if type(operand) is bool or isinstance(operand, str):
+        raise NotConstant()
+
+    if isinstance(op, ast.USub):
+        return check_value(-operand)
+    if isinstance(op, ast.UAdd):
+        return operand
+    if isinstance(op, ast.Invert) and type(operand) is int:
+        return check_value(~operand)
+
+    raise NotConstant()
+
+
+def _evaluate_comparison(op: ast.cmpop, left: ConstantValue, right: ConstantValue) -> bool:
+    operator = _COMPARISON_OPERATORS.get(type(op))
+
+    if not operator:
+        raise NotConstant()
+
+    if not (_is_number(left) and _is_number(right)) and type(left) is not type(right):
+        raise NotConstant()
+
+    return operator(left, right)
+
+
+def _matches_type(value: ConstantValue, type_name: str) -> bool:
+    return type(value) is _TYPES.get(type_name)
+
+
+def convert_value(value: ConstantValue, target: Type) -> ConstantValue:
+    """
+    Return [value] converted to [target] as a call converts its arguments, or raise
+    NotConstant
+    """
+
+    if _matches_type(value, target.name):
+        return value
+    if target.name == "float" and type(value) is int:
+        return check_value(float(value))
+
+    raise NotConstant()
+
+
+class _Frame:
+    resolver: NameResolver
+    locals: dict[str, ConstantValue]
+
+    def __init__(self, resolver: NameResolver, locals: dict[str, ConstantValue]):
+        self.resolver = resolver
+        self.locals = locals
+
+
+class Evaluator:
+    """
+    Evaluates expressions and calls at compile time. The results of calls are
+    memoized for the lifetime of the Evaluator, so a function called repeatedly with
+    the same arguments, such as a lookup table generator, is only interpreted once.
+    """
+
+    _modules: dict[str, ModuleView]
+    _resolvers: dict[TopLevelFunction, NameResolver]
+    _memo: dict[tuple[TopLevelFunction, tuple[tuple[type, ConstantValue], ...]], Optional[ConstantValue]]
+    _steps: int
+    _depth: int
+
+    def __init__(self, modules: dict[str, ModuleView]):
+        self._modules = modules
+        self._resolvers = {}
+        self._memo = {}
+        self._steps = 0
+        self._depth = 0
+
+    def _step(self) -> None:
+        self._steps += 1
+
+        if self._steps > MAX_STEPS:
+            raise NotConstant()
+
+    def _get_resolver(self, function: TopLevelFunction) -> NameResolver:
+        if function not in self._resolvers:
+            self._resolvers[function] = NameResolver(
+                function.get_module(), self._modules, get_local_names(function)
+            )
+
+        return self._resolvers[function]
+
+    def evaluate(self, expr: ast.expr, resolver: NameResolver) -> ConstantValue:
+        """
+        Return the value of [expr], whose names are resolved by [resolver], or raise
+        NotConstant. The conversions of [expr] itself, if it was inlined, are not
+        applied.
+        """
+
+        self._steps = 0
+
+        return self._evaluate_value(expr, _Frame(resolver, {}))
+
+    def call(self, function: TopLevelFunction, args: list[ConstantValue]) -> ConstantValue:
+        """
+        Return the result of calling [function] with [args], or raise NotConstant
+        """
+
+        key = (function, tuple((type(arg), arg) for arg in args))
+
+        if key in self._memo:
+            result = self._memo[key]
+
+            if result is None:
+                raise NotConstant()
+
+            return result
+
+        if self._depth == 0:
+            self._steps = 0
+
+        try:
+            self._memo[key] = self._call(function, args)
+        except NotConstant:
+            self._memo[key] = None
+            raise
+
+        return self._memo[key]
+
+    def _call(self, function: TopLevelFunction, args: list[ConstantValue]) -> ConstantValue:
+        parameters = function.get_arguments()
+        node_args = function.node.args
+
+        if (
+            node_args.vararg or node_args.kwarg or node_args.kwonlyargs or node_args.posonlyargs
+            or len(args) != len(parameters)
+        ):
+            raise NotConstant()
+
+        for arg, parameter in zip(args, parameters.values()):
+            if not _matches_type(arg, parameter.type.name):
+                raise NotConstant()
+
+        if self._depth >= MAX_CALL_DEPTH:
+            raise NotConstant()
+
+        frame = _Frame(self._get_resolver(function), dict(zip(parameters, args)))
+        self._depth += 1
+
+        try:
+            self._execute_block(function.node.body, frame)
+        except _Return as ret:
+            if not _matches_type(ret.value, function.return_type.name):
+                raise NotConstant()
+
+            return ret.value
+        except (_Break, _Continue):
+            raise NotConstant()
+        finally:
+            self._depth -= 1
+
+        # functions without a return statement return None
+        raise NotConstant()
+
+    def _execute_block(self, statements: list[ast.stmt], frame: _Frame) -> None:
+        for statement in statements:
+            self._execute(statement, frame)
+
+    def _assign(self, target: ast.expr, value: ConstantValue, frame: _Frame) -> None:
+        if not isinstance(target, ast.Name) or get_origin(target) is not None:
+            raise NotConstant()
+
+        frame.locals[target.id] = value
+
+    def _execute(self, node: ast.stmt, frame: _Frame) -> None:
+        self._step()
+
+        if isinstance(node, ast.Expr):
+            self._evaluate(node.value, frame)
+        elif isinstance(node, ast.Pass):
+            pass
+        elif isinstance(node, ast.Return):
+            if node.value is None:
+                raise NotConstant()
+
+            raise _Return(self._evaluate(node.value, frame))
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1:
+            self._assign(node.targets[0], self._evaluate(node.value, frame), frame)
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            self._assign(node.target, self._evaluate(node.value, frame), frame)
+        elif isinstance(node, ast.AugAssign):
+            current = self._evaluate(node.target, frame)
+            value = self._evaluate(node.value, frame)
+            self._assign(node.target, _evaluate_binary_operator(node.op, current, value), frame)
+        elif isinstance(node, ast.If):
+            if self._evaluate(node.test, frame):
+                self._execute_block(node.body, frame)
+            else:
+                self._execute_block(node.orelse, frame)
+        elif isinstance(node, ast.While):
+            self._execute_loop(node, self._iterate_while(node, frame), frame)
+        elif isinstance(node, ast.For):
+            self._execute_loop(node, self._iterate_range(node, frame), frame)
+        elif isinstance(node, ast.Break):
+            raise _Break()
+        elif isinstance(node, ast.Continue):
+            raise _Continue()
+        else:
+            raise NotConstant()
+
+    def _iterate_while(self, node: ast.While, frame: _Frame) -> Iterator[None]:
+        while self._evaluate(node.test, frame):
+            yield
+
+    def _iterate_range(self, node: ast.For, frame: _Frame) -> Iterator[None]:
+        iterator = node.iter
+
+        if (
+            not isinstance(iterator, ast.Call)
+            or not isinstance(iterator.func, ast.Name)
+            or iterator.func.id != "range"
+            or get_origin(iterator.func) is not None
+            or iterator.keywords
+            or not 1 <= len(iterator.args) <= 3
+            or frame.resolver.resolve_function(iterator.func)
+            or iterator.func.id in frame.locals
+        ):
+            raise NotConstant()
+
+        bounds = [self._evaluate(arg, frame) for arg in iterator.args]
+
+        if any(type(bound) is not int for bound in bounds) or (len(bounds) == 3 and bounds[2] == 0):
+            raise NotConstant()
+
+        for value in range(*bounds):
+            self._assign(node.target, value, frame)
+            yield
+
+    def _execute_loop(self, node: Union[ast.While, ast.For], iterations: Iterator[None], frame: _Frame) -> None:
+        for _ in iterations:
+            self._step()
+
+            try:
+                self._execute_block(node.body, frame)
+            except _Break:
+                return
+            except _Continue:
+                continue
+
+        self._execute_block(node.orelse, frame)
+
+    def _evaluate(self, node: ast.expr, frame: _Frame) -> ConstantValue:
+        value = self._evaluate_value(node, frame)
+
+        for target in get_conversions(node):
+            value = convert_value(value, target)
+
+        return value
+
+    def _evaluate_value(self, node: ast.expr, frame: _Frame) -> ConstantValue:
+        self._step()
+
+        if isinstance(node, ast.Constant):
+            return check_value(node.value)
+
+        if isinstance(node, ast.Name):
+            if get_origin(node) is None and node.id in frame.locals:
+                return frame.locals[node.id]
+
+            constant = frame.resolver.resolve_constant(node)
+
+            if constant is None:
+                raise NotConstant()
+
+            return constant.value
+
+        if isinstance(node, ast.Attribute):
+            constant = frame.resolver.resolve_constant(node)
+
+            if constant is None:
+                raise NotConstant()
+
+            return constant.value
+
+        if isinstance(node, ast.BinOp):
+            return _evaluate_binary_operator(
+                node.op, self._evaluate(node.left, frame), self._evaluate(node.right, frame)
+            )
+
+        if isinstance(node, ast.UnaryOp):
+            return _evaluate_unary_operator(node.op, self._evaluate(node.operand, frame))
+
+        if isinstance(node, ast.Compare):
+            left = self._evaluate(node.left, frame)
+
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._evaluate(comparator, frame)
+
+                if not _evaluate_comparison(op, left, right):
+                    return False
+
+                left = right
+
+            return True
+
+        if isinstance(node, ast.BoolOp):
+            for value_node in node.values:
+                value = self._evaluate(value_node, frame)
+
+                if bool(value) == isinstance(node.op, ast.Or):
+                    return value
+
+            return value
+
+        if isinstance(node, ast.IfExp):
+            if self._evaluate(node.test, frame):
+                return self._evaluate(node.body, frame)
+
+            return self._evaluate(node.orelse, frame)
+
+        if isinstance(node, ast.Call) and not node.keywords:
+            function = frame.resolver.resolve_function(node.func)
+
+            if not function:
+                return self._call_compiler_defined(node, frame)
+
+            return self.call(function, [self._evaluate(arg, frame) for arg in node.args])
+
+        raise NotConstant()
+
+    def _call_compiler_defined(self, node: ast.Call, frame: _Frame) -> ConstantValue:
+        name = frame.resolver.resolve_compiler_defined(node.func)
+
+        if name is None or name not in _COMPILER_DEFINED:
+            raise NotConstant()
+
+        types, implementation = _COMPILER_DEFINED[name]
+        args = [self._evaluate(arg, frame) for arg in node.args]
+
+        if len(args) != len(types) or any(type(arg) is not expected for arg, expected in zip(args, types)):
+            raise NotConstant()
+
+        return check_value(implementation(*args))
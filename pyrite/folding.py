@@ -0,0 +1,303 @@
+"""
+Constant folding and dead code elimination. Expressions whose operands are known at
+compile time, including calls to pure functions with constant arguments (see
+pyrite.evaluator), are replaced with their values, and statements that can never run
+are removed. Top-level names that are assigned exactly once, to a value that can be
+computed at compile time, become module constants: configuration values and lookup
+parameters are computed while building instead of when the program starts.
+"""
+
+from __future__ import annotations
+
+import ast
+import copy
+from typing import TYPE_CHECKING, Optional
+from pyrite.evaluator import Evaluator, NotConstant, check_value, convert_value
+from pyrite.module import Module, TopLevelFunction
+from pyrite.resolution import CONVERSIONS_ATTRIBUTE, NameResolver, get_conversions, get_local_names, get_origin
+
+if TYPE_CHECKING:
+    from pyrite.interface import ModuleView
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    _resolver: NameResolver
+    _evaluator: Evaluator
+    _local_names: set[str]
+
+    def __init__(self, resolver: NameResolver, evaluator: Evaluator, local_names: set[str]):
+        self._resolver = resolver
+        self._evaluator = evaluator
+        self._local_names = local_names
+
+    def visit(self, node: ast.AST) -> ast.AST:
+        result = super().visit(node)
+
+        if not isinstance(node, ast.expr):
+            return result
+
+        # an expression that replaces an inlined one takes over its conversions (see
+        # pyrite.inliner), which constants are converted with right away
+        conversions = get_conversions(result) + (get_conversions(node) if result is not node else ())
+
+        if not conversions:
+            return result
+
+        if isinstance(result, ast.Constant):
+            try:
+                value = result.value
+
+                for target in conversions:
+                    value = convert_value(value, target)
+
+                return ast.copy_location(ast.Constant(value), node)
+            except NotConstant:
+                # left for code generation to report
+                pass
+
+        if result is not node:
+            result = copy.copy(result)
+
+        setattr(result, CONVERSIONS_ATTRIBUTE, conversions)
+
+        return result
+
+    def _evaluate(self, node: ast.expr) -> ast.expr:
+        try:
+            value = self._evaluator.evaluate(node, self._resolver)
+        except NotConstant:
+            return node
+
+        return ast.copy_location(ast.Constant(value), node)
+
+    def _is_folded(self, *nodes: ast.expr) -> bool:
+        # constants that could not be converted are left alone
+        return all(isinstance(node, ast.Constant) and not get_conversions(node) for node in nodes)
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:
+        if not isinstance(node.ctx, ast.Load):
+            return node
+        if get_origin(node) is None and node.id in self._local_names:
+            return node
+
+        constant = self._resolver.resolve_constant(node)
+
+        return ast.copy_location(constant, node) if constant else node
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.expr:
+        self.generic_visit(node)
+
+        if not isinstance(node.ctx, ast.Load):
+            return node
+
+        constant = self._resolver.resolve_constant(node)
+
+        return ast.copy_location(constant, node) if constant else node
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.expr:
+        self.generic_visit(node)
+
+        return self._evaluate(node) if self._is_folded(node.left, node.right) else node
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.expr:
+        self.generic_visit(node)
+
+        return self._evaluate(node) if self._is_folded(node.operand) else node
+
+    def visit_Compare(self, node: ast.Compare) -> ast.expr:
+        self.generic_visit(node)
+
+        return self._evaluate(node) if self._is_folded(node.left, *node.comparators) else node
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.expr:
+        self.generic_visit(node)
+
+        # leading constants either decide the result or can be dropped
+        values = node.values
+
+        while len(values) > 1 and self._is_folded(values[0]):
+            if bool(values[0].value) == isinstance(node.op, ast.Or):
+                return values[0]
+
+            values = values[1:]
+
+        if len(values) == 1:
+            return values[0]
+
+        node.values = values
+        return node
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.expr:
+        self.generic_visit(node)
+
+        if self._is_folded(node.test):
+            return node.body if node.test.value else node.orelse
+
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.expr:
+        self.generic_visit(node)
+
+        if node.keywords or not self._is_folded(*node.args):
+            return node
+
+        function = self._resolver.resolve_function(node.func)
+
+        if not function:
+            return node
+
+        try:
+            value = self._evaluator.call(function, [arg.value for arg in node.args])
+        except NotConstant:
+            return node
+
+        return ast.copy_location(ast.Constant(value), node)
+
+
+def _is_terminator(node: ast.stmt) -> bool:
+    return isinstance(node, (ast.Return, ast.Raise, ast.Break, ast.Continue))
+
+
+def _eliminate_dead_code(statements: list[ast.stmt]) -> list[ast.stmt]:
+    """
+    Return [statements] without branches that can never be taken, statements that
+    follow a return, raise, break or continue, and constant expression statements
+    """
+
+    result: list[ast.stmt] = []
+
+    for node in statements:
+        if isinstance(node, ast.If) and isinstance(node.test, ast.Constant):
+            result.extend(_eliminate_dead_code(node.body if node.test.value else node.orelse))
+        elif isinstance(node, ast.While) and isinstance(node.test, ast.Constant) and not node.test.value:
+            result.extend(_eliminate_dead_code(node.orelse))
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            pass
+        else:
+            for field in ("body", "orelse", "finalbody"):
+                block = getattr(node, field, None)
+
+                if block and isinstance(block[0], ast.stmt):
+                    setattr(node, field, _eliminate_dead_code(block) or [ast.Pass()])
+
+            if isinstance(node, ast.Try):
+                for handler in node.handlers:
+                    handler.body = _eliminate_dead_code(handler.body) or [ast.Pass()]
+
+            result.append(node)
+
+        if result and _is_terminator(result[-1]):
+            break
+
+    return result
+
+
+def _get_docstring(function: TopLevelFunction) -> Optional[ast.stmt]:
+    first = function.node.body[0]
+
+    if (
+        isinstance(first, ast.Expr)
+        and isinstance(first.value, ast.Constant)
+        and isinstance(first.value.value, str)
+    ):
+        return first
+
+    return None
+
+
+def fold_function(function: TopLevelFunction, modules: dict[str, ModuleView], evaluator: Evaluator) -> None:
+    """
+    Fold the constant expressions in the body of [function] and remove its dead code
+    """
+
+    local_names = get_local_names(function)
+    resolver = NameResolver(function.get_module(), modules, local_names)
+    docstring = _get_docstring(function)
+
+    body = [
+        _ConstantFolder(resolver, evaluator, local_names).visit(node)
+        for node in function.node.body
+    ]
+    body = _eliminate_dead_code(body)
+
+    if docstring:
+        body.insert(0, docstring)
+
+    function.node.body = body or [ast.Pass()]
+
+
+def _get_constant_candidates(module: Module) -> set[str]:
+    """
+    Return the top-level names of [module] that are assigned exactly once and are
+    never declared global by a function
+    """
+
+    assignments: dict[str, int] = {}
+    globals: set[str] = set()
+
+    for statement in module.assert_ast_loaded().body:
+        if isinstance(statement, (ast.FunctionDef, ast.ClassDef)):
+            globals.update(
+                name
+                for node in ast.walk(statement)
+                if isinstance(node, ast.Global)
+                for name in node.names
+            )
+            continue
+
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                assignments[node.id] = assignments.get(node.id, 0) + 1
+
+    return {
+        name for name, count in assignments.items()
+        if count == 1 and name not in globals and not name.startswith("__PRAGMA_")
+    }
+
+
+def _get_annotated_type(annotation: ast.expr) -> Optional[type]:
+    if isinstance(annotation, ast.Name):
+        return {"int": int, "float": float, "bool": bool, "str": str}.get(annotation.id)
+
+    return None
+
+
+def fold_module_constants(module: Module, modules: dict[str, ModuleView], evaluator: Evaluator) -> None:
+    """
+    Evaluate the top-level assignments of [module] and register those whose values
+    are known at compile time as module constants. The syntax tree of the module is
+    left unchanged.
+    """
+
+    candidates = _get_constant_candidates(module)
+    resolver = NameResolver(module, modules, set())
+    folder = _ConstantFolder(resolver, evaluator, set())
+
+    for statement in module.assert_ast_loaded().body:
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+            target = statement.targets[0]
+            expected_type = None
+        elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+            target = statement.target
+            expected_type = _get_annotated_type(statement.annotation)
+
+            if expected_type is None:
+                continue
+        else:
+            continue
+
+        if not isinstance(target, ast.Name) or target.id not in candidates:
+            continue
+
+        folded = folder.visit(copy.deepcopy(statement.value))
+
+        if not isinstance(folded, ast.Constant):
+            continue
+
+        try:
+            value = check_value(folded.value)
+        except NotConstant:
+            continue
+
+        if expected_type is None or type(value) is expected_type:
+            module.set_constant(target.id, value)
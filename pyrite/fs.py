@@ -1,6 +1,7 @@
 import os
 import typing
 import shutil
+import threading
 
 
 def read_file(path: str) -> str:
@@ -15,8 +16,9 @@ def write_file(path: str, data: typing.Union[str, bytes]) -> None:
     Overrite the file if it already exists.
     """
 
+    # exist_ok, since another thread or process may create the directory concurrently
     if not os.path.exists(os.path.dirname(path)):
-        os.makedirs(os.path.dirname(path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
 
     is_bytes = isinstance(data, bytes)
 
@@ -24,6 +26,32 @@ def write_file(path: str, data: typing.Union[str, bytes]) -> None:
         fl.write(data)
 
 
+def write_file_atomic(path: str, data: typing.Union[str, bytes]) -> None:
+    """
+    Like write_file, but write to a temporary file first and move it into place, so
+    that concurrent readers never observe a partially written file.
+    """
+
+    tmp_path = "{}.{}-{}.tmp".format(path, os.getpid(), threading.get_ident())
+    write_file(tmp_path, data)
+    os.replace(tmp_path, path)
+
+
+def move_into_place(source: str, destination: str) -> None:
+    """
+    Move the file at [source] to [destination], replacing it atomically if both are on
+    the same file system
+    """
+
+    if os.path.dirname(destination) and not os.path.exists(os.path.dirname(destination)):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    try:
+        os.replace(source, destination)
+    except OSError:
+        shutil.move(source, destination)
+
+
 def _is_line_empty(line: str) -> bool:
     """Return true if the given string is empty or only whitespace"""
     return len(line.strip()) == 0
@@ -43,7 +71,10 @@ def read_file_as_lines(path: str, remove_blank_lines: bool = False) -> list[str]
 def remove_path(path: str, ignore_if_missing: bool = False) -> None:
     """Delete the file or folder at [path], empty or not."""
 
-    if not os.path.exists(path) and not ignore_if_missing:
+    if not os.path.exists(path):
+        if ignore_if_missing:
+            return
+
         raise FileNotFoundError("file at {} was not found".format(repr(path)))
 
     if os.path.isdir(path):
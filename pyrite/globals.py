@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 from typing import Optional
 
+# Bumped whenever the format of compiler output or cached compiler state changes
+COMPILER_VERSION = "0.1.15"
+
 
 @dataclass
 class CompilerOptions:
@@ -9,6 +12,43 @@ class CompilerOptions:
     cwd: str
     enable_color: bool
     clang_command: str
+    # Save the analyzed stdlib/_internal prelude in the build directory so that later
+    # compiler processes can skip analyzing it
+    cache_prelude: bool = False
+    # Reuse the results of compiling unchanged modules from the build directory
+    incremental: bool = False
+    # Maximum number of modules compiled concurrently
+    jobs: int = 1
+    # Path of the executable to produce, relative to cwd; if not set, source files are
+    # only checked and no binary is built
+    output_path: Optional[str] = None
+    # Stream LLVM IR to clang over stdin instead of writing it to the build directory
+    pipe_ir: bool = False
+    # Optimization level passed to clang as -O<opt_level>: one of "0", "1", "2", "3" or "s"
+    opt_level: str = "0"
+    # Enable (thin) link-time optimization across modules and the runtime library
+    lto: bool = False
+    # Directory that an instrumented build writes raw profiles to (see pyrite.pgo)
+    profile_generate: Optional[str] = None
+    # Merged profile data used to optimize the build (see pyrite.pgo)
+    profile_use: Optional[str] = None
+    profdata_command: str = "llvm-profdata"
+    # Archiver used to build the prebuilt runtime library; "ar" is used as a fallback
+    ar_command: str = "llvm-ar"
+    # URL of a shared artifact cache (see pyrite.artifacts) that analyzed modules and
+    # object files are fetched from and uploaded to
+    artifact_cache_url: Optional[str] = None
+    # Secret that artifacts of the shared artifact cache are signed with; required if
+    # artifact_cache_url is set
+    artifact_cache_secret: Optional[bytes] = None
+    # Print the time and memory spent in each phase of every build (see
+    # pyrite.instrumentation)
+    time_report: bool = False
+    # Path, relative to cwd, that a Chrome trace of the phases of each build is written to
+    trace_path: Optional[str] = None
+    # Make executables print the statistics of the runtime allocator to stderr when
+    # main returns (see stdlib/allocator.ll)
+    alloc_stats: bool = False
 
 
 class Globals:
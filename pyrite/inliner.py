@@ -0,0 +1,293 @@
+"""
+AST-level inlining of small functions. Most of the stdlib consists of thin wrappers,
+such as math.cos, which only forwards its argument to _internal._math_cos, which in
+turn forwards it to the compiler-defined _ext_cos. Calls to functions whose body is a
+single cheap return expression are replaced by that expression, with the arguments
+of the call substituted for the parameters, so that such chains collapse into a
+direct call before code generation. The substituted arguments and the inlined
+expression are tagged with the types of the parameters and the return type (see
+pyrite.resolution), so that they are converted as the call would convert them, such
+as an int argument to a float parameter.
+
+Names in an inlined expression keep referring to the symbols of the module the
+callee was defined in: if that is not the module being optimized, each such name
+is tagged with the defining module's name (see pyrite.resolution), which symbol
+resolution must honor. A function can be excluded from inlining by listing
+it in a __PRAGMA_NOINLINE directive of its module.
+"""
+
+from __future__ import annotations
+
+import ast
+import copy
+from typing import TYPE_CHECKING, Optional
+from pyrite.module import Module, TopLevelFunction, Type
+from pyrite.resolution import ORIGIN_ATTRIBUTE, NameResolver, add_conversion, get_local_names, get_origin
+
+if TYPE_CHECKING:
+    from pyrite.interface import ModuleView
+
+# The maximum number of expression nodes in the body of an inlined function
+INLINE_COST_THRESHOLD = 12
+
+# Inlining may expose further calls that can be inlined; this bounds the number of
+# passes over a function, and with it the depth of mutually recursive expansion
+MAX_INLINE_ROUNDS = 4
+
+def _get_cost(expr: ast.expr) -> int:
+    return sum(1 for node in ast.walk(expr) if isinstance(node, ast.expr))
+
+
+def _get_return_expression(function: TopLevelFunction) -> Optional[ast.expr]:
+    """
+    Return the expression returned by [function] if its body, ignoring a docstring,
+    consists of a single return statement
+    """
+
+    body = function.node.body
+
+    if (
+        body
+        and isinstance(body[0], ast.Expr)
+        and isinstance(body[0].value, ast.Constant)
+        and isinstance(body[0].value.value, str)
+    ):
+        body = body[1:]
+
+    if len(body) != 1 or not isinstance(body[0], ast.Return):
+        return None
+
+    return body[0].value
+
+
+def _get_parameters(function: TopLevelFunction) -> Optional[list[str]]:
+    arguments = function.node.args
+
+    if (
+        arguments.vararg or arguments.kwarg or arguments.kwonlyargs
+        or arguments.posonlyargs or arguments.defaults
+    ):
+        return None
+
+    return [argument.arg for argument in arguments.args]
+
+
+def _is_parameter(node: ast.AST, parameters: list[str]) -> bool:
+    return (
+        isinstance(node, ast.Name)
+        and node.id in parameters
+        and get_origin(node) is None
+    )
+
+
+def _get_inline_expression(function: TopLevelFunction) -> Optional[ast.expr]:
+    """
+    Return the expression that calls to [function] may be replaced with, or None if
+    [function] is not an inlining candidate
+    """
+
+    if function.name in function.get_module().get_pragma().no_inline:
+        return None
+
+    expr = _get_return_expression(function)
+
+    if expr is None or _get_cost(expr) > INLINE_COST_THRESHOLD:
+        return None
+
+    for node in ast.walk(expr):
+        # assignment expressions would bind names in the caller's scope, and lambdas
+        # and comprehensions introduce scopes of their own
+        if isinstance(node, (ast.NamedExpr, ast.Lambda, ast.comprehension)):
+            return None
+
+        # direct recursion
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id == function.name
+            and get_origin(node.func) is None
+        ):
+            return None
+
+    return expr
+
+
+def is_inline_candidate(function: TopLevelFunction) -> bool:
+    """
+    Return True if calls to [function] may be replaced with its body
+    """
+
+    return _get_inline_expression(function) is not None
+
+
+def _is_substitution_safe(expr: ast.expr, parameter: str) -> bool:
+    """
+    Return True if an argument with side effects may be substituted for [parameter]
+    in [expr]: the parameter must be used exactly once (an unused argument must still
+    be evaluated), unconditionally, and be evaluated before any call made by [expr]
+    """
+
+    uses = [node for node in ast.walk(expr) if _is_parameter(node, [parameter])]
+
+    if len(uses) != 1:
+        return False
+
+    def visit(node: ast.AST, conditional: bool) -> Optional[bool]:
+        # post-order traversal in evaluation order; returns a verdict once the use of
+        # the parameter is reached
+        if node is uses[0]:
+            return not conditional
+
+        branches = isinstance(node, (ast.BoolOp, ast.IfExp))
+
+        for child in ast.iter_child_nodes(node):
+            verdict = visit(child, conditional or branches)
+
+            if verdict is not None:
+                return verdict
+
+        if isinstance(node, ast.Call):
+            # a call completed before the argument would have been evaluated
+            return False
+
+        return None
+
+    return visit(expr, False) is True
+
+
+def _tag_origin(expr: ast.expr, parameters: list[str], origin: str) -> None:
+    for node in ast.walk(expr):
+        if isinstance(node, ast.Name) and node.id not in parameters and get_origin(node) is None:
+            setattr(node, ORIGIN_ATTRIBUTE, origin)
+
+
+class _ParameterSubstituter(ast.NodeTransformer):
+    # the argument substituted for each parameter, and the type of the parameter
+    _arguments: dict[str, tuple[ast.expr, Type]]
+
+    def __init__(self, arguments: dict[str, tuple[ast.expr, Type]]):
+        self._arguments = arguments
+
+    def _substitute(self, node: ast.Name, convert: bool) -> ast.expr:
+        argument, type = self._arguments[node.id]
+        result = copy.deepcopy(argument)
+
+        if convert:
+            add_conversion(result, type)
+
+        return result
+
+    def visit_Call(self, node: ast.Call) -> ast.expr:
+        # compiler-defined functions convert their arguments themselves, and some
+        # accept values of several types, such as _ext_len, which len relies on
+        if isinstance(node.func, ast.Name) and node.func.id.startswith("_ext_"):
+            node.args = [
+                self._substitute(arg, False) if _is_parameter(arg, list(self._arguments)) else self.visit(arg)
+                for arg in node.args
+            ]
+            return node
+
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:
+        if not _is_parameter(node, list(self._arguments)):
+            return node
+
+        return self._substitute(node, True)
+
+
+class _Inliner(ast.NodeTransformer):
+    _module: Module
+    _function: TopLevelFunction
+    _local_names: set[str]
+    _resolver: NameResolver
+
+    changed: bool
+
+    def __init__(self, module: Module, modules: dict[str, ModuleView], function: TopLevelFunction):
+        self._module = module
+        self._function = function
+        self._local_names = get_local_names(function)
+        self._resolver = NameResolver(module, modules, self._local_names)
+        self.changed = False
+
+    def _inline(self, call: ast.Call) -> Optional[ast.expr]:
+        if call.keywords or any(isinstance(arg, ast.Starred) for arg in call.args):
+            return None
+
+        callee = self._resolver.resolve_function(call.func)
+
+        if not callee or callee is self._function:
+            return None
+
+        parameters = _get_parameters(callee)
+        expr = _get_inline_expression(callee)
+
+        if parameters is None or expr is None or len(parameters) != len(call.args):
+            return None
+
+        side_effects = [
+            parameter
+            for parameter, argument in zip(parameters, call.args)
+            if not isinstance(argument, (ast.Name, ast.Constant))
+        ]
+
+        # substituting more than one such argument could reorder their side effects
+        if len(side_effects) > 1:
+            return None
+        if side_effects and not _is_substitution_safe(expr, side_effects[0]):
+            return None
+
+        result = copy.deepcopy(expr)
+
+        for node in ast.walk(result):
+            ast.copy_location(node, call)
+
+        callee_module = callee.get_module().get_name()
+
+        if callee_module != self._module.get_name():
+            _tag_origin(result, parameters, callee_module)
+        elif any(
+            isinstance(node, ast.Name) and node.id not in parameters
+            and get_origin(node) is None and node.id in self._local_names
+            for node in ast.walk(result)
+        ):
+            # a name of the callee would be captured by a local of the caller
+            return None
+
+        types = [argument.type for argument in callee.get_arguments().values()]
+        result = _ParameterSubstituter({
+            parameter: (argument, type)
+            for parameter, argument, type in zip(parameters, call.args, types)
+        }).visit(result)
+        add_conversion(result, callee.return_type)
+
+        return result
+
+    def visit_Call(self, node: ast.Call) -> ast.expr:
+        self.generic_visit(node)
+        inlined = self._inline(node)
+
+        if inlined is None:
+            return node
+
+        self.changed = True
+        return inlined
+
+
+def inline_function_calls(module: Module, modules: dict[str, ModuleView]) -> None:
+    """
+    Inline calls to small functions in the bodies of the top-level functions of
+    [module]. [modules] maps the names of the modules of the program to the modules
+    themselves or their interfaces; the modules that [module] imports must already be
+    optimized. Only the bodies exported by an interface can be inlined.
+    """
+
+    for function in module.get_global_scope().get_functions():
+        for _ in range(MAX_INLINE_ROUNDS):
+            inliner = _Inliner(module, modules, function)
+            function.node.body = [inliner.visit(statement) for statement in function.node.body]
+
+            if not inliner.changed:
+                break
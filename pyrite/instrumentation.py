@@ -0,0 +1,248 @@
+"""
+Built-in instrumentation of the phases of a build. While recording is enabled (see
+start_recording), each phase() block records its wall time, the CPU time of the
+thread that ran it, and how far the peak memory use of its process (the high-water
+mark of the resident set size) grew while it ran. The high-water mark is shared by
+the whole process, so growth during phases that overlap on different threads is
+attributed to each of them, and a phase that reuses memory freed by an earlier one
+shows no growth at all. The process peak at the end of each phase is recorded too;
+it is cumulative and is never lower than that of an earlier phase. Phases that
+run in worker processes are recorded there and merged into the recording of the main
+process (see take_events and add_events).
+
+Recordings are reported as a summary table (format_report, for --time-report) or as
+a Chrome trace (write_chrome_trace, for --trace), which can be opened in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+
+from __future__ import annotations
+
+import contextlib
+from dataclasses import dataclass
+import json
+import os
+import threading
+import time
+from typing import ContextManager, Iterator, Optional
+from pyrite import fs
+
+# The number of modules listed in the report as the slowest
+SLOWEST_MODULE_COUNT = 10
+
+
+@dataclass
+class PhaseEvent:
+    name: str
+    # the module the phase worked on, if any
+    module: Optional[str]
+    # time.perf_counter() when the phase started; this clock is shared by every
+    # process on the machine
+    start: float
+    wall_time: float
+    cpu_time: float
+    # how much the peak resident memory of the process grew during the phase, in
+    # bytes, if known
+    peak_growth: Optional[int]
+    # the peak resident memory of the process when the phase ended, in bytes, if
+    # known; this includes the memory used by every earlier phase
+    process_peak: Optional[int]
+    pid: int
+    thread_id: int
+
+
+class _Recording:
+    events: list[PhaseEvent]
+    started: float
+
+    def __init__(self):
+        self.events = []
+        self.started = time.perf_counter()
+
+
+_recording: Optional[_Recording] = None
+_null_phase = contextlib.nullcontext()
+
+
+def _get_peak_memory() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # kilobytes on Linux, bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def start_recording() -> None:
+    """
+    Start recording phases in this process, discarding any previous recording
+    """
+
+    global _recording
+    _recording = _Recording()
+
+
+def stop_recording() -> list[PhaseEvent]:
+    """
+    Stop recording, returning the events recorded since start_recording, in the order
+    the phases started
+    """
+
+    global _recording
+
+    events = _recording.events if _recording else []
+    _recording = None
+
+    return sorted(events, key=lambda event: event.start)
+
+
+def is_recording() -> bool:
+    return _recording is not None
+
+
+def take_events() -> list[PhaseEvent]:
+    """
+    Return and forget the events recorded so far, without stopping the recording
+    """
+
+    if not _recording:
+        return []
+
+    events = _recording.events
+    _recording.events = []
+
+    return events
+
+
+def add_events(events: list[PhaseEvent]) -> None:
+    """
+    Add events recorded by another process to the current recording
+    """
+
+    if _recording:
+        _recording.events.extend(events)
+
+
+@contextlib.contextmanager
+def _record_phase(recording: _Recording, name: str, module: Optional[str]) -> Iterator[None]:
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    peak_start = _get_peak_memory()
+
+    try:
+        yield
+    finally:
+        peak_end = _get_peak_memory()
+
+        # appending to a list is atomic, so phases may end on any thread
+        recording.events.append(PhaseEvent(
+            name=name,
+            module=module,
+            start=start,
+            wall_time=time.perf_counter() - start,
+            cpu_time=time.thread_time() - cpu_start,
+            peak_growth=peak_end - peak_start if peak_end is not None and peak_start is not None else None,
+            process_peak=peak_end,
+            pid=os.getpid(),
+            thread_id=threading.get_native_id()
+        ))
+
+
+def phase(name: str, module: Optional[str] = None) -> ContextManager[None]:
+    """
+    Return a context manager that records the code it wraps as the phase [name] of
+    [module], if recording is enabled; otherwise, it does nothing
+    """
+
+    if _recording is None:
+        return _null_phase
+
+    return _record_phase(_recording, name, module)
+
+
+def _format_memory(size: Optional[int]) -> str:
+    return "{:.1f}".format(size / (1024 * 1024)) if size is not None else "-"
+
+
+def format_report(events: list[PhaseEvent]) -> str:
+    """
+    Return a summary of [events]: the total time and peak memory growth of each
+    phase, the process peak it ended with, and the modules that took the longest.
+    Phases may contain one another, such as the parsing of a module during its
+    analysis, and phases on different threads or processes may overlap, so the times
+    do not add up to the duration of the build.
+    """
+
+    phases: dict[str, list[PhaseEvent]] = {}
+    modules: dict[str, float] = {}
+
+    for event in events:
+        phases.setdefault(event.name, []).append(event)
+
+        if event.module is not None:
+            modules[event.module] = modules.get(event.module, 0) + event.wall_time
+
+    lines = ["{:<20} {:>6} {:>11} {:>11} {:>16} {:>18}".format(
+        "Phase", "Calls", "Wall (ms)", "CPU (ms)", "Peak growth (MB)", "Process peak (MB)"
+    )]
+
+    for name, phase_events in sorted(phases.items(), key=lambda item: -sum(e.wall_time for e in item[1])):
+        growths = [event.peak_growth for event in phase_events if event.peak_growth is not None]
+        peaks = [event.process_peak for event in phase_events if event.process_peak is not None]
+
+        lines.append("{:<20} {:>6} {:>11.1f} {:>11.1f} {:>16} {:>18}".format(
+            name,
+            len(phase_events),
+            sum(event.wall_time for event in phase_events) * 1000,
+            sum(event.cpu_time for event in phase_events) * 1000,
+            _format_memory(sum(growths) if growths else None),
+            _format_memory(max(peaks) if peaks else None)
+        ))
+
+    if modules:
+        lines.append("")
+        lines.append("Slowest modules:")
+        lines.extend(
+            "  {:<30} {:>9.1f} ms".format(module, wall_time * 1000)
+            for module, wall_time in sorted(modules.items(), key=lambda item: -item[1])[:SLOWEST_MODULE_COUNT]
+        )
+
+    return "\n".join(lines)
+
+
+def write_chrome_trace(events: list[PhaseEvent], path: str) -> None:
+    """
+    Write [events] to [path] in the Chrome trace event format
+    """
+
+    origin = min((event.start for event in events), default=0)
+    trace_events = []
+
+    for event in events:
+        args: dict[str, object] = {"cpu_ms": round(event.cpu_time * 1000, 3)}
+
+        if event.module is not None:
+            args["module"] = event.module
+        if event.peak_growth is not None:
+            args["peak_growth_mb"] = round(event.peak_growth / (1024 * 1024), 1)
+        if event.process_peak is not None:
+            args["process_peak_mb"] = round(event.process_peak / (1024 * 1024), 1)
+
+        trace_events.append({
+            "name": event.name if event.module is None else "{} {}".format(event.name, event.module),
+            "cat": event.name,
+            "ph": "X",
+            "ts": round((event.start - origin) * 1e6, 1),
+            "dur": round(event.wall_time * 1e6, 1),
+            "pid": event.pid,
+            "tid": event.thread_id,
+            "args": args
+        })
+
+    fs.write_file(path=path, data=json.dumps({
+        "traceEvents": trace_events,
+        "displayTimeUnit": "ms"
+    }))
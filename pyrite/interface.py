@@ -0,0 +1,248 @@
+"""
+Module interfaces: compact summaries of what a compiled module offers to the modules
+that import it. An interface holds the signatures of the module's top-level
+functions, its global variables, module constants, pragmas and import maps, and the
+types these refer to, with their layouts. Function bodies are only included for
+functions that callers may inline (see pyrite.inliner); other functions are known to
+their callers by signature alone.
+
+Modules are optimized, lowered and type-checked against the interfaces of the
+modules they import, never against their bodies, so a change to a module that does
+not alter its interface does not affect the modules that import it (see
+pyrite.cache.make_module_key). A ModuleInterface offers the same methods as a Module
+for this purpose, and NameResolver accepts either.
+
+Interfaces are serialized with marshal (format version 2, which does not depend on
+object identity and therefore produces the same bytes for the same interface), and
+identified by a hash of their serialized form.
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import marshal
+from typing import TYPE_CHECKING, Optional, Union
+from pyrite.globals import COMPILER_VERSION
+from pyrite.inliner import is_inline_candidate
+from pyrite.module import ConstantValue, GlobalScope, GlobalVariable, Module, ModulePragma, TopLevelFunction, Type, intern_type
+
+if TYPE_CHECKING:
+    from pyrite.prelude import Prelude
+
+# Identifies serialized interfaces, in addition to the compiler version
+_FORMAT_TAG = "pyrite-interface"
+_MARSHAL_VERSION = 2
+
+
+class ModuleInterface:
+    """
+    The interface of a compiled module. Its functions are TopLevelFunction objects
+    belonging to the interface; the bodies of functions that are not exported are
+    replaced with "...".
+    """
+
+    data: bytes
+    # a hash of [data]
+    key: str
+
+    _name: str
+    _is_stdlib: bool
+    _types: list[Type]
+    _global_scope: GlobalScope
+    _constants: dict[str, ConstantValue]
+    _pragma: ModulePragma
+    _imported_modules: dict[str, str]
+    _imported_symbols: dict[str, tuple[str, str]]
+    _prelude: Optional[Prelude]
+
+    def __init__(self, data: bytes):
+        """
+        Load the interface serialized as [data] by make_interface. Raise a ValueError
+        if [data] is not an interface produced by this version of the compiler.
+        """
+
+        try:
+            fields = marshal.loads(data)
+        except (EOFError, TypeError, ValueError) as err:
+            raise ValueError("invalid module interface") from err
+
+        if not isinstance(fields, tuple) or fields[:2] != (_FORMAT_TAG, COMPILER_VERSION):
+            raise ValueError("module interface is from a different compiler version")
+
+        (
+            _, _, name, is_stdlib, types, functions, global_variables,
+            constants, pragma, imported_modules, imported_symbols
+        ) = fields
+
+        self.data = data
+        self.key = hashlib.sha256(data).hexdigest()
+        self._name = name
+        self._is_stdlib = is_stdlib
+        self._types = [intern_type(*type) for type in types]
+        self._global_scope = GlobalScope(module=self)
+        self._constants = dict(constants)
+        self._pragma = ModulePragma(private_symbols=pragma[0], use_extern=pragma[1], no_inline=pragma[2])
+        self._imported_modules = dict(imported_modules)
+        self._imported_symbols = {alias: (module, symbol) for alias, module, symbol in imported_symbols}
+        self._prelude = None
+
+        self._global_scope.restore(
+            [self._load_function(*function) for function in functions],
+            {
+                variable_name: GlobalVariable(variable_name, self._types[type_index])
+                for variable_name, type_index in global_variables
+            }
+        )
+
+    def _load_function(
+        self,
+        name: str,
+        parameters: list[tuple[str, int]],
+        return_type: int,
+        source: Optional[str]
+    ) -> TopLevelFunction:
+        node = (
+            ast.parse(source).body[0] if source is not None
+            else _make_declaration(name, [parameter for parameter, _ in parameters])
+        )
+
+        assert isinstance(node, ast.FunctionDef)
+
+        function = TopLevelFunction(self, name, self._types[return_type], node)
+
+        for parameter, type_index in parameters:
+            function.add_argument(parameter, self._types[type_index])
+
+        return function
+
+    def attach_prelude(self, prelude: Prelude) -> None:
+        """
+        Make the shared prelude available when resolving names in the exported
+        function bodies of this interface, as with Module.attach_prelude
+        """
+
+        self._prelude = prelude
+
+    def get_prelude(self) -> Optional[Prelude]:
+        return self._prelude
+
+    def get_name(self) -> str:
+        return self._name
+
+    def is_stdlib_module(self) -> bool:
+        return self._is_stdlib
+
+    def is_internal_module(self) -> bool:
+        # stdlib/_internal is provided to other modules by the prelude instead
+        return False
+
+    def get_types(self) -> list[Type]:
+        return list(self._types)
+
+    def get_global_scope(self) -> GlobalScope:
+        return self._global_scope
+
+    def get_constants(self) -> dict[str, ConstantValue]:
+        return self._constants
+
+    def get_pragma(self) -> ModulePragma:
+        return self._pragma
+
+    def get_imported_modules(self) -> dict[str, str]:
+        return self._imported_modules
+
+    def get_imported_symbols(self) -> dict[str, tuple[str, str]]:
+        return self._imported_symbols
+
+
+# What other modules see of a module: the module itself or its interface
+ModuleView = Union[Module, ModuleInterface]
+
+
+def _make_declaration(name: str, parameters: list[str]) -> ast.FunctionDef:
+    """
+    Return a function definition with the given parameters, whose body is "..."
+    """
+
+    node = ast.FunctionDef(
+        name=name,
+        args=ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg=parameter) for parameter in parameters],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[]
+        ),
+        body=[ast.Expr(value=ast.Constant(value=Ellipsis))],
+        decorator_list=[],
+        returns=None,
+        lineno=1,
+        col_offset=0
+    )
+
+    return ast.fix_missing_locations(node)
+
+
+def make_interface(module: Module) -> ModuleInterface:
+    """
+    Return the interface of the compiled (and, if it is to include module constants,
+    optimized) [module]
+    """
+
+    types: list[Type] = []
+    type_indices: dict[Type, int] = {}
+
+    def type_index(type: Type) -> int:
+        if type not in type_indices:
+            type_indices[type] = len(types)
+            types.append(type)
+
+        return type_indices[type]
+
+    functions = []
+
+    for function in module.get_global_scope().get_functions():
+        # bodies are exported as written, since the body held by [function] may have
+        # been optimized using the bodies of other modules. Line numbers are not part of
+        # the interface, so that editing one function does not change the interface of
+        # the functions that follow it.
+        source = (
+            ast.get_source_segment(module.get_source_code(), function.node)
+            if is_inline_candidate(function) else None
+        )
+
+        functions.append((
+            function.name,
+            [(name, type_index(argument.type)) for name, argument in function.get_arguments().items()],
+            type_index(function.return_type),
+            source
+        ))
+
+    global_variables = [
+        (name, type_index(variable.type))
+        for name, variable in sorted(module.get_global_scope().get_global_variables().items())
+    ]
+
+    # types defined by the module are exported even if no signature refers to them
+    for type in module.get_types():
+        if type.parent_module_id == module.id:
+            type_index(type)
+
+    pragma = module.get_pragma()
+
+    data = marshal.dumps((
+        _FORMAT_TAG,
+        COMPILER_VERSION,
+        module.get_name(),
+        module.is_stdlib_module(),
+        [(type.name, type.built_in, type.size_bytes, type.parent_module_id) for type in types],
+        functions,
+        global_variables,
+        sorted(module.get_constants().items()),
+        (list(pragma.private_symbols), pragma.use_extern, list(pragma.no_inline)),
+        sorted(module.get_imported_modules().items()),
+        sorted((alias, *imported) for alias, imported in module.get_imported_symbols().items())
+    ), _MARSHAL_VERSION)
+
+    return ModuleInterface(data)
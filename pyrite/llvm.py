@@ -1,26 +1,126 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import os
 import shutil
+import tempfile
+import threading
 from pyrite import fs
-from pyrite.command_line import run_command
+from pyrite.artifacts import get_shared_store
+from pyrite.command_line import CommandOutput, run_command
 from pyrite.errors import UserError
 from pyrite.globals import Globals
+from pyrite.instrumentation import phase
+from pyrite.toolchain import Toolchain, load_toolchain
+from pyrite.util import content_hash
 from os.path import join
+from typing import Optional
+
+# The namespace of object files in a shared ArtifactStore
+OBJECT_NAMESPACE = "objects"
+
+# Every function is placed in a section of its own, so that the linker can remove the
+# functions that a program never calls (see LLVMInterface.link)
+SECTION_FLAGS = ["-ffunction-sections", "-fdata-sections"]
+
 
 class LLVMInterface:
-    _clang_path: str
+    """
+    Drives clang. The toolchain is only discovered once clang is first needed, so
+    that builds which do not produce an executable never look for it.
+    """
+
+    _toolchain: Optional[Toolchain]
+    _scratch_directory: Optional[str]
+    _keep_scratch_directory: bool
+    _object_pool: Optional[ThreadPoolExecutor]
+    _lock: threading.Lock
 
     def __init__(self):
-        self._clang_path = self._get_clang_path()
+        self._toolchain = None
+        self._scratch_directory = None
+        self._keep_scratch_directory = False
+        self._object_pool = None
+        self._lock = threading.Lock()
+
+    def get_toolchain(self) -> Toolchain:
+        """
+        Return the clang toolchain (see pyrite.toolchain), discovering it on first use
+        """
+
+        with self._lock:
+            if not self._toolchain:
+                self._toolchain = load_toolchain(
+                    Globals.get_compiler_options().clang_command,
+                    self.get_build_directory()
+                )
+
+            return self._toolchain
 
     def _get_clang_path(self) -> str:
-        clang_path = shutil.which(Globals.get_compiler_options().clang_command)
+        return self.get_toolchain().clang_path
 
-        if not clang_path:
-            raise UserError(
-                "Pyrite requires clang to be installed, but no such installation was found."
-            )
-        
-        return clang_path
+    def _require_flag(self, flag: str, option: str) -> None:
+        toolchain = self.get_toolchain()
+
+        if not toolchain.supports(flag):
+            raise UserError("{} requires a clang that supports {}, but {} does not".format(
+                option, flag, repr(toolchain.clang_version)
+            ))
+
+    def _prepare_ir_input(self, source: str, name: str) -> tuple[list[str], Optional[str]]:
+        """
+        Return the clang arguments and stdin contents needed to pass the IR [source] to
+        clang. The IR is either streamed over stdin or written to a scratch file named
+        after [name], depending on CompilerOptions.pipe_ir.
+        """
+
+        if Globals.get_compiler_options().pipe_ir:
+            return (["-x", "ir", "-"], source)
+
+        ir_path = self._make_scratch_file(name, ".ll")
+        fs.write_file(path=ir_path, data=source)
+        return ([ir_path], None)
     
+    def get_codegen_flags(self, include_profile: bool = True) -> list[str]:
+        """
+        Return the clang flags for the optimization level, link-time optimization and
+        profile-guided optimization settings of CompilerOptions. These flags are passed
+        both when compiling object files and when linking.
+        """
+
+        opts = Globals.get_compiler_options()
+        flags = ["-O" + opts.opt_level]
+
+        if opts.lto:
+            self._require_flag("-flto=thin", "--lto")
+            flags.append("-flto=thin")
+
+        if include_profile and opts.profile_generate:
+            self._require_flag("-fprofile-generate", "--pgo")
+            flags.append("-fprofile-generate=" + opts.profile_generate)
+
+        if include_profile and opts.profile_use:
+            flags.append("-fprofile-use=" + opts.profile_use)
+
+        return flags
+
+    def _get_object_key(self, source: str, include_profile: bool) -> str:
+        """
+        Return a hash identifying the object file compiled from [source] with the
+        current code generation flags and profile data
+        """
+
+        parts = [source, *self.get_codegen_flags(include_profile), *SECTION_FLAGS]
+        profile_use = Globals.get_compiler_options().profile_use
+
+        if include_profile and profile_use and os.path.exists(profile_use):
+            with open(profile_use, "rb") as fl:
+                parts.append(hashlib.sha256(fl.read()).hexdigest())
+
+        return content_hash("\0".join(parts))
+
     def compile_ll(self, source: str, output_path: str) -> None:
         """
         Compile the contents of [source] as LLVM IR code, outputting a binary
@@ -28,27 +128,219 @@ class LLVMInterface:
         raise an error.
         """
 
-        ir_path = join(self.get_build_directory(), "build.ll")
+        scratch = self.get_scratch_directory()
+        ir_args, ir_input = self._prepare_ir_input(source, "build")
+        tmp_output = join(scratch, os.path.basename(output_path))
+
+        with phase("clang"):
+            result = run_command(
+                [self._get_clang_path(), *self.get_codegen_flags(), *ir_args, "-o", tmp_output],
+                input=ir_input
+            )
+        
+        if result.returncode != 0:
+            self._raise_clang_error(result, "llvm_error.txt")
+
+        fs.move_into_place(tmp_output, output_path)
+
+    def _raise_clang_error(self, result: CommandOutput, report_name: str) -> None:
+        report_path = join(self.get_scratch_directory(), report_name)
+        self._keep_scratch_directory = True
 
         fs.write_file(
-            path=ir_path,
-            data=source
+            path=report_path,
+            data=result.stderr or "exited with status {}\n".format(result.returncode)
         )
 
-        result = run_command([self._clang_path, ir_path, "-o", output_path])
-        
-        if result.stderr:
-            fs.write_file(
-                path=join(self.get_build_directory(), "llvm_error.txt"),
-                data=result.stderr
+        raise UserError(
+            "An unexpected error occurred during the compilation process. A detailed report has been written to {}".format(
+                report_path
             )
+        )
 
-            raise UserError(
-                "An unexpected error occurred during the compilation process. A detailed report has been written to {}".format(
-                    self.get_build_directory()
-                )
+    def get_target_triple(self) -> str:
+        """
+        Return the target triple that clang compiles for by default
+        """
+
+        return self.get_toolchain().target_triple
+
+    def compile_object(
+        self,
+        name: str,
+        source: str,
+        object_directory: Optional[str] = None,
+        include_profile: bool = True
+    ) -> str:
+        """
+        Compile the LLVM IR translation unit [source] into an object file, returning
+        its path. [name] must uniquely identify the translation unit within
+        [object_directory], which defaults to a folder in the build directory.
+
+        Object files are named after a hash of the IR and flags they were compiled
+        with, so an object compiled from identical IR by any previous or concurrent
+        build is reused as-is, and concurrent builds never overwrite each other's
+        objects. If [include_profile] is not set, PGO flags are not applied.
+        """
+
+        object_directory = object_directory or join(self.get_build_directory(), "objects")
+        object_key = self._get_object_key(source, include_profile)
+        object_path = join(object_directory, "{}-{}.o".format(name, object_key[:16]))
+
+        if os.path.exists(object_path):
+            return object_path
+
+        tmp_object_path = self._make_scratch_file(name, ".o")
+        shared = get_shared_store()
+        # objects are only shared between machines that target the same platform
+        shared_key = content_hash(object_key + "\0" + self.get_target_triple()) if shared else ""
+
+        if shared:
+            data = shared.get(OBJECT_NAMESPACE, shared_key)
+
+            if data is not None:
+                fs.write_file(path=tmp_object_path, data=data)
+                fs.move_into_place(tmp_object_path, object_path)
+
+                return object_path
+
+        ir_args, ir_input = self._prepare_ir_input(source, name)
+
+        with phase("clang", name):
+            result = run_command(
+                [
+                    self._get_clang_path(),
+                    "-c",
+                    *self.get_codegen_flags(include_profile),
+                    *SECTION_FLAGS,
+                    *ir_args,
+                    "-o", tmp_object_path
+                ],
+                input=ir_input
+            )
+
+        if result.returncode != 0:
+            self._raise_clang_error(result, name + ".llvm_error.txt")
+
+        if shared:
+            with open(tmp_object_path, "rb") as fl:
+                shared.put(OBJECT_NAMESPACE, shared_key, fl.read())
+
+        fs.move_into_place(tmp_object_path, object_path)
+
+        return object_path
+
+    def _get_object_pool(self) -> ThreadPoolExecutor:
+        if not self._object_pool:
+            self._object_pool = ThreadPoolExecutor(
+                max_workers=Globals.get_compiler_options().jobs
             )
 
+        return self._object_pool
+
+    def submit_object(
+        self,
+        name: str,
+        source: str,
+        object_directory: Optional[str] = None,
+        include_profile: bool = True
+    ) -> Future[str]:
+        """
+        Start compiling [source] into an object file (see compile_object) in the
+        background, using at most CompilerOptions.jobs concurrent clang processes
+        """
+
+        return self._get_object_pool().submit(
+            self.compile_object, name, source, object_directory, include_profile
+        )
+
+    def compile_objects(
+        self,
+        units: list[tuple[str, str]],
+        object_directory: Optional[str] = None,
+        include_profile: bool = True
+    ) -> list[str]:
+        """
+        Compile each (name, IR source) pair of [units] into an object file, in parallel
+        if CompilerOptions.jobs allows it. Return the object file paths in the same
+        order as [units].
+        """
+
+        futures = [
+            self.submit_object(name, source, object_directory, include_profile)
+            for name, source in units
+        ]
+
+        return [future.result() for future in futures]
+
+    def _get_archiver_path(self) -> str:
+        for command in [Globals.get_compiler_options().ar_command, "ar"]:
+            path = shutil.which(command)
+
+            if path:
+                return path
+
+        raise UserError(
+            "Building the Pyrite runtime library requires llvm-ar or ar, but neither was found."
+        )
+
+    def create_static_library(self, object_paths: list[str], output_path: str) -> None:
+        """
+        Bundle the given object files into the static library [output_path]. The library
+        is built in the scratch directory and then moved into place, so that concurrent
+        builds never link against a partially written library.
+        """
+
+        tmp_path = join(self.get_scratch_directory(), os.path.basename(output_path))
+        fs.remove_path(tmp_path, ignore_if_missing=True)
+
+        # D: zero timestamps and owners, so that the library is reproducible
+        with phase("archive"):
+            result = run_command([self._get_archiver_path(), "rcsD", tmp_path, *object_paths])
+
+        if result.returncode != 0:
+            self._raise_clang_error(result, "archive_error.txt")
+
+        fs.move_into_place(tmp_path, output_path)
+
+    def _get_dead_stripping_flags(self) -> list[str]:
+        """
+        Return the linker flags that remove unreferenced sections from the executable,
+        such as the runtime library functions that a program does not use
+        """
+
+        triple = self.get_target_triple()
+
+        if "apple" in triple or "darwin" in triple:
+            return ["-Wl,-dead_strip"]
+        if "windows" in triple:
+            # the MSVC linker removes unreferenced functions by default
+            return []
+
+        return ["-Wl,--gc-sections"]
+
+    def link(self, object_paths: list[str], output_path: str, libraries: Optional[list[str]] = None) -> None:
+        """
+        Link the given object files and static [libraries] into the executable
+        [output_path]
+        """
+
+        tmp_output = join(self.get_scratch_directory(), os.path.basename(output_path))
+
+        with phase("link"):
+            result = run_command([
+                self._get_clang_path(),
+                *self.get_codegen_flags(),
+                *self._get_dead_stripping_flags(),
+                *object_paths,
+                *(libraries or []),
+                "-o", tmp_output
+            ])
+
+        if result.returncode != 0:
+            self._raise_clang_error(result, "link_error.txt")
+
+        fs.move_into_place(tmp_output, output_path)
 
     def get_build_directory(self) -> str:
         """
@@ -57,3 +349,47 @@ class LLVMInterface:
         cwd = Globals.get_compiler_options().cwd
 
         return join(cwd, "_build")
+
+    def get_scratch_directory(self) -> str:
+        """
+        Return a directory private to this build for intermediate files, so that
+        concurrent builds in the same working directory do not interfere with one
+        another. The directory is removed by cleanup().
+        """
+
+        with self._lock:
+            if not self._scratch_directory:
+                parent = join(self.get_build_directory(), "tmp")
+                os.makedirs(parent, exist_ok=True)
+                self._scratch_directory = tempfile.mkdtemp(prefix="build-", dir=parent)
+
+            return self._scratch_directory
+
+    def _make_scratch_file(self, name: str, suffix: str) -> str:
+        """
+        Create an empty file in the scratch directory and return its path. The file
+        name starts with [name] but is unique, since translation units of different
+        object directories (such as a user module and a runtime unit that are both
+        called "math") may be compiled at the same time.
+        """
+
+        fd, path = tempfile.mkstemp(prefix=name + "-", suffix=suffix, dir=self.get_scratch_directory())
+        os.close(fd)
+
+        return path
+
+    def cleanup(self) -> None:
+        """
+        Wait for background work to finish and remove the scratch directory, unless
+        it contains an error report
+        """
+
+        if self._object_pool:
+            self._object_pool.shutdown()
+            self._object_pool = None
+
+        if self._scratch_directory and not self._keep_scratch_directory:
+            fs.remove_path(self._scratch_directory, ignore_if_missing=True)
+
+        self._scratch_directory = None
+        self._keep_scratch_directory = False
@@ -1,29 +1,104 @@
 from __future__ import annotations
 
 import ast
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import os
 from pathlib import Path
-import random
-from typing import Optional, Union
-from pyrite.errors import CompileError, SemanticError
+import threading
+from typing import TYPE_CHECKING, Collection, Optional, Union
+from pyrite.errors import CompileError, ErrorCollector, SemanticError
 from pyrite.globals import Globals
-from pyrite.util import unwrap
+from pyrite.instrumentation import phase
+from pyrite.util import content_hash, unwrap
+
+if TYPE_CHECKING:
+    from pyrite.codegen import TranslationUnit
+    from pyrite.interface import ModuleInterface, ModuleView
+    from pyrite.prelude import Prelude
+
+# The values of compile-time constants
+ConstantValue = Union[int, float, bool, str]
+
+# Sizes of the built-in types, in bytes; int and float are 64-bit, as in CPython
+BUILTIN_TYPE_SIZES = {
+    "int": 8,
+    "str": 8,
+    "bool": 1,
+    "float": 8,
+    "None": 0
+}
+
+# c types declared in stdlib/_compiler_defined, only available to stdlib/_internal
+EXT_TYPE_SIZES = {
+    "_ext_Pointer": 8,
+    "_ext_Char": 1
+}
+
+
+def make_builtin_type(name: str) -> Type:
+    """
+    Return the built-in or compiler-defined type [name]
+    """
+
+    size_bytes = BUILTIN_TYPE_SIZES.get(name, EXT_TYPE_SIZES.get(name))
+
+    if size_bytes is None:
+        raise ValueError("no built-in type named {}".format(repr(name)))
+
+    return intern_type(name, size_bytes=size_bytes, built_in=True)
+
+
+def make_list_type(element: Type) -> Type:
+    """
+    Return the type of lists of [element] values. Lists are built-in types named
+    after their element type, such as list[int], and are held by reference.
+    """
+
+    return intern_type("list[{}]".format(element.name), size_bytes=8, built_in=True)
+
+
+def _make_type_from_name(name: str) -> Type:
+    if name.startswith("list[") and name.endswith("]"):
+        return make_list_type(_make_type_from_name(name[5:-1]))
+
+    return make_builtin_type(name)
+
+
+def get_element_type(type: Type) -> Optional[Type]:
+    """
+    Return the type of the items of [type] if it is a list type, or None otherwise
+    """
+
+    if not type.built_in or not type.name.startswith("list["):
+        return None
+
+    return _make_type_from_name(type.name[5:-1])
 
 
 class Type:
+    """
+    A type of the program. Types are interned (see intern_type): there is a single
+    Type object for each distinct type, so types compare by identity and can be used
+    as dict keys. [index] is a small integer that is unique to the type within the
+    compiler process.
+    """
+
+    __slots__ = ("name", "built_in", "parent_module_id", "size_bytes", "id", "index")
+
     name: str
     built_in: bool
     parent_module_id: Optional[str]
     size_bytes: int
     id: str
+    index: int
 
-    def __init__(self, name: str, built_in: bool, size_bytes: int, parent_module_id: Optional[str] = None) -> None:
+    def __init__(self, name: str, built_in: bool, size_bytes: int, index: int, parent_module_id: Optional[str] = None) -> None:
         self.name = name
         self.built_in = built_in
         self.parent_module_id = parent_module_id
         self.size_bytes = size_bytes
+        self.index = index
 
         if built_in and parent_module_id is not None:
             raise ValueError(
@@ -36,11 +111,53 @@ class Type:
             assert self.parent_module_id
             self.id = self.parent_module_id + "_" + self.name
 
-    def __eq__(self, other: Type) -> bool:
-        return self.id == other.id
+    def __reduce__(self):
+        # types are interned again when they are unpickled, so that identity holds
+        # across processes and cached artifacts; indexes are not preserved
+        return (intern_type, (self.name, self.built_in, self.size_bytes, self.parent_module_id))
+
+    def __repr__(self) -> str:
+        return "Type({})".format(repr(self.id))
+
+
+class _TypeRegistry:
+    _types: dict[str, Type]
+    _lock: threading.Lock
+
+    def __init__(self):
+        self._types = {}
+        self._lock = threading.Lock()
+
+    def intern(self, name: str, built_in: bool, size_bytes: int, parent_module_id: Optional[str]) -> Type:
+        type_id = name if built_in else "{}_{}".format(parent_module_id, name)
+
+        with self._lock:
+            type = self._types.get(type_id)
+
+            if type is None:
+                type = Type(name, built_in, size_bytes, len(self._types), parent_module_id)
+                self._types[type_id] = type
+            elif type.size_bytes != size_bytes or type.built_in != built_in:
+                raise ValueError("conflicting definitions of type {}".format(repr(type_id)))
+
+        return type
+
+
+_type_registry = _TypeRegistry()
+
+
+def intern_type(name: str, built_in: bool, size_bytes: int, parent_module_id: Optional[str] = None) -> Type:
+    """
+    Return the Type object representing the given type, creating it if it does not
+    exist yet. Raise a ValueError if the type exists with a different definition.
+    """
+
+    return _type_registry.intern(name, built_in, size_bytes, parent_module_id)
 
 
 class Symbol:
+    __slots__ = ("name",)
+
     name: str
 
     def __init__(self, name: str):
@@ -48,11 +165,13 @@ class Symbol:
 
 
 class Scope:
-    module: Module
+    __slots__ = ("module", "parent_scope", "_local_variables")
+
+    module: ModuleView
     parent_scope: Union[Scope, GlobalScope]
     _local_variables: dict[str, LocalVariable]
 
-    def __init__(self, module: Module, parent_scope: Union[Scope, GlobalScope]):
+    def __init__(self, module: ModuleView, parent_scope: Union[Scope, GlobalScope]):
         self.module = module
         self.parent_scope = parent_scope
         self._local_variables = {}
@@ -67,9 +186,11 @@ class Scope:
 
 
 class FunctionScope(Scope):
+    __slots__ = ("function",)
+
     function: TopLevelFunction
 
-    def __init__(self, module: Module, function: TopLevelFunction):
+    def __init__(self, module: ModuleView, function: TopLevelFunction):
         super().__init__(module=module, parent_scope=module.get_global_scope())
         self.function = function
 
@@ -83,6 +204,8 @@ class FunctionScope(Scope):
 
 
 class Variable(Symbol):
+    __slots__ = ("type",)
+
     type: Type
 
     def __init__(self, name: str, type: Type):
@@ -91,6 +214,8 @@ class Variable(Symbol):
 
 
 class LocalVariable(Variable):
+    __slots__ = ("scope", "function")
+
     scope: Scope
     function: TopLevelFunction
 
@@ -101,21 +226,42 @@ class LocalVariable(Variable):
 
 
 class GlobalVariable(Variable):
+    __slots__ = ("scope",)
+
     scope: GlobalScope
 
     def __init__(self, name: str, type: Type):
         super().__init__(name, type)
 
 
+class ModuleConstant(Symbol):
+    """
+    A top-level name bound to a value computed at compile time (see pyrite.folding)
+    """
+
+    __slots__ = ("value",)
+
+    value: ConstantValue
+
+    def __init__(self, name: str, value: ConstantValue):
+        super().__init__(name)
+        self.value = value
+
+
 class TopLevelFunction(Symbol):
+    __slots__ = ("return_type", "node", "_function_scope", "_args")
+
     return_type: Type
+    node: ast.FunctionDef
     _function_scope: FunctionScope
     _args: dict[str, LocalVariable]
 
-    def __init__(self, module: Module, name: str, return_type: Type):
+    def __init__(self, module: ModuleView, name: str, return_type: Type, node: ast.FunctionDef):
         super().__init__(name)
 
         self.return_type = return_type
+        self.node = node
+        self._args = {}
         self._function_scope = FunctionScope(module, function=self)
 
     def add_argument(self, name: str, type: Type):
@@ -132,25 +278,64 @@ class TopLevelFunction(Symbol):
     def get_arguments(self) -> dict[str, LocalVariable]:
         return self._args
 
+    def get_module(self) -> ModuleView:
+        return self._function_scope.module
+
 
 class GlobalScope:
-    module: Module
-    _tl_functions: list[TopLevelFunction]
+    __slots__ = ("module", "_tl_functions", "_global_variables")
+
+    module: ModuleView
+    # top-level functions by name, in definition order
+    _tl_functions: dict[str, TopLevelFunction]
     _global_variables: dict[str, GlobalVariable]
 
-    def __init__(self, module: Module):
+    def __init__(self, module: ModuleView):
         self.module = module
-        self._tl_functions = []
+        self._tl_functions = {}
         self._global_variables = {}
 
+    def add_function(self, function: TopLevelFunction, node: ast.AST) -> None:
+        if function.name in self._tl_functions:
+            raise SemanticError(
+                node, "Duplicate function {}".format(repr(function.name))
+            )
+
+        self._tl_functions[function.name] = function
+
+    def get_functions(self) -> list[TopLevelFunction]:
+        return list(self._tl_functions.values())
+
+    def get_function(self, name: str) -> Optional[TopLevelFunction]:
+        return self._tl_functions.get(name)
+
+    def restore(self, functions: list[TopLevelFunction], global_variables: dict[str, GlobalVariable]) -> None:
+        self._tl_functions = {function.name: function for function in functions}
+        self._global_variables = dict(global_variables)
+
+    def get_global_variables(self) -> dict[str, GlobalVariable]:
+        return dict(self._global_variables)
+
     def resolve_symbol(self, identifier: ast.Name) -> Symbol:
         symbol_name = identifier.id
 
         if symbol_name in self._global_variables:
             return self._global_variables[symbol_name]
 
-        for function in self._tl_functions:
-            if function.name == symbol_name:
+        function = self._tl_functions.get(symbol_name)
+
+        if function:
+            return function
+
+        prelude = self.module.get_prelude()
+
+        if prelude:
+            function = prelude.resolve_function(
+                symbol_name,
+                include_private=self.module.is_stdlib_module()
+            )
+
+            if function:
                 return function
 
         raise SemanticError(
@@ -164,9 +349,31 @@ class ModuleType(Enum):
     SOURCE_STRING = 3
 
 
+def _index_lines(source: str) -> list[int]:
+    """
+    Return the offset at which each line of [source] starts, followed by an offset one
+    past the end of [source]
+    """
+
+    offsets = [0]
+    offset = source.find("\n")
+
+    while offset != -1:
+        offsets.append(offset + 1)
+        offset = source.find("\n", offset + 1)
+
+    offsets.append(len(source) + 1)
+
+    return offsets
+
+
 class ModuleSource:
     _qualifier: str
     type: ModuleType
+    # the source code as it was last loaded, and its line index (see _index_lines),
+    # which is built when a line is first needed for a diagnostic
+    _loaded_source: Optional[str]
+    _line_offsets: Optional[list[int]]
 
     def __init__(self, type: ModuleType, qualifier: str):
         """
@@ -179,6 +386,8 @@ class ModuleSource:
         """
         self.type = type
         self._qualifier = qualifier
+        self._loaded_source = None
+        self._line_offsets = None
 
     def _resolve_source_file_path(self, path: str) -> str:
         if os.path.isabs(path):
@@ -210,26 +419,74 @@ class ModuleSource:
         opts = Globals.get_compiler_options()
 
         if self.type == ModuleType.SOURCE_STRING:
-            return self._qualifier
+            source = self._qualifier
+        else:
+            with open(self.get_source_path()) as fl:
+                source = fl.read()
+
+        if source != self._loaded_source:
+            self._loaded_source = source
+            self._line_offsets = None
 
-        with open(self.get_source_path()) as fl:
-            return fl.read()
+        return source
 
     def get_qualifier(self) -> str:
         return self._qualifier
 
+    def get_qualified_name(self) -> str:
+        """
+        Return a name identifying this module independently of where the program is
+        built: the path of a source file relative to the compiler CWD (or its absolute
+        path, if it lies outside of the CWD), or the module name of a stdlib module
+        """
+
+        if self.type == ModuleType.SOURCE_FILE:
+            path = Path(self.get_source_path())
+
+            try:
+                return path.relative_to(Globals.get_compiler_options().cwd).as_posix()
+            except ValueError:
+                return path.as_posix()
+
+        if self.type == ModuleType.STDLIB:
+            return "std:" + self._qualifier
+
+        return "string"
+
     def make_module_id(self) -> str:
+        """
+        Return the id of this module, which is stable across compiler processes and
+        machines so that compiler output is reproducible
+        """
+
         if self.type == ModuleType.SOURCE_STRING:
-            return "src_{:02X}".format(hash(random.random()))
+            # the qualifier of a source string is its content
+            return "src_" + content_hash(self._qualifier)[:16].upper()
 
         if self.type == ModuleType.SOURCE_FILE:
-            return "mod_{:02X}".format(hash(self.get_qualifier()))
+            return "mod_" + content_hash(self.get_qualified_name())[:16].upper()
 
         if self.type == ModuleType.STDLIB:
-            return "lib_{:02X}".format(hash(self.get_qualifier()))
+            # stdlib module names are unique, and the ids of stdlib modules must be the
+            # same in every compiler process, since they are compiled into the prebuilt
+            # runtime library
+            return "lib_" + self.get_qualifier()
 
         raise ValueError()
 
+    def get_module_name(self) -> str:
+        """
+        Return the name by which other modules import this module; for source
+        strings, which cannot be imported, return the module qualifier itself
+        """
+
+        if self.type == ModuleType.STDLIB:
+            return self._qualifier
+        if self.type == ModuleType.SOURCE_FILE:
+            return Path(self._qualifier).stem
+
+        return self._qualifier
+
     def get_source_directory(self) -> str:
         """
         Return the directory containing this source file; if the source
@@ -251,67 +508,104 @@ class ModuleSource:
     def get_line_content(self, lineno: int) -> str:
         """
         Return the contents of line [lineno] of the source code, where [lineno] starts at 1.
+        The source is only read if it has not been loaded before.
         """
 
-        return self.load_source_string().split("\n")[lineno - 1]
+        source = self._loaded_source
 
+        if source is None:
+            source = self.load_source_string()
 
-def load_internal_module() -> Module:
-    """
-    stdlib/_internal defines a collection of types and methods that are meant to be
-    built in to the Python runtime, such as "str" and "list".
+        if self._line_offsets is None:
+            self._line_offsets = _index_lines(source)
 
-    _internal should not be registered as an actual module dependency, but its contents
-    should be compiled independently and placed at the top of every built LLVM file.
-    """
+        offsets = self._line_offsets
+
+        if not 1 <= lineno < len(offsets):
+            return ""
 
-    internal = Module(ModuleSource(ModuleType.STDLIB, "_internal"))
-    internal.compile()
-    return internal
+        return source[offsets[lineno - 1]:offsets[lineno] - 1]
 
 
 @dataclass
 class ModulePragma:
     private_symbols: list[str]
     use_extern: bool
+    # functions that must never be inlined into their callers (see pyrite.inliner)
+    no_inline: list[str] = field(default_factory=list)
 
 
 class Module:
     _module_type: ModuleType
     _source: ModuleSource
     _source_code_cache: str
+    # the syntax tree of the source, which is kept unchanged for as long as the module
+    # is; compile() analyzes a tree of its own (see _parse_for_analysis)
     _root_node: Optional[ast.Module]
+    # the names bound by the import statements of the module, indexed on first use
+    _imported_symbols: Optional[dict[str, tuple[str, str]]]
+    _imported_modules: Optional[dict[str, str]]
 
     id: str
 
     # Semantics
     _types: dict[str, Type]
     _global_scope: GlobalScope
+    _pragma: ModulePragma
+    _prelude: Optional[Prelude]
+    # top-level names bound to values computed at compile time (see pyrite.folding)
+    _constants: dict[str, ConstantValue]
+
+    # Code generation
+    _unit: Optional[TranslationUnit]
+    # the interface of this module (see pyrite.interface), made on first use
+    _interface: Optional[ModuleInterface]
+
+    # The key (see pyrite.cache.make_module_key) of the analysis this module currently
+    # holds, if any
+    analysis_key: Optional[str]
 
     def __init__(self, source: ModuleSource):
         self._source = source
         self._module_type = source.type
         self._source_code_cache = ""
+        self._root_node = None
+        self._imported_symbols = None
+        self._imported_modules = None
         self._types = {}
+        self._pragma = ModulePragma(private_symbols=[], use_extern=False)
+        self._prelude = None
+        self._constants = {}
+        self._unit = None
+        self._interface = None
+        self.analysis_key = None
 
         self.id = source.make_module_id()
         self._global_scope = GlobalScope(module=self)
 
+    def attach_prelude(self, prelude: Prelude) -> None:
+        """
+        Make the types and top-level functions of the shared stdlib/_internal prelude
+        available to this module. This should be called before compilation for every
+        module other than _internal itself.
+        """
+
+        if self.is_internal_module():
+            raise ValueError("cannot attach a prelude to stdlib/_internal")
+
+        self._prelude = prelude
+
+    def get_prelude(self) -> Optional[Prelude]:
+        return self._prelude
+
     def _load_builtin_types(self) -> None:
-        builtin = [
-            Type("int", size_bytes=4, built_in=True),
-            Type("str", size_bytes=8, built_in=True),
-            Type("bool", size_bytes=1, built_in=True),
-            Type("float", size_bytes=4, built_in=True),
-            Type("None", size_bytes=0, built_in=True)
-        ]
-
-        # load _internal module, if necessary
-        
-        if not self.is_internal_module():
-            internal = load_internal_module()
-
-            for type in internal.get_types():
+        builtin = [make_builtin_type(name) for name in BUILTIN_TYPE_SIZES]
+
+        if self.is_internal_module():
+            # c types declared in stdlib/_compiler_defined; see that module for details
+            builtin.extend(make_builtin_type(name) for name in EXT_TYPE_SIZES)
+        else:
+            for type in unwrap(self._prelude).get_types():
                 self._register_type(type)
 
         for type in builtin:
@@ -321,29 +615,117 @@ class Module:
         self._types[type.name] = type
 
     def _load_and_build_ast(self) -> None:
-        self._source_code_cache = self._source.load_source_string()
-        self._root_node = ast.parse(self._source_code_cache)
+        with phase("read", self.get_name()):
+            self._source_code_cache = self._source.load_source_string()
 
-    def get_dependencies(self) -> list[str]:
-        dependencies: list[str] = []
+        with phase("parse", self.get_name()):
+            self._root_node = ast.parse(self._source_code_cache)
+
+        self._imported_symbols = None
+        self._imported_modules = None
+
+    def load(self) -> None:
+        """
+        Read and parse the source of this module, if this has not been done already
+        """
+
+        if not self._root_node:
+            self._load_and_build_ast()
+
+    def _parse_for_analysis(self) -> ast.Module:
+        """
+        Return a new syntax tree of the source this module was loaded from. Optimization
+        passes rewrite the bodies of analyzed functions in place, so analyzing the tree
+        kept by load() would let a later analysis of the same module, such as after an
+        imported module changed, start from the bodies optimized for its previous
+        dependencies.
+        """
+
+        with phase("parse", self.get_name()):
+            return ast.parse(self._source_code_cache)
+
+    def has_source_changed(self) -> bool:
+        """
+        Return True if the source of this module differs from the source it was loaded
+        from. A module that has not been loaded yet is considered changed.
+        """
+
+        if not self._root_node:
+            return True
+
+        return self._source.load_source_string() != self._source_code_cache
+
+    def get_source_code(self) -> str:
+        """
+        Return the source code this module was loaded from
+        """
+
+        self.load()
+        return self._source_code_cache
+
+    def get_source_hash(self) -> str:
+        self.load()
+        return content_hash(self._source_code_cache)
+
+    def get_name(self) -> str:
+        return self._source.get_module_name()
+
+    def get_dependency_nodes(self) -> list[tuple[str, ast.stmt]]:
+        """
+        Return the name of each module imported by this module, along with the
+        corresponding import statement
+        """
+
+        dependencies: list[tuple[str, ast.stmt]] = []
 
         for node in self.assert_ast_loaded().body:
             if isinstance(node, ast.Import):
                 dependencies.extend(
-                    module.name
+                    (module.name, node)
                     for module in node.names
                 )
+            if isinstance(node, ast.ImportFrom) and node.module:
+                dependencies.append((node.module, node))
 
         return dependencies
 
+    def get_dependencies(self) -> list[str]:
+        return [name for name, _ in self.get_dependency_nodes()]
+
     def _resolve_type_name(self, name: str) -> Optional[Type]:
         return self._types.get(name)
 
     def resolve_type(self, identifier: ast.expr) -> Type:
         type_name = None
 
+        # list[T]
+        if (
+            isinstance(identifier, ast.Subscript)
+            and isinstance(identifier.value, ast.Name)
+            and identifier.value.id == "list"
+        ):
+            element = self.resolve_type(identifier.slice)
+
+            if element.name == "None":
+                raise SemanticError(identifier.slice, "Lists cannot hold None")
+
+            return make_list_type(element)
+
         if isinstance(identifier, ast.Constant):
             type_name = str(identifier.value)
+
+            # a quoted annotation, such as "list[int]"
+            if isinstance(identifier.value, str) and not self._resolve_type_name(type_name):
+                try:
+                    annotation = ast.parse(identifier.value, mode="eval").body
+                except SyntaxError:
+                    annotation = None
+
+                if isinstance(annotation, ast.Subscript):
+                    for node in ast.walk(annotation):
+                        ast.copy_location(node, identifier)
+
+                    return self.resolve_type(annotation)
         if isinstance(identifier, ast.Name):
             type_name = str(identifier.id)
 
@@ -373,39 +755,230 @@ class Module:
         function = TopLevelFunction(
             module=self,
             name=fdef_node.name,
-            return_type=self.resolve_type(return_type_expr)
+            return_type=self.resolve_type(return_type_expr),
+            node=fdef_node
         )
 
+        for arg in fdef_node.args.args:
+            if arg.annotation is None:
+                raise SemanticError(arg, "Argument is missing type annotation")
+
+            function.add_argument(arg.arg, self.resolve_type(arg.annotation))
+
         for node in body:
             pass
 
         return function
 
-    def _resolve_pragmas(self) -> None:
+    def _resolve_pragmas(self, errors: ErrorCollector) -> None:
         """
         Some modules may have top-level constants prefixed with "__PRAGMA", as a way to provide
         additional information to the compiler. Only stdlib modules are currently allowed to
-        use pragmas.
+        use pragmas, with the exception of __PRAGMA_NOINLINE.
 
         This method should be called pre-compilation, and will scan the module for these
-        directives and parse out information.
+        directives and parse out information. Errors in directives are passed to [errors].
         """
 
         for node in self.assert_ast_loaded().body:
-            # TODO: implement
-            pass
+            if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+                continue
+
+            target = node.targets[0]
+
+            if not isinstance(target, ast.Name) or not target.id.startswith("__PRAGMA_"):
+                continue
+
+            try:
+                self._resolve_pragma(target.id, node)
+            except CompileError as err:
+                errors.add(err)
+
+        self._pragma.use_extern = self.is_internal_module()
+
+    def _resolve_pragma(self, name: str, node: ast.Assign) -> None:
+        if name == "__PRAGMA_NOINLINE":
+            self._pragma.no_inline.extend(
+                self._read_pragma_string_list(node.value)
+            )
+            return
+
+        if self._module_type != ModuleType.STDLIB:
+            raise SemanticError(
+                node, "Pragmas may only be used by standard library modules"
+            )
+
+        if name == "__PRAGMA_INTERNAL":
+            self._pragma.private_symbols.extend(
+                self._read_pragma_string_list(node.value)
+            )
+        else:
+            raise SemanticError(
+                node, "Unknown pragma {}".format(repr(name))
+            )
+
+    def _read_pragma_string_list(self, value: ast.expr) -> list[str]:
+        if not isinstance(value, ast.List):
+            raise SemanticError(value, "Expected a list of strings")
+
+        items: list[str] = []
+
+        for element in value.elts:
+            if not isinstance(element, ast.Constant) or not isinstance(element.value, str):
+                raise SemanticError(element, "Expected a string")
+
+            items.append(element.value)
+
+        return items
+
+    def restore_analysis(
+        self,
+        types: dict[str, Type],
+        functions: list[TopLevelFunction],
+        global_variables: dict[str, GlobalVariable],
+        pragma: ModulePragma,
+        constants: dict[str, ConstantValue],
+        unit: Optional[TranslationUnit],
+        interface: Optional[ModuleInterface] = None
+    ) -> None:
+        """
+        Restore the result of a previous compilation of this module (see pyrite.cache)
+        in place of calling compile()
+        """
+
+        self._types = dict(types)
+        self._global_scope.restore(functions, global_variables)
+        self._pragma = pragma
+        self._constants = dict(constants)
+        self._unit = unit
+        self._interface = interface
+
+    def _reset_analysis(self) -> None:
+        self._types = {}
+        self._global_scope = GlobalScope(module=self)
+        self._pragma = ModulePragma(private_symbols=[], use_extern=False)
+        self._constants = {}
+        self._unit = None
+        self._interface = None
 
     def compile(self) -> None:
-        self._load_and_build_ast()
-        self._load_builtin_types()
+        """
+        Analyze this module. Analysis continues past errors, so that every error in the
+        module is reported at once; see ErrorCollector.
+        """
+
+        self.load()
+
+        with phase("analysis", self.get_name()):
+            self._reset_analysis()
+            self._load_builtin_types()
+
+            errors = ErrorCollector()
+            self._resolve_pragmas(errors)
+
+            for node in self._parse_for_analysis().body:
+                if isinstance(node, ast.FunctionDef):
+                    try:
+                        self._global_scope.add_function(
+                            self._handle_top_level_function(node),
+                            node
+                        )
+                    except CompileError as err:
+                        errors.add(err)
+
+            errors.raise_errors()
+
+    def lower(self, modules: dict[str, ModuleView]) -> None:
+        """
+        Emit the LLVM IR translation unit of this module. This should be called after
+        compile() and any whole-program optimization passes (see pyrite.optimizer).
+        [modules] maps the names of the modules of the program to the modules themselves
+        or their interfaces.
+        """
+
+        # the code generator depends on this module
+        from pyrite.codegen import emit_module
+
+        with phase("codegen", self.get_name()):
+            self._unit = emit_module(self, modules)
 
-        for node in unwrap(self._root_node).body:
-            if isinstance(node, ast.FunctionDef):
-                self._handle_top_level_function(node)
+    def get_translation_unit(self) -> Optional[TranslationUnit]:
+        return self._unit
+
+    def get_ir(self, function_names: Optional[Collection[str]] = None) -> str:
+        """
+        Return the LLVM IR translation unit emitted for this module by lower(), defining
+        only the functions [function_names] if given
+        """
+
+        return self._unit.get_ir(function_names) if self._unit else ""
+
+    def get_interface(self) -> ModuleInterface:
+        """
+        Return the interface of this module (see pyrite.interface). It is made on first
+        use after compilation, so this should only be called once the module has been
+        optimized, since its module constants are part of the interface.
+        """
+
+        if not self._interface:
+            # the interface module depends on this module
+            from pyrite.interface import make_interface
+            self._interface = make_interface(self)
+
+        return self._interface
+
+    def has_interface(self) -> bool:
+        return self._interface is not None
+
+    def _index_imports(self) -> None:
+        imported_symbols: dict[str, tuple[str, str]] = {}
+        imported_modules: dict[str, str] = {}
+
+        for node in self.assert_ast_loaded().body:
+            if isinstance(node, ast.ImportFrom) and node.module:
+                for alias in node.names:
+                    imported_symbols[alias.asname or alias.name] = (node.module, alias.name)
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imported_modules[alias.asname or alias.name] = alias.name
+
+        self._imported_symbols = imported_symbols
+        self._imported_modules = imported_modules
+
+    def get_imported_symbols(self) -> dict[str, tuple[str, str]]:
+        """
+        Return the names bound by "from X import y [as z]" statements, mapped to the
+        (module name, symbol name) they refer to
+        """
+
+        if self._imported_symbols is None:
+            self._index_imports()
+
+        return unwrap(self._imported_symbols)
+
+    def get_imported_modules(self) -> dict[str, str]:
+        """
+        Return the names bound by "import X [as y]" statements, mapped to the module
+        name they refer to
+        """
+
+        if self._imported_modules is None:
+            self._index_imports()
+
+        return unwrap(self._imported_modules)
 
     def get_global_scope(self) -> GlobalScope:
         return self._global_scope
 
+    def get_pragma(self) -> ModulePragma:
+        return self._pragma
+
+    def get_constants(self) -> dict[str, ConstantValue]:
+        return self._constants
+
+    def set_constant(self, name: str, value: ConstantValue) -> None:
+        self._constants[name] = value
+
     def get_source_path(self) -> str:
         return self._source.get_source_path()
 
@@ -415,6 +988,9 @@ class Module:
     def get_types(self) -> list[Type]:
         return list(self._types.values())
 
+    def get_type(self, name: str) -> Optional[Type]:
+        return self._resolve_type_name(name)
+
     def assert_ast_loaded(self) -> ast.Module:
         """
         The actual source code contents of a module are not actually read until
@@ -436,3 +1012,6 @@ class Module:
         """
 
         return self._source.type == ModuleType.STDLIB and self._source.get_qualifier() == "_internal"
+
+    def is_stdlib_module(self) -> bool:
+        return self._source.type == ModuleType.STDLIB
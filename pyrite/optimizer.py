@@ -0,0 +1,38 @@
+"""
+Optimization passes over the AST of analyzed modules. Passes run after a module has
+been compiled and before it is lowered to LLVM IR, in dependency order, so that a
+module's passes can rely on every module it imports being optimized already.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from pyrite.evaluator import Evaluator
+from pyrite.folding import fold_function, fold_module_constants
+from pyrite.inliner import inline_function_calls
+from pyrite.module import Module
+
+if TYPE_CHECKING:
+    from pyrite.interface import ModuleView
+
+
+def optimize_module(module: Module, modules: dict[str, ModuleView]) -> None:
+    """
+    Run the optimization pipeline on the compiled [module]. [modules] maps the names of
+    the modules of the program to the modules themselves or their interfaces.
+    """
+
+    evaluator = Evaluator(modules)
+    functions = module.get_global_scope().get_functions()
+
+    fold_module_constants(module, modules, evaluator)
+
+    # folding first keeps the bodies considered for inlining small, and folding
+    # again afterwards evaluates the constant arguments that inlining exposes
+    for function in functions:
+        fold_function(function, modules, evaluator)
+
+    inline_function_calls(module, modules)
+
+    for function in functions:
+        fold_function(function, modules, evaluator)
@@ -0,0 +1,115 @@
+"""
+Profile-guided optimization. A PGO build is done in four steps:
+  1. the program is built with instrumentation (CompilerOptions.profile_generate)
+  2. the instrumented program is run on a representative training workload
+  3. the raw profiles written by the training run are merged with llvm-profdata
+  4. the program is rebuilt, optimized using the merged profile
+     (CompilerOptions.profile_use)
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+from os.path import join
+import shutil
+from typing import Callable
+from pyrite import fs
+from pyrite.command_line import run_command
+from pyrite.compiler import Compiler
+from pyrite.errors import UserError
+from pyrite.globals import CompilerOptions, Globals
+
+
+def _get_profile_directory() -> str:
+    return join(Globals.get_compiler_options().cwd, "_build", "pgo")
+
+
+def _merge_profiles(raw_directory: str, output_path: str) -> None:
+    opts = Globals.get_compiler_options()
+    profdata_path = shutil.which(opts.profdata_command)
+
+    if not profdata_path:
+        raise UserError(
+            "Profile-guided optimization requires llvm-profdata, but no such installation was found."
+        )
+
+    raw_profiles = [
+        join(raw_directory, name)
+        for name in sorted(os.listdir(raw_directory))
+        if name.endswith(".profraw")
+    ]
+
+    if not raw_profiles:
+        raise UserError("The training run did not produce any profile data")
+
+    result = run_command([profdata_path, "merge", "-o", output_path, *raw_profiles])
+
+    if result.returncode != 0:
+        raise UserError("Failed to merge profile data: " + result.stderr.strip())
+
+
+def build_with_pgo(add_sources: Callable[[Compiler], None], training_args: list[str]) -> bool:
+    """
+    Build the executable at CompilerOptions.output_path using profile-guided
+    optimization. [add_sources] registers the program's source files with a Compiler,
+    and [training_args] are the command line arguments the instrumented program is
+    run with to collect a profile. Return True if the optimized build succeeded.
+    """
+
+    opts = Globals.get_compiler_options()
+
+    if not opts.output_path:
+        raise UserError("Profile-guided optimization requires an output path")
+
+    profile_directory = _get_profile_directory()
+    raw_directory = join(profile_directory, "raw")
+    merged_path = join(profile_directory, "merged.profdata")
+    instrumented_path = join(profile_directory, "instrumented")
+
+    fs.remove_path(raw_directory, ignore_if_missing=True)
+    os.makedirs(raw_directory)
+
+    try:
+        # 1. instrumented build
+        Globals.set_compiler_options(dataclasses.replace(
+            opts,
+            output_path=instrumented_path,
+            profile_generate=raw_directory,
+            profile_use=None
+        ))
+
+        compiler = Compiler()
+        add_sources(compiler)
+
+        if not compiler.build():
+            return False
+
+        # 2. training run; the instrumented program writes its raw profiles into
+        # raw_directory when it exits. The exit status is main's return value, so
+        # only a run killed by a signal (which writes no profile) is a failure
+        result = run_command([instrumented_path, *training_args])
+
+        if result.returncode < 0:
+            raise UserError(
+                "The training run was terminated by signal {}: {}".format(
+                    -result.returncode, result.stderr.strip()
+                )
+            )
+
+        # 3. merge
+        _merge_profiles(raw_directory, merged_path)
+
+        # 4. optimized rebuild
+        Globals.set_compiler_options(dataclasses.replace(
+            opts,
+            profile_generate=None,
+            profile_use=merged_path
+        ))
+
+        compiler = Compiler()
+        add_sources(compiler)
+
+        return compiler.build()
+    finally:
+        Globals.set_compiler_options(opts)
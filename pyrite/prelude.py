@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import os
+import pickle
+from typing import Optional
+from pyrite import fs
+from pyrite.globals import COMPILER_VERSION, Globals
+from pyrite.module import Module, ModulePragma, ModuleSource, ModuleType, TopLevelFunction, Type
+from pyrite.optimizer import optimize_module
+from pyrite.util import RestrictedUnpickler, content_hash
+
+PRELUDE_CACHE_FILENAME = "_internal.prelude"
+
+
+@dataclass(frozen=True)
+class Prelude:
+    """
+    stdlib/_internal defines a collection of types and methods that are meant to be
+    built in to the Python runtime, such as "str" and "list".
+
+    _internal should not be registered as an actual module dependency, but its contents
+    should be compiled independently and placed at the top of every built LLVM file.
+    A Prelude is the analyzed result of _internal; it is built once per compiler session
+    and shared by every other module.
+    """
+
+    compiler_version: str
+    source_hash: str
+    types: tuple[Type, ...]
+    functions: dict[str, TopLevelFunction]
+    pragma: ModulePragma
+    # the translation unit of _internal, compiled into the runtime library
+    ir: str
+
+    @staticmethod
+    def from_module(internal: Module, source_hash: str) -> Prelude:
+        return Prelude(
+            compiler_version=COMPILER_VERSION,
+            source_hash=source_hash,
+            # compiler-defined c types are only available to _internal itself
+            types=tuple(
+                type for type in internal.get_types()
+                if not type.name.startswith("_ext_")
+            ),
+            functions={
+                function.name: function
+                for function in internal.get_global_scope().get_functions()
+            },
+            pragma=internal.get_pragma(),
+            ir=internal.get_ir()
+        )
+
+    def get_types(self) -> list[Type]:
+        return list(self.types)
+
+    def resolve_function(self, name: str, include_private: bool) -> Optional[TopLevelFunction]:
+        """
+        Return the prelude function named [name], if any. Functions listed by the
+        __PRAGMA_INTERNAL directive are only visible if [include_private] is set.
+        """
+
+        if not include_private and name in self.pragma.private_symbols:
+            return None
+
+        return self.functions.get(name)
+
+
+def _read_libc_header() -> str:
+    return fs.read_file(os.path.join(Globals.get_compiler_options().stdlib_path, "libc.ll"))
+
+
+def _get_prelude_cache_path() -> str:
+    return os.path.join(Globals.get_compiler_options().cwd, "_build", PRELUDE_CACHE_FILENAME)
+
+
+def _read_cached_prelude(source_hash: str) -> Optional[Prelude]:
+    path = _get_prelude_cache_path()
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "rb") as fl:
+            prelude = RestrictedUnpickler(fl).load()
+    except Exception:
+        # a corrupt or incompatible cache file is simply rebuilt
+        return None
+
+    if not isinstance(prelude, Prelude):
+        return None
+
+    if prelude.compiler_version != COMPILER_VERSION or prelude.source_hash != source_hash:
+        return None
+
+    return prelude
+
+
+def _write_cached_prelude(prelude: Prelude) -> None:
+    try:
+        # concurrent compiler processes may read the file while it is being replaced
+        fs.write_file_atomic(
+            path=_get_prelude_cache_path(),
+            data=pickle.dumps(prelude, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+    except OSError:
+        # e.g. a read-only or full disk; the cache is only an optimization
+        pass
+
+
+def load_prelude(internal: Module) -> Prelude:
+    """
+    Return the prelude for the stdlib/_internal module [internal], compiling it if no
+    up-to-date saved copy exists. Raise a CompileError if _internal fails to compile.
+    """
+
+    if not internal.is_internal_module():
+        raise ValueError("prelude must be built from stdlib/_internal")
+
+    opts = Globals.get_compiler_options()
+    source_hash = content_hash(
+        internal.get_source().load_source_string() + _read_libc_header()
+    )
+
+    if opts.cache_prelude:
+        cached = _read_cached_prelude(source_hash)
+
+        if cached:
+            return cached
+
+    internal.compile()
+    optimize_module(internal, {})
+    internal.lower({})
+    prelude = Prelude.from_module(internal, source_hash)
+
+    if opts.cache_prelude:
+        _write_cached_prelude(prelude)
+
+    return prelude
+
+
+def make_internal_module() -> Module:
+    return Module(ModuleSource(ModuleType.STDLIB, "_internal"))
@@ -0,0 +1,76 @@
+"""
+Whole-program tree shaking. When an executable is built, only the functions that its
+main function can reach are emitted: starting from main, the calls in the bodies of
+the functions found so far are followed across the modules of the program, after
+optimization, so that functions whose every call was inlined or folded away are not
+emitted either. The objects of user modules are compiled from the reachable
+functions alone (see TranslationUnit).
+
+Stdlib modules and _internal are not walked, since no stdlib function calls into
+user code; they are compiled once into the runtime library, whose unused functions
+are removed by the linker instead (see LLVMInterface.link).
+"""
+
+from __future__ import annotations
+
+import ast
+from typing import TYPE_CHECKING
+from pyrite.module import Module, TopLevelFunction
+from pyrite.resolution import NameResolver, get_local_names
+
+if TYPE_CHECKING:
+    from pyrite.interface import ModuleView
+
+
+def _get_references(function: TopLevelFunction, modules: dict[str, ModuleView]) -> list[TopLevelFunction]:
+    """
+    Return the top-level functions referred to by name in the body of [function]
+    """
+
+    resolver = NameResolver(function.get_module(), modules, get_local_names(function))
+    references: list[TopLevelFunction] = []
+
+    for statement in function.node.body:
+        for node in ast.walk(statement):
+            if not isinstance(node, (ast.Name, ast.Attribute)):
+                continue
+
+            referenced = resolver.resolve_function(node)
+
+            if referenced:
+                references.append(referenced)
+
+    return references
+
+
+def find_reachable_functions(entry: Module, modules: dict[str, Module]) -> dict[str, set[str]]:
+    """
+    Return the names of the functions of each user module that can be called from the
+    main function of [entry], by module name. Modules none of whose functions are
+    reachable are left out. [modules] maps the names of the modules of the program to
+    the modules themselves.
+    """
+
+    main = entry.get_global_scope().get_function("main")
+    reachable: dict[str, set[str]] = {}
+
+    if not main:
+        return reachable
+
+    pending = [main]
+    reachable[entry.get_name()] = {main.name}
+
+    while pending:
+        for function in _get_references(pending.pop(), modules):
+            module = function.get_module()
+
+            if module.is_stdlib_module():
+                continue
+
+            names = reachable.setdefault(module.get_name(), set())
+
+            if function.name not in names:
+                names.add(function.name)
+                pending.append(function)
+
+    return reachable
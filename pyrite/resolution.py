@@ -0,0 +1,332 @@
+"""
+Resolution of the names used in the bodies of top-level functions to the functions
+and compile-time constants of the program, for use by the optimization passes.
+
+Once a function is optimized, resolve_symbols resolves every name in its body in a
+single pass, so that code generation never has to look a name up again: each local
+variable is numbered with a slot index, and each other name is annotated with the
+Symbol it refers to.
+"""
+
+from __future__ import annotations
+
+import ast
+import sys
+from typing import TYPE_CHECKING, Optional
+from pyrite.module import Module, ModuleConstant, Symbol, TopLevelFunction, Type
+
+if TYPE_CHECKING:
+    from pyrite.interface import ModuleView
+
+# Names inlined from another module (see pyrite.inliner) carry this attribute, holding
+# the name of the module that they must be resolved in
+ORIGIN_ATTRIBUTE = "pyrite_origin"
+
+# Expressions inlined in place of a call, and the arguments substituted into them,
+# carry this attribute, holding the types that their value is converted to in turn,
+# as the call would have converted its arguments and return value
+CONVERSIONS_ATTRIBUTE = "pyrite_conversions"
+
+# Set by resolve_symbols: the slot index of a local variable, and the Symbol that any
+# other name or module attribute refers to
+SLOT_ATTRIBUTE = "pyrite_slot"
+SYMBOL_ATTRIBUTE = "pyrite_symbol"
+
+
+def get_origin(node: ast.Name) -> Optional[str]:
+    """
+    Return the name of the module that [node] must be resolved in, if it was inlined
+    from a module other than the one containing it
+    """
+
+    return getattr(node, ORIGIN_ATTRIBUTE, None)
+
+
+def get_conversions(node: ast.expr) -> tuple[Type, ...]:
+    """
+    Return the types that the value of [node] is converted to, in order, if it was
+    inlined (see pyrite.inliner)
+    """
+
+    return getattr(node, CONVERSIONS_ATTRIBUTE, ())
+
+
+def add_conversion(node: ast.expr, type: Type) -> None:
+    """
+    Convert the value of [node] to [type], after any conversions it has already
+    """
+
+    setattr(node, CONVERSIONS_ATTRIBUTE, get_conversions(node) + (type,))
+
+
+def get_slot(node: ast.Name) -> Optional[int]:
+    """
+    Return the slot index of the local variable that [node] refers to, if any
+    """
+
+    return getattr(node, SLOT_ATTRIBUTE, None)
+
+
+def get_symbol(node: ast.expr) -> Optional[Symbol]:
+    """
+    Return the Symbol that the name or module attribute [node] refers to, if it was
+    resolved to one
+    """
+
+    return getattr(node, SYMBOL_ATTRIBUTE, None)
+
+
+def get_local_names(function: TopLevelFunction) -> set[str]:
+    """
+    Return the names of the arguments and local variables of [function]
+    """
+
+    names = set(function.get_arguments())
+
+    for node in ast.walk(function.node):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+
+    return names
+
+
+class NameResolver:
+    """
+    Resolves names used in the body of a function of [module], where [modules] maps
+    the names of the modules of the program to the modules themselves or their
+    interfaces. Names bound in [local_names] shadow top-level symbols.
+    """
+
+    _module: Module
+    _modules: dict[str, ModuleView]
+    _local_names: set[str]
+
+    def __init__(self, module: Module, modules: dict[str, ModuleView], local_names: set[str]):
+        self._module = module
+        self._modules = modules
+        self._local_names = local_names
+
+    def _get_module(self, module_name: str) -> Optional[ModuleView]:
+        if module_name == self._module.get_name():
+            return self._module
+
+        return self._modules.get(module_name)
+
+    def _defines(self, module: ModuleView, name: str) -> bool:
+        return (
+            name in module.get_constants()
+            or module.get_global_scope().get_function(name) is not None
+        )
+
+    def _resolve(self, expr: ast.expr) -> Optional[tuple[str, str, bool]]:
+        """
+        Return the module name and symbol name that [expr] refers to, and whether
+        private _internal symbols are visible from where [expr] is used
+        """
+
+        # module.symbol
+        if isinstance(expr, ast.Attribute) and isinstance(expr.value, ast.Name):
+            context = self._get_context(expr.value)
+
+            if context is None:
+                return None
+
+            module_name = context.get_imported_modules().get(expr.value.id)
+
+            return (module_name, expr.attr, context.is_stdlib_module()) if module_name else None
+
+        if not isinstance(expr, ast.Name):
+            return None
+
+        if get_origin(expr) == "_internal":
+            return ("_internal", expr.id, True)
+
+        context = self._get_context(expr)
+
+        if context is None:
+            return None
+
+        if self._defines(context, expr.id) or context.is_internal_module():
+            return (context.get_name(), expr.id, True)
+
+        imported = context.get_imported_symbols().get(expr.id)
+
+        if imported:
+            return (imported[0], imported[1], context.is_stdlib_module())
+
+        return ("_internal", expr.id, context.is_stdlib_module())
+
+    def _get_context(self, node: ast.Name) -> Optional[ModuleView]:
+        """
+        Return the module that [node] is resolved in, or None if [node] is a local
+        variable or refers to _internal
+        """
+
+        origin = get_origin(node)
+
+        if origin is None:
+            return None if node.id in self._local_names else self._module
+
+        return self._get_module(origin) if origin != "_internal" else None
+
+    def lookup_function(self, module_name: str, name: str, include_private: bool = True) -> Optional[TopLevelFunction]:
+        """
+        Return the top-level function [name] of the module [module_name]. Private
+        _internal functions are only found if [include_private] is set.
+        """
+
+        if module_name == "_internal" and not self._module.is_internal_module():
+            prelude = self._module.get_prelude()
+            return prelude.resolve_function(name, include_private) if prelude else None
+
+        module = self._get_module(module_name)
+
+        return module.get_global_scope().get_function(name) if module else None
+
+    def resolve_compiler_defined(self, expr: ast.expr) -> Optional[str]:
+        """
+        Return the name of the compiler-defined function of stdlib/_compiler_defined
+        that [expr] refers to, if any. These are only available to stdlib/_internal
+        and to code inlined from it.
+        """
+
+        if not isinstance(expr, ast.Name) or not expr.id.startswith("_ext_"):
+            return None
+
+        origin = get_origin(expr)
+
+        if origin == "_internal" or (origin is None and self._module.is_internal_module()):
+            return expr.id
+
+        return None
+
+    def resolve_function(self, expr: ast.expr) -> Optional[TopLevelFunction]:
+        """
+        Return the top-level function that the callee expression [expr] refers to
+        """
+
+        resolved = self._resolve(expr)
+
+        return self.lookup_function(*resolved) if resolved else None
+
+    def resolve_symbol(self, expr: ast.expr) -> Optional[Symbol]:
+        """
+        Return the top-level function or module constant that [expr] refers to
+        """
+
+        resolved = self._resolve(expr)
+
+        if not resolved:
+            return None
+
+        function = self.lookup_function(*resolved)
+
+        if function:
+            return function
+
+        module = self._get_module(resolved[0])
+        constants = module.get_constants() if module else {}
+
+        return ModuleConstant(resolved[1], constants[resolved[1]]) if resolved[1] in constants else None
+
+    def resolve_constant(self, expr: ast.expr) -> Optional[ast.Constant]:
+        """
+        Return the value of the module constant that [expr] refers to, if any
+        """
+
+        resolved = self._resolve(expr)
+
+        if not resolved:
+            return None
+
+        module = self._get_module(resolved[0])
+        constants = module.get_constants() if module else {}
+
+        return ast.Constant(constants[resolved[1]]) if resolved[1] in constants else None
+
+
+class FunctionSymbols:
+    """
+    The local variables of a function, numbered by slot index: the arguments come
+    first, in order, followed by the other locals in the order they are found
+    """
+
+    __slots__ = ("names", "assigned", "_slots")
+
+    names: list[str]
+    # whether each slot is assigned to in the body of the function
+    assigned: list[bool]
+    _slots: dict[str, int]
+
+    def __init__(self, arguments: list[str]):
+        self.names = []
+        self.assigned = []
+        self._slots = {}
+
+        for name in arguments:
+            self.add(name)
+
+    def add(self, name: str) -> int:
+        slot = self._slots.get(name)
+
+        if slot is None:
+            slot = self._slots[name] = len(self.names)
+            self.names.append(name)
+            self.assigned.append(False)
+
+        return slot
+
+    def get(self, name: str) -> Optional[int]:
+        return self._slots.get(name)
+
+
+def resolve_symbols(function: TopLevelFunction, modules: dict[str, ModuleView]) -> FunctionSymbols:
+    """
+    Annotate every name in the body of [function] with its slot index, if it is a
+    local variable, or the Symbol it refers to otherwise (see get_slot and get_symbol),
+    and return the local variables of [function]. Names that cannot be resolved are
+    left unannotated. [modules] maps the names of the modules of the program to the
+    modules themselves or their interfaces.
+    """
+
+    symbols = FunctionSymbols([sys.intern(name) for name in function.get_arguments()])
+    names: list[ast.Name] = []
+    attributes: list[ast.Attribute] = []
+
+    for statement in function.node.body:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name):
+                node.id = sys.intern(node.id)
+                names.append(node)
+
+                if not isinstance(node.ctx, ast.Load) and get_origin(node) is None:
+                    symbols.assigned[symbols.add(node.id)] = True
+            elif isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+                attributes.append(node)
+
+    resolver = NameResolver(function.get_module(), modules, set(symbols.names))
+
+    for node in names:
+        slot = symbols.get(node.id) if get_origin(node) is None else None
+
+        if slot is not None:
+            setattr(node, SLOT_ATTRIBUTE, slot)
+        else:
+            setattr(node, SYMBOL_ATTRIBUTE, resolver.resolve_symbol(node))
+
+    for node in attributes:
+        setattr(node, SYMBOL_ATTRIBUTE, resolver.resolve_symbol(node))
+
+    return symbols
+
+
+def clear_symbols(function: TopLevelFunction) -> None:
+    """
+    Remove the annotations made by resolve_symbols from the body of [function]; they
+    refer to the symbols of other modules, which must not be serialized with it
+    """
+
+    for node in ast.walk(function.node):
+        for attribute in (SLOT_ATTRIBUTE, SYMBOL_ATTRIBUTE):
+            if hasattr(node, attribute):
+                delattr(node, attribute)
@@ -0,0 +1,152 @@
+"""
+The Pyrite runtime library: stdlib/_internal, the libc header, the memory allocator
+(stdlib/allocator.ll) and every other stdlib module, compiled once into a static library that user programs are linked against.
+Libraries are cached next to the stdlib, per compiler version, target triple and
+code generation flags, so that building a program only compiles the user's code.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from pyrite import fs
+from pyrite.errors import CompileError, UserError, flatten_errors
+from pyrite.globals import COMPILER_VERSION, Globals
+from pyrite.llvm import LLVMInterface
+from pyrite.module import Module, ModuleSource, ModuleType
+from pyrite.optimizer import optimize_module
+from pyrite.prelude import Prelude
+from pyrite.scheduler import ModuleGraph
+from pyrite.util import content_hash
+
+RUNTIME_LIBRARY_NAME = "libpyrite_rt.a"
+
+# hand-written LLVM IR compiled into the runtime library as is
+_IR_UNITS = ["allocator"]
+
+# stdlib modules that are not compiled into the runtime library: _internal is part of
+# the prelude, and _compiler_defined is not a real module
+_EXCLUDED_MODULES = {"_internal", "_compiler_defined"}
+
+
+def list_runtime_modules() -> list[str]:
+    """
+    Return the names of the stdlib modules compiled into the runtime library
+    """
+
+    stdlib_path = Globals.get_compiler_options().stdlib_path
+
+    return sorted(
+        path.stem
+        for path in Path(stdlib_path).glob("*.py")
+        if path.stem not in _EXCLUDED_MODULES
+    )
+
+
+def _get_library_directory(llvm: LLVMInterface) -> str:
+    # the runtime is never instrumented or optimized with a program's profile
+    variant = "-".join([llvm.get_target_triple()] + [
+        flag.lstrip("-")
+        for flag in llvm.get_codegen_flags(include_profile=False)
+    ])
+
+    return os.path.join(
+        Globals.get_compiler_options().stdlib_path,
+        "_runtime",
+        COMPILER_VERSION,
+        variant
+    )
+
+
+def _read_ir_unit(name: str) -> str:
+    return fs.read_file(os.path.join(Globals.get_compiler_options().stdlib_path, name + ".ll"))
+
+
+def _get_runtime_hash(prelude: Prelude, module_names: list[str]) -> str:
+    sources = [prelude.source_hash]
+
+    for name in _IR_UNITS:
+        sources.append(name)
+        sources.append(_read_ir_unit(name))
+
+    for name in module_names:
+        sources.append(name)
+        sources.append(ModuleSource(ModuleType.STDLIB, name).load_source_string())
+
+    return content_hash("\0".join(sources))
+
+
+def _compile_runtime_modules(module_names: list[str], prelude: Prelude) -> list[Module]:
+    """
+    Compile the stdlib modules [module_names] and the stdlib modules they import, in
+    dependency order, so that calls between stdlib modules can be optimized
+    """
+
+    graph = ModuleGraph([
+        Module(ModuleSource(ModuleType.STDLIB, name))
+        for name in module_names
+    ])
+    modules = {module.get_name(): module for module in graph.get_modules()}
+
+    for module, err in graph.diagnostics:
+        _raise_stdlib_error(module, err)
+
+    if graph.find_cycle():
+        raise UserError("The standard library contains an import cycle")
+
+    for level in graph.get_levels():
+        for module in level:
+            module.attach_prelude(prelude)
+
+            try:
+                module.compile()
+                optimize_module(module, modules)
+                module.lower(modules)
+            except CompileError as err:
+                _raise_stdlib_error(module, err)
+
+    return [modules[name] for name in module_names]
+
+
+def _raise_stdlib_error(module: Module, err: CompileError) -> None:
+    raise UserError(
+        "The standard library module {} failed to compile: {}".format(
+            repr(module.get_name()), "; ".join(error.message for error in flatten_errors(err))
+        )
+    )
+
+
+def get_runtime_library(llvm: LLVMInterface, prelude: Prelude) -> str:
+    """
+    Return the path of the runtime library, building it first if no up-to-date copy
+    exists for the current target and code generation flags
+    """
+
+    module_names = list_runtime_modules()
+    library_directory = _get_library_directory(llvm)
+    library_path = os.path.join(library_directory, RUNTIME_LIBRARY_NAME)
+    stamp_path = os.path.join(library_directory, RUNTIME_LIBRARY_NAME + ".hash")
+    stamp = _get_runtime_hash(prelude, module_names)
+
+    if os.path.exists(library_path) and os.path.exists(stamp_path):
+        if fs.read_file(stamp_path) == stamp:
+            return library_path
+
+    units = [("_internal", prelude.ir)] + [
+        (name, _read_ir_unit(name))
+        for name in _IR_UNITS
+    ] + [
+        (module.get_name(), module.get_ir())
+        for module in _compile_runtime_modules(module_names, prelude)
+    ]
+
+    object_paths = llvm.compile_objects(
+        units,
+        object_directory=os.path.join(library_directory, "objects"),
+        include_profile=False
+    )
+
+    llvm.create_static_library(object_paths, library_path)
+    fs.write_file_atomic(stamp_path, stamp)
+
+    return library_path
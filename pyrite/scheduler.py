@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Optional, Union
+from pyrite import instrumentation
+from pyrite.artifacts import make_artifact_store
+from pyrite.cache import ModuleCache, serialize_module
+from pyrite.errors import CompileError, SemanticError, UserError
+from pyrite.globals import CompilerOptions, Globals
+from pyrite.interface import ModuleInterface, ModuleView
+from pyrite.module import Module, ModuleSource, ModuleType
+from pyrite.optimizer import optimize_module
+from pyrite.prelude import Prelude
+from pyrite.util import unwrap
+
+# Imports that do not correspond to a module dependency: _internal is provided by the
+# prelude, _compiler_defined only exists for the benefit of IDEs, and the remaining
+# modules are allowed so that Pyrite sources remain valid Python
+IGNORED_IMPORTS = {"_internal", "_compiler_defined", "__future__", "typing"}
+
+
+def resolve_import(importer: Module, name: str) -> Optional[ModuleSource]:
+    """
+    Return the source of the module [name] as imported by [importer]. Modules in the
+    importer's directory take precedence over stdlib modules. Return None if no such
+    module exists.
+    """
+
+    local_path = Path(importer.get_source().get_source_directory(), name + ".py")
+
+    if local_path.is_file():
+        return ModuleSource(ModuleType.SOURCE_FILE, local_path.as_posix())
+
+    stdlib_path = Path(Globals.get_compiler_options().stdlib_path, name + ".py")
+
+    if stdlib_path.is_file():
+        return ModuleSource(ModuleType.STDLIB, name)
+
+    return None
+
+
+class ModuleGraph:
+    """
+    The import graph of a program, discovered transitively from a set of root modules.
+    Modules are identified by the name other modules import them by. Discovered modules
+    are created by [make_module], which may return previously analyzed modules.
+    """
+
+    _modules: dict[str, Module]
+    _dependencies: dict[str, list[str]]
+    diagnostics: list[tuple[Module, CompileError]]
+
+    def __init__(self, roots: list[Module], make_module: Callable[[ModuleSource], Module] = Module):
+        self._modules = {}
+        self._dependencies = {}
+        self.diagnostics = []
+
+        for module in roots:
+            self._modules.setdefault(module.get_name(), module)
+
+        self._discover(make_module)
+
+    def _discover(self, make_module: Callable[[ModuleSource], Module]) -> None:
+        pending = deque(self._modules.values())
+
+        while pending:
+            module = pending.popleft()
+            dependencies: list[str] = []
+            self._dependencies[module.get_name()] = dependencies
+
+            try:
+                module.load()
+            except SyntaxError as err:
+                self.diagnostics.append((module, CompileError(
+                    "Invalid syntax on line {}: {}".format(err.lineno, err.msg)
+                )))
+                continue
+
+            for name, node in module.get_dependency_nodes():
+                if name in IGNORED_IMPORTS or name in dependencies:
+                    continue
+
+                if name not in self._modules:
+                    source = resolve_import(module, name)
+
+                    if not source:
+                        self.diagnostics.append((module, SemanticError(
+                            node, "Unresolved import {}".format(repr(name))
+                        )))
+                        continue
+
+                    self._modules[name] = make_module(source)
+                    pending.append(self._modules[name])
+
+                dependencies.append(name)
+
+    def get_modules(self) -> list[Module]:
+        return list(self._modules.values())
+
+    def get_dependencies(self, module: Module) -> list[Module]:
+        return [
+            self._modules[name]
+            for name in self._dependencies.get(module.get_name(), [])
+        ]
+
+    def get_transitive_dependencies(self, module: Module) -> list[Module]:
+        """
+        Return every module that [module] imports, directly or indirectly, sorted by
+        name
+        """
+
+        found: set[str] = set()
+        pending = list(self._dependencies.get(module.get_name(), []))
+
+        while pending:
+            name = pending.pop()
+
+            if name not in found:
+                found.add(name)
+                pending.extend(self._dependencies.get(name, []))
+
+        return [self._modules[name] for name in sorted(found)]
+
+    def find_cycle(self) -> Optional[list[Module]]:
+        """
+        Return a list of modules forming an import cycle, where each module imports
+        the next and the last imports the first, or None if the graph is acyclic
+        """
+
+        # 0 = unvisited, 1 = on the current path, 2 = done
+        state = {name: 0 for name in self._modules}
+
+        for root in sorted(self._modules):
+            if state[root] != 0:
+                continue
+
+            # iterative depth-first search, so that deep import chains cannot exhaust
+            # the interpreter's recursion limit
+            path = [root]
+            stack = [iter(self._dependencies.get(root, []))]
+            state[root] = 1
+
+            while stack:
+                dependency = next(stack[-1], None)
+
+                if dependency is None:
+                    state[path.pop()] = 2
+                    stack.pop()
+                elif state[dependency] == 1:
+                    cycle = path[path.index(dependency):]
+                    return [self._modules[name] for name in cycle]
+                elif state[dependency] == 0:
+                    state[dependency] = 1
+                    path.append(dependency)
+                    stack.append(iter(self._dependencies.get(dependency, [])))
+
+        return None
+
+    def get_levels(self) -> list[list[Module]]:
+        """
+        Return the modules of this graph in topological order, grouped into levels such
+        that every module depends only on modules of earlier levels. Modules within a
+        level are independent of one another and are sorted by name. The graph must be
+        acyclic.
+        """
+
+        dependents: dict[str, list[str]] = {name: [] for name in self._modules}
+        in_degree: dict[str, int] = {}
+
+        for name in self._modules:
+            dependencies = self._dependencies.get(name, [])
+            in_degree[name] = len(dependencies)
+
+            for dependency in dependencies:
+                dependents[dependency].append(name)
+
+        ready = sorted(name for name, degree in in_degree.items() if degree == 0)
+        levels: list[list[Module]] = []
+        visited = 0
+
+        while ready:
+            levels.append([self._modules[name] for name in ready])
+            visited += len(ready)
+            next_ready: list[str] = []
+
+            for name in ready:
+                for dependent in dependents[name]:
+                    in_degree[dependent] -= 1
+
+                    if in_degree[dependent] == 0:
+                        next_ready.append(dependent)
+
+            ready = sorted(next_ready)
+
+        if visited != len(self._modules):
+            raise ValueError("module graph contains a cycle")
+
+        return levels
+
+
+def report_cycle(cycle: list[Module]) -> tuple[Module, CompileError]:
+    """
+    Return a diagnostic for an import [cycle] found by ModuleGraph.find_cycle, attributed
+    to the import statement that closes the cycle
+    """
+
+    last, first = cycle[-1], cycle[0]
+    description = " -> ".join(module.get_name() for module in cycle + [first])
+
+    for name, node in last.get_dependency_nodes():
+        if name == first.get_name():
+            return (last, SemanticError(node, "Import cycle: " + description))
+
+    return (last, CompileError("Import cycle: " + description))
+
+
+def compile_module(module: Module, modules: dict[str, ModuleView]) -> Optional[Union[CompileError, UserError]]:
+    """
+    Analyze, optimize and lower [module] against [modules], which maps the names of the
+    modules it imports, directly or indirectly, to their interfaces, and make its own
+    interface. Return the error that stopped the compilation, if any.
+    """
+
+    try:
+        module.compile()
+
+        with instrumentation.phase("optimize", module.get_name()):
+            optimize_module(module, modules)
+
+        module.lower(modules)
+    except (CompileError, UserError) as err:
+        return err
+
+    # made before the module is serialized, so that it is stored along with it
+    module.get_interface()
+
+    return None
+
+
+_worker_prelude: Optional[Prelude] = None
+_worker_cache: Optional[ModuleCache] = None
+# the interfaces received so far, by interface hash, so that each is loaded once per
+# worker
+_worker_interfaces: dict[str, ModuleInterface] = {}
+
+
+def _init_worker(options: CompilerOptions, prelude: Prelude, cache_directory: Optional[str]) -> None:
+    global _worker_prelude, _worker_cache
+
+    Globals.set_compiler_options(options)
+    _worker_prelude = prelude
+    _worker_cache = ModuleCache(make_artifact_store(cache_directory)) if cache_directory else None
+
+    # phases are recorded in each worker and sent back with the result
+    if options.time_report or options.trace_path:
+        instrumentation.start_recording()
+
+
+def _load_interface(data: bytes) -> ModuleInterface:
+    interface = ModuleInterface(data)
+    cached = _worker_interfaces.get(interface.key)
+
+    if cached:
+        return cached
+
+    interface.attach_prelude(unwrap(_worker_prelude))
+    _worker_interfaces[interface.key] = interface
+
+    return interface
+
+
+WorkerResult = Union[bytes, CompileError, UserError]
+
+
+def _compile_module_in_worker(
+    source: ModuleSource,
+    module_id: str,
+    key: str,
+    interfaces: list[tuple[str, bytes]]
+) -> WorkerResult:
+    module = Module(source)
+    module.id = module_id
+    module.attach_prelude(unwrap(_worker_prelude))
+
+    error = compile_module(module, {name: _load_interface(data) for name, data in interfaces})
+
+    if error:
+        return error
+
+    with instrumentation.phase("serialize", module.get_name()):
+        data = serialize_module(module, key)
+
+    if _worker_cache:
+        with instrumentation.phase("cache store", module.get_name()):
+            _worker_cache.store_serialized(key, data)
+
+    return data
+
+
+def _compile_in_worker(
+    source: ModuleSource,
+    module_id: str,
+    key: str,
+    interfaces: list[tuple[str, bytes]]
+) -> tuple[WorkerResult, list[instrumentation.PhaseEvent]]:
+    """
+    Compile the module [source] in a worker process (see compile_module) against the
+    serialized [interfaces] of the modules it imports, storing the result in the module
+    cache under [key]. Return either its serialized state or the error raised while
+    compiling it, along with the phases recorded meanwhile.
+    """
+
+    result = _compile_module_in_worker(source, module_id, key, interfaces)
+
+    return (result, instrumentation.take_events())
+
+
+def make_worker_pool(jobs: int, prelude: Prelude, cache_directory: Optional[str]) -> Executor:
+    """
+    Return a pool of [jobs] worker processes for compile_in_pool. Workers store the
+    modules they compile in the module cache in [cache_directory], if given.
+    """
+
+    # only imported for parallel builds, since it is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(Globals.get_compiler_options(), prelude, cache_directory)
+    )
+
+
+def compile_in_pool(
+    pool: Executor,
+    modules: list[tuple[Module, str, list[tuple[str, bytes]]]]
+) -> list[WorkerResult]:
+    """
+    Compile each (module, cache key, interfaces) triple of [modules] concurrently, as
+    compile_module does, where interfaces holds the names and serialized interfaces of
+    the modules that the module imports, directly or indirectly. Return the results in
+    the same order as [modules]. Phases recorded by the workers are added to the
+    recording of this process.
+    """
+
+    futures = [
+        pool.submit(_compile_in_worker, module.get_source(), module.id, key, interfaces)
+        for module, key, interfaces in modules
+    ]
+    results: list[WorkerResult] = []
+
+    for future in futures:
+        result, events = future.result()
+        instrumentation.add_events(events)
+        results.append(result)
+
+    return results
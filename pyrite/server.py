@@ -0,0 +1,252 @@
+"""
+Long-running compiler modes. Both keep Compiler objects alive between builds, so that
+the prelude, toolchain discovery and every unchanged analyzed module stay in memory,
+and a rebuild only compiles the modules affected by a change.
+  - watch() rebuilds a program whenever one of its source files changes
+  - serve() runs a compile server on a Unix socket; run_client() (pyrite.py
+    --connect) sends it a command line and prints the output of the build
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Optional
+from pyrite import cli
+from pyrite.env import is_unix
+from pyrite.errors import UserError
+from pyrite.globals import Globals
+
+if TYPE_CHECKING:
+    from pyrite.compiler import Compiler
+
+
+def _get_modification_times(paths: list[str]) -> dict[str, float]:
+    times: dict[str, float] = {}
+
+    for path in paths:
+        try:
+            times[path] = os.stat(path).st_mtime
+        except OSError:
+            # deleted files are picked up as a change on the next poll
+            times[path] = -1
+
+    return times
+
+
+def watch(compiler: Compiler, poll_interval: float = 0.2) -> None:
+    """
+    Build with [compiler], then rebuild each time a source file of the program changes,
+    until interrupted
+    """
+
+    try:
+        while True:
+            started = time.perf_counter()
+            compiler.build()
+            print("Build finished in {:.0f} ms; watching for changes...".format(
+                (time.perf_counter() - started) * 1000
+            ))
+
+            paths = compiler.get_source_paths()
+            times = _get_modification_times(paths)
+
+            while _get_modification_times(paths) == times:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def _send_message(sock: socket.socket, message: dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode("utf8") + b"\n")
+
+
+def _read_message(stream: io.BufferedIOBase) -> dict[str, Any]:
+    line = stream.readline()
+
+    if not line:
+        raise UserError("The compile server closed the connection unexpectedly")
+
+    return json.loads(line.decode("utf8"))
+
+
+def _validate_request(request: Any) -> Optional[str]:
+    """
+    Return an error message if [request] is not a well-formed build request
+    """
+
+    if not isinstance(request, dict):
+        return "malformed request"
+
+    cwd = request.get("cwd")
+    argv = request.get("argv")
+
+    if not isinstance(cwd, str) or not os.path.isabs(cwd) or not os.path.isdir(cwd):
+        return "the working directory of the request must be an existing absolute path"
+
+    if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+        return "malformed command line"
+
+    return None
+
+
+class _CompileServer(socketserver.UnixStreamServer):
+    # one Compiler per distinct (working directory, command line)
+    sessions: dict[str, Compiler]
+
+    def __init__(self, socket_path: str):
+        # only the user running the server may connect to it; the socket is created
+        # with these permissions rather than changed afterwards, so that there is no
+        # window in which others can connect
+        previous_umask = os.umask(0o177)
+
+        try:
+            super().__init__(socket_path, _CompileRequestHandler)
+        finally:
+            os.umask(previous_umask)
+
+        self.sessions = {}
+
+    def build(self, cwd: str, argv: list[str]) -> tuple[bool, str]:
+        """
+        Build the program described by the command line [argv] in [cwd], returning
+        whether the build succeeded and everything it printed
+        """
+
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                args = cli.parse_arguments(argv)
+            except SystemExit:
+                return (False, output.getvalue())
+
+            # modes that do not build once in this process cannot be run by the server
+            if args.watch or args.serve or args.serve_cache or args.connect or args.pgo is not None:
+                return (
+                    False,
+                    "error: --watch, --serve, --serve-cache, --connect and --pgo are not supported by the compile server\n"
+                )
+
+            if not args.input_file:
+                return (False, "error: an input file is required\n")
+
+            session_key = json.dumps([cwd, argv])
+
+            try:
+                Globals.set_compiler_options(cli.make_compiler_options(args, cwd))
+
+                if session_key not in self.sessions:
+                    self.sessions[session_key] = cli.make_compiler(args)
+
+                success = self.sessions[session_key].build()
+            except UserError as err:
+                print("error: " + err.message)
+                success = False
+
+        return (success, output.getvalue())
+
+
+class _CompileRequestHandler(socketserver.StreamRequestHandler):
+    server: _CompileServer
+
+    def handle(self) -> None:
+        try:
+            request = _read_message(self.rfile)
+        except (UserError, ValueError):
+            # the client went away, or did not send JSON
+            request = None
+
+        error = _validate_request(request)
+
+        if error:
+            _send_message(self.connection, {"success": False, "output": "error: " + error + "\n"})
+            return
+
+        success, output = self.server.build(request["cwd"], request["argv"])
+
+        _send_message(self.connection, {"success": success, "output": output})
+
+
+def serve(socket_path: str) -> None:
+    """
+    Run a compile server on the Unix socket [socket_path] until interrupted. Requests
+    are handled one at a time.
+    """
+
+    if not is_unix():
+        raise UserError("The compile server requires a Unix-like operating system")
+
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        mode = None
+
+    # a socket left behind by a previous server is replaced, but any other file is not
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            raise UserError("Cannot start the compile server: {} exists and is not a socket".format(
+                socket_path
+            ))
+
+        os.remove(socket_path)
+
+    def on_terminate(signum: int, frame: Any) -> None:
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, on_terminate)
+
+    with _CompileServer(socket_path) as server:
+        print("Pyrite compile server listening on " + socket_path)
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+def _without_connect_argument(argv: list[str]) -> list[str]:
+    result: list[str] = []
+    skip_next = False
+
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+        elif arg == "--connect":
+            skip_next = True
+        elif not arg.startswith("--connect="):
+            result.append(arg)
+
+    return result
+
+
+def run_client(socket_path: str, argv: list[str], cwd: str) -> int:
+    """
+    Ask the compile server at [socket_path] to run the command line [argv] in [cwd],
+    printing the output of the build. Return the process exit status.
+    """
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            _send_message(sock, {"cwd": cwd, "argv": _without_connect_argument(argv)})
+
+            with sock.makefile("rb") as stream:
+                response = _read_message(stream)
+    except (OSError, UserError) as err:
+        print("error: could not reach the compile server at {}: {}".format(socket_path, err))
+        return 1
+
+    sys.stdout.write(response["output"])
+
+    return 0 if response["success"] else 1
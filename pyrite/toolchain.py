@@ -0,0 +1,154 @@
+"""
+Discovery of the clang toolchain. Probing clang takes several clang invocations, which
+cost more than the rest of starting the compiler, so the result of a probe is saved in
+the build directory and reused until the clang binary changes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+import json
+import os
+import shutil
+from typing import Optional
+from pyrite import fs
+from pyrite.command_line import run_command_async
+from pyrite.errors import UserError
+from pyrite.globals import COMPILER_VERSION
+
+TOOLCHAIN_CACHE_FILENAME = "toolchain.json"
+
+# Optional clang flags that some compiler options rely on; the probe records which of
+# them the installed clang accepts
+PROBED_FLAGS = ["-flto=thin", "-fprofile-generate"]
+
+# A translation unit that every clang can compile, used to check for flag support
+_PROBE_IR = "define void @pyrite_probe() {\n  ret void\n}\n"
+
+
+@dataclass
+class Toolchain:
+    clang_path: str
+    # the first line of clang --version
+    clang_version: str
+    # the target that clang compiles for by default
+    target_triple: str
+    # the flags of PROBED_FLAGS that clang accepts
+    supported_flags: list[str]
+    # the resolved path and modification time of the clang binary when it was probed
+    clang_binary: str
+    clang_mtime_ns: int
+
+    def supports(self, flag: str) -> bool:
+        return flag in self.supported_flags
+
+
+def _get_binary_stamp(clang_path: str) -> tuple[str, int]:
+    binary = os.path.realpath(clang_path)
+    return (binary, os.stat(binary).st_mtime_ns)
+
+
+def probe_toolchain(clang_path: str) -> Toolchain:
+    """
+    Query the clang at [clang_path] for its version, default target and supported
+    flags. The queries run concurrently.
+    """
+
+    version = run_command_async([clang_path, "--version"])
+    triple = run_command_async([clang_path, "-print-target-triple"])
+    flags = {
+        flag: run_command_async(
+            [clang_path, "-x", "ir", "-", "-c", flag, "-o", os.devnull],
+            input=_PROBE_IR
+        )
+        for flag in PROBED_FLAGS
+    }
+
+    version_output = version.wait()
+    triple_output = triple.wait()
+
+    if version_output.returncode != 0 or triple_output.returncode != 0:
+        raise UserError("Could not query the clang installation at {}: {}".format(
+            clang_path, (version_output.stderr or triple_output.stderr).strip()
+        ))
+
+    binary, mtime_ns = _get_binary_stamp(clang_path)
+
+    return Toolchain(
+        clang_path=clang_path,
+        clang_version=version_output.stdout.strip().split("\n")[0],
+        target_triple=triple_output.stdout.strip(),
+        supported_flags=[flag for flag, probe in flags.items() if probe.wait().returncode == 0],
+        clang_binary=binary,
+        clang_mtime_ns=mtime_ns
+    )
+
+
+def _get_cache_key(clang_command: str) -> str:
+    # the same command may find a different clang if PATH changes
+    return json.dumps([clang_command, os.environ.get("PATH", "")])
+
+
+def _read_cached_toolchain(cache_path: str, cache_key: str) -> Optional[Toolchain]:
+    try:
+        with open(cache_path) as fl:
+            cache = json.load(fl)
+
+        if cache.get("compiler_version") != COMPILER_VERSION:
+            return None
+
+        toolchain = Toolchain(**cache["toolchains"][cache_key])
+
+        # the binary has been replaced or upgraded since it was probed
+        if _get_binary_stamp(toolchain.clang_path) != (toolchain.clang_binary, toolchain.clang_mtime_ns):
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    return toolchain
+
+
+def _write_cached_toolchain(cache_path: str, cache_key: str, toolchain: Toolchain) -> None:
+    try:
+        with open(cache_path) as fl:
+            cache = json.load(fl)
+
+        if cache.get("compiler_version") != COMPILER_VERSION:
+            raise ValueError()
+    except (OSError, ValueError):
+        cache = {"compiler_version": COMPILER_VERSION, "toolchains": {}}
+
+    cache["toolchains"][cache_key] = asdict(toolchain)
+
+    try:
+        fs.write_file_atomic(path=cache_path, data=json.dumps(cache, indent=2))
+    except OSError:
+        # the cache is only an optimization
+        pass
+
+
+def load_toolchain(clang_command: str, build_directory: str) -> Toolchain:
+    """
+    Return the toolchain of the clang found by running [clang_command], reusing the
+    probe saved in [build_directory] if the clang binary has not changed since. Raise
+    a UserError if clang cannot be found.
+    """
+
+    cache_path = os.path.join(build_directory, TOOLCHAIN_CACHE_FILENAME)
+    cache_key = _get_cache_key(clang_command)
+    toolchain = _read_cached_toolchain(cache_path, cache_key)
+
+    if toolchain:
+        return toolchain
+
+    clang_path = shutil.which(clang_command)
+
+    if not clang_path:
+        raise UserError(
+            "Pyrite requires clang to be installed, but no such installation was found."
+        )
+
+    toolchain = probe_toolchain(clang_path)
+    _write_cached_toolchain(cache_path, cache_key, toolchain)
+
+    return toolchain
@@ -1,10 +1,20 @@
-from typing import Optional, TypeVar
+import ast
+import hashlib
+import pickle
+from typing import Any, Optional, TypeVar
 
 def with_unix_endl(string: str) -> str:
     """Return [string] with UNIX-style line endings"""
 
     return string.replace("\r\n", "\n").replace("\r", "")
 
+
+def content_hash(data: str) -> str:
+    """Return a stable hex digest of [data], suitable for use as a cache key"""
+
+    return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+
 T = TypeVar("T")
 
 
@@ -16,3 +26,37 @@ def unwrap(v: Optional[T]) -> T:
     if v is not None:
         return v
     raise ValueError("attempted to unwrap None value")
+
+
+# The globals that RestrictedUnpickler may load besides AST node classes: the classes
+# that make up the analyzed state of modules, and data-only builtins
+_UNPICKLE_ALLOWLIST = {
+    "builtins": {"set", "frozenset", "complex", "Ellipsis"},
+    "pyrite.module": {
+        "FunctionScope", "GlobalScope", "GlobalVariable", "LocalVariable", "Module",
+        "ModuleConstant", "ModulePragma", "ModuleSource", "ModuleType",
+        "TopLevelFunction", "intern_type"
+    },
+    "pyrite.codegen": {"TranslationUnit"},
+    "pyrite.cache": {"ModuleArtifact"},
+    "pyrite.prelude": {"Prelude"}
+}
+
+
+class RestrictedUnpickler(pickle.Unpickler):
+    """
+    An unpickler for the compiler's own artifacts. Only the classes of analyzed
+    modules, AST nodes and a few builtins can be loaded, so unlike pickle.load, a
+    crafted input cannot make it call arbitrary functions.
+    """
+
+    def find_class(self, module_name: str, name: str) -> Any:
+        if module_name == "ast":
+            node_class = getattr(ast, name, None)
+
+            if isinstance(node_class, type) and issubclass(node_class, ast.AST):
+                return node_class
+        elif name in _UNPICKLE_ALLOWLIST.get(module_name, ()):
+            return super().find_class(module_name, name)
+
+        raise pickle.UnpicklingError("{}.{} may not be unpickled".format(module_name, name))
@@ -60,4 +60,40 @@ def _ext_abort() -> None:
     raise NotImplementedError()
 
 def _ext_cos(x: float) -> float:
-    raise NotImplementedError()
\ No newline at end of file
+    raise NotImplementedError()
+
+def _ext_strlen(c_str: _ext_Pointer) -> int:
+    raise NotImplementedError()
+
+def _ext_memcpy(destination: _ext_Pointer, source: _ext_Pointer, size: int) -> None:
+    raise NotImplementedError()
+
+""" runtime allocator - see stdlib/allocator.ll """
+
+def _ext_alloc(size: _ext_Pointer) -> _ext_Pointer:
+    raise NotImplementedError()
+
+def _ext_alloc_zeroed(size: _ext_Pointer) -> _ext_Pointer:
+    raise NotImplementedError()
+
+def _ext_dealloc(ptr: _ext_Pointer, size: _ext_Pointer) -> None:
+    raise NotImplementedError()
+
+""" strings - see the str class of stdlib/_internal for their layout """
+
+def _ext_str_alloc(size: int, length: int) -> str:
+    raise NotImplementedError()
+
+def _ext_str_data(s: str) -> _ext_Pointer:
+    raise NotImplementedError()
+
+def _ext_str_size(s: str) -> int:
+    raise NotImplementedError()
+
+def _ext_utf8_length(ptr: _ext_Pointer, size: int) -> int:
+    raise NotImplementedError()
+
+""" containers - see the str and list classes of stdlib/_internal for their layouts """
+
+def _ext_len(container: Any) -> int:
+    raise NotImplementedError()
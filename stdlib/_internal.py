@@ -12,54 +12,87 @@ and cannot be used elsewhere.
 from __future__ import annotations
 from typing import Any
 from _compiler_defined import _ext_Pointer, _ext_Char, _ext_get_byte, _ext_abort, _ext_calloc, _ext_malloc, _ext_free, _ext_to_ptr, _ext_cos
+from _compiler_defined import _ext_strlen, _ext_memcpy, _ext_str_alloc, _ext_str_data, _ext_str_size, _ext_utf8_length
+from _compiler_defined import _ext_alloc, _ext_alloc_zeroed, _ext_dealloc, _ext_len
 
 # The functions listed here are only included for standard library modules
-__PRAGMA_INTERNAL = ["_malloc", "_calloc"]
+__PRAGMA_INTERNAL = ["_malloc", "_calloc", "_free", "_str_from_c_string"]
 
-""" libc bindings """
+""" Memory """
+
+# Blocks come from the runtime allocator (stdlib/allocator.ll), which traps if memory
+# runs out. They must be freed with the size that they were allocated with.
 
 def _malloc(size: int) -> _ext_Pointer:
-    ptr = _ext_malloc(_ext_to_ptr(size))
+    return _ext_alloc(_ext_to_ptr(size))
 
-    if ptr == 0:
-        _ext_abort()
 
-    return ptr
+def _calloc(size: int) -> _ext_Pointer:
+    return _ext_alloc_zeroed(_ext_to_ptr(size))
 
 
-def _calloc(size: int) -> _ext_Pointer:
-    ptr = _ext_calloc(_ext_to_ptr(size))
+def _free(ptr: _ext_Pointer, size: int) -> None:
+    _ext_dealloc(ptr, _ext_to_ptr(size))
 
-    if ptr == 0:
-        _ext_abort()
 
-    return ptr
+""" libc bindings """
 
 def _math_cos(x: float) -> float:
     return _ext_cos(x)
 
+""" Strings and lists """
+
+# Calls to len are always inlined, and _ext_len accepts a str or any list, so that len
+# also applies to lists although Pyrite has no way to declare a generic parameter yet
+def len(s: str) -> int:
+    return _ext_len(s)
+
+
+def _str_from_c_string(c_str: _ext_Pointer) -> str:
+    size = _ext_strlen(c_str)
+    s = _ext_str_alloc(size, _ext_utf8_length(c_str, size))
+    _ext_memcpy(_ext_str_data(s), c_str, size)
+
+    return s
+
 """ Built-in types """
 
 class str:
-    __ptr: _ext_Pointer
+    """
+    Strings are immutable. A str value points to its size in bytes and its length in
+    code points, which is what len returns, followed by its characters, which are
+    encoded as UTF-8 and followed by a null byte. String literals are constants
+    emitted by the compiler, interned across the whole program, whose characters are
+    never copied; strings built at run time hold their characters in the same
+    allocation (see _ext_str_alloc and _str_from_c_string). Strings are not freed yet.
+    """
+
+    __size: int
     __length: int
 
-    def __new(self, c_str: _ext_Pointer):
-        length = 0
+    def __len__(self) -> int:
+        return self.__length
 
-        c = _ext_get_byte(c_str)
 
-        while c != 0:
-            length += 1
-            c_str += 1
+class list:
+    """
+    Lists are mutable sequences whose items are stored unboxed in a contiguous buffer
+    specialized for their item type: a list[int] holds its items as 64-bit integers,
+    and a list[float] as doubles. A list value points to a header holding its length,
+    its capacity and a pointer to its items. Appending to a full list grows its buffer
+    geometrically, so that appending takes amortized constant time, and extend copies
+    the items of the other list at once.
 
-            c = _ext_get_byte(c_str)
+    Slices are views: they share the items of the list they were taken from rather than
+    copying them. A list whose items are shared has a negative capacity, and a view
+    owns no buffer at all (capacity 0); either copies the items into a buffer of its
+    own before it is first written to, so that slices behave like copies. Lists never
+    shrink, and are not freed yet.
+    """
 
-        self.__ptr = _malloc(length)
-        self.__length = length
+    __length: int
+    __capacity: int
+    __ptr: _ext_Pointer
 
     def __len__(self) -> int:
         return self.__length
-
-    def __destructor(self) -> None:
-        _ext_free(self.__ptr)
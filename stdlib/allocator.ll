@@ -0,0 +1,279 @@
+; The Pyrite memory allocator, compiled into the runtime library next to
+; stdlib/_internal. Every object allocated by compiled code comes from here.
+;
+; Small blocks (up to 256 bytes) are grouped in 16 size classes, 16 bytes apart.
+; Each thread keeps a free list per size class, and carves new blocks out of 64 KiB
+; slabs obtained from libc with a bump pointer; freed blocks are pushed on the free
+; list of their class and handed out again before the slab grows. Only larger blocks
+; are allocated by libc directly. Blocks carry no header: pyrite_free must be given
+; the size that the block was allocated with.
+;
+; Arenas serve short-lived temporaries: pyrite_arena_alloc bumps a pointer through
+; thread-local chunks, and everything allocated after pyrite_arena_mark is released
+; at once by pyrite_arena_release.
+;
+; Allocations are counted per thread (see the counters below); pyrite_alloc_stats
+; copies the counters and pyrite_alloc_report prints them to stderr.
+;
+; Allocation failures trap, since Pyrite does not support exceptions yet.
+
+declare dso_local noalias align 16 i8* @malloc(i64)
+declare dso_local void @free(i8*)
+declare dso_local i32 @dprintf(i32, i8*, ...)
+declare void @llvm.trap()
+declare void @llvm.memset.p0i8.i64(i8* nocapture writeonly, i8, i64, i1 immarg)
+declare void @llvm.memcpy.p0i8.p0i8.i64(i8* noalias nocapture writeonly, i8* noalias nocapture readonly, i64, i1 immarg)
+
+; the head of the free list of each size class; the first word of a free block
+; points to the next free block of its class
+@pyrite.alloc.free_lists = internal thread_local global [16 x i8*] zeroinitializer
+; the unused part of the current slab
+@pyrite.alloc.slab_top = internal thread_local global i8* null
+@pyrite.alloc.slab_end = internal thread_local global i8* null
+
+; the current arena chunk, whose first word points to the previous chunk and second
+; word to its end, and its unused part
+@pyrite.arena.chunk = internal thread_local global i8* null
+@pyrite.arena.top = internal thread_local global i8* null
+@pyrite.arena.end = internal thread_local global i8* null
+
+; 0: allocations, 1: frees, 2: allocations reusing a freed block, 3: large
+; allocations, 4: bytes allocated, 5: slabs, 6: arena allocations, 7: arena bytes,
+; 8: arena chunks
+@pyrite.alloc.counters = internal thread_local global [9 x i64] zeroinitializer
+
+@pyrite.alloc.report_format = private unnamed_addr constant [156 x i8] c"pyrite: %lld allocations (%lld reused, %lld large), %lld frees, %lld bytes, %lld slabs\0Apyrite: %lld arena allocations, %lld arena bytes, %lld arena chunks\0A\00"
+
+define internal void @pyrite.alloc.count(i64 %counter, i64 %amount) #1 {
+entry:
+  %address = getelementptr inbounds [9 x i64], [9 x i64]* @pyrite.alloc.counters, i64 0, i64 %counter
+  %value = load i64, i64* %address
+  %next = add i64 %value, %amount
+  store i64 %next, i64* %address
+  ret void
+}
+
+define internal i8* @pyrite.alloc.libc(i64 %size) #0 {
+entry:
+  %memory = call i8* @malloc(i64 %size)
+  %failed = icmp eq i8* %memory, null
+  br i1 %failed, label %trap, label %done
+trap:
+  call void @llvm.trap()
+  unreachable
+done:
+  ret i8* %memory
+}
+
+define i8* @pyrite_alloc(i64 %size) #0 {
+entry:
+  call void @pyrite.alloc.count(i64 0, i64 1)
+  %small = icmp ule i64 %size, 256
+  br i1 %small, label %classify, label %large
+classify:
+  ; sizes 0 and 1 to 16 share the first class
+  %empty = icmp eq i64 %size, 0
+  %last = add i64 %size, -1
+  %offset = select i1 %empty, i64 0, i64 %last
+  %class = lshr i64 %offset, 4
+  %class.next = add i64 %class, 1
+  %block.size = shl i64 %class.next, 4
+  call void @pyrite.alloc.count(i64 4, i64 %block.size)
+  %head.address = getelementptr inbounds [16 x i8*], [16 x i8*]* @pyrite.alloc.free_lists, i64 0, i64 %class
+  %head = load i8*, i8** %head.address
+  %exhausted = icmp eq i8* %head, null
+  br i1 %exhausted, label %bump, label %reuse
+reuse:
+  %link = bitcast i8* %head to i8**
+  %next = load i8*, i8** %link
+  store i8* %next, i8** %head.address
+  call void @pyrite.alloc.count(i64 2, i64 1)
+  ret i8* %head
+bump:
+  %top = load i8*, i8** @pyrite.alloc.slab_top
+  %end = load i8*, i8** @pyrite.alloc.slab_end
+  %top.address = ptrtoint i8* %top to i64
+  %end.address = ptrtoint i8* %end to i64
+  %available = sub i64 %end.address, %top.address
+  %fits = icmp ule i64 %block.size, %available
+  br i1 %fits, label %carve, label %refill
+refill:
+  ; the rest of the previous slab, if any, is smaller than a block and is dropped
+  %slab = call i8* @pyrite.alloc.libc(i64 65536)
+  %slab.end = getelementptr inbounds i8, i8* %slab, i64 65536
+  store i8* %slab.end, i8** @pyrite.alloc.slab_end
+  call void @pyrite.alloc.count(i64 5, i64 1)
+  br label %carve
+carve:
+  %block = phi i8* [ %top, %bump ], [ %slab, %refill ]
+  %block.end = getelementptr inbounds i8, i8* %block, i64 %block.size
+  store i8* %block.end, i8** @pyrite.alloc.slab_top
+  ret i8* %block
+large:
+  call void @pyrite.alloc.count(i64 3, i64 1)
+  call void @pyrite.alloc.count(i64 4, i64 %size)
+  %memory = call i8* @pyrite.alloc.libc(i64 %size)
+  ret i8* %memory
+}
+
+define i8* @pyrite_alloc_zeroed(i64 %size) #0 {
+entry:
+  %memory = call i8* @pyrite_alloc(i64 %size)
+  call void @llvm.memset.p0i8.i64(i8* align 16 %memory, i8 0, i64 %size, i1 false)
+  ret i8* %memory
+}
+
+define void @pyrite_free(i8* %memory, i64 %size) #0 {
+entry:
+  %null = icmp eq i8* %memory, null
+  br i1 %null, label %done, label %count
+count:
+  call void @pyrite.alloc.count(i64 1, i64 1)
+  %small = icmp ule i64 %size, 256
+  br i1 %small, label %push, label %large
+push:
+  %empty = icmp eq i64 %size, 0
+  %last = add i64 %size, -1
+  %offset = select i1 %empty, i64 0, i64 %last
+  %class = lshr i64 %offset, 4
+  %head.address = getelementptr inbounds [16 x i8*], [16 x i8*]* @pyrite.alloc.free_lists, i64 0, i64 %class
+  %head = load i8*, i8** %head.address
+  %link = bitcast i8* %memory to i8**
+  store i8* %head, i8** %link
+  store i8* %memory, i8** %head.address
+  ret void
+large:
+  call void @free(i8* %memory)
+  ret void
+done:
+  ret void
+}
+
+define i8* @pyrite_arena_alloc(i64 %size) #0 {
+entry:
+  call void @pyrite.alloc.count(i64 6, i64 1)
+  %padded = add i64 %size, 15
+  %rounded = and i64 %padded, -16
+  call void @pyrite.alloc.count(i64 7, i64 %rounded)
+  %top = load i8*, i8** @pyrite.arena.top
+  %end = load i8*, i8** @pyrite.arena.end
+  %top.address = ptrtoint i8* %top to i64
+  %end.address = ptrtoint i8* %end to i64
+  %available = sub i64 %end.address, %top.address
+  %fits = icmp ule i64 %rounded, %available
+  br i1 %fits, label %carve, label %grow
+grow:
+  ; chunks are 64 KiB, or large enough for the block and the chunk header
+  %needed = add i64 %rounded, 16
+  %large = icmp ugt i64 %needed, 65536
+  %chunk.size = select i1 %large, i64 %needed, i64 65536
+  %chunk = call i8* @pyrite.alloc.libc(i64 %chunk.size)
+  %chunk.end = getelementptr inbounds i8, i8* %chunk, i64 %chunk.size
+  %header = bitcast i8* %chunk to i8**
+  %previous = load i8*, i8** @pyrite.arena.chunk
+  store i8* %previous, i8** %header
+  %end.field = getelementptr inbounds i8*, i8** %header, i64 1
+  store i8* %chunk.end, i8** %end.field
+  store i8* %chunk, i8** @pyrite.arena.chunk
+  store i8* %chunk.end, i8** @pyrite.arena.end
+  %chunk.start = getelementptr inbounds i8, i8* %chunk, i64 16
+  call void @pyrite.alloc.count(i64 8, i64 1)
+  br label %carve
+carve:
+  %block = phi i8* [ %top, %entry ], [ %chunk.start, %grow ]
+  %block.end = getelementptr inbounds i8, i8* %block, i64 %rounded
+  store i8* %block.end, i8** @pyrite.arena.top
+  ret i8* %block
+}
+
+define i8* @pyrite_arena_mark() #0 {
+entry:
+  %top = load i8*, i8** @pyrite.arena.top
+  ret i8* %top
+}
+
+; Release every arena block allocated since pyrite_arena_mark returned [mark]. The
+; chunks allocated since are returned to libc, except for the first chunk of the
+; thread, which is kept for later allocations.
+define void @pyrite_arena_release(i8* %mark) #0 {
+entry:
+  %mark.address = ptrtoint i8* %mark to i64
+  br label %search
+search:
+  %chunk = load i8*, i8** @pyrite.arena.chunk
+  %unused = icmp eq i8* %chunk, null
+  br i1 %unused, label %done, label %check
+check:
+  %header = bitcast i8* %chunk to i8**
+  %end.field = getelementptr inbounds i8*, i8** %header, i64 1
+  %end = load i8*, i8** %end.field
+  ; blocks start after the chunk header, so that a mark at the end of the previous
+  ; chunk is not taken for one in this chunk if libc placed it right after that one
+  %blocks.start = getelementptr inbounds i8, i8* %chunk, i64 16
+  %start.address = ptrtoint i8* %blocks.start to i64
+  %end.address = ptrtoint i8* %end to i64
+  %after.start = icmp uge i64 %mark.address, %start.address
+  %before.end = icmp ule i64 %mark.address, %end.address
+  %inside = and i1 %after.start, %before.end
+  br i1 %inside, label %rewind, label %pop
+rewind:
+  store i8* %mark, i8** @pyrite.arena.top
+  store i8* %end, i8** @pyrite.arena.end
+  ret void
+pop:
+  %previous = load i8*, i8** %header
+  %first = icmp eq i8* %previous, null
+  br i1 %first, label %reset, label %release
+release:
+  store i8* %previous, i8** @pyrite.arena.chunk
+  call void @free(i8* %chunk)
+  br label %search
+reset:
+  %chunk.start = getelementptr inbounds i8, i8* %chunk, i64 16
+  store i8* %chunk.start, i8** @pyrite.arena.top
+  store i8* %end, i8** @pyrite.arena.end
+  ret void
+done:
+  ret void
+}
+
+; Copy the allocation counters of the calling thread (see @pyrite.alloc.counters) to
+; the 9 integers at [counters]
+define void @pyrite_alloc_stats(i64* %counters) #0 {
+entry:
+  %destination = bitcast i64* %counters to i8*
+  %source = bitcast [9 x i64]* @pyrite.alloc.counters to i8*
+  call void @llvm.memcpy.p0i8.p0i8.i64(i8* align 8 %destination, i8* align 8 %source, i64 72, i1 false)
+  ret void
+}
+
+define void @pyrite_alloc_report() #0 {
+entry:
+  %counters = alloca [9 x i64]
+  %first = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 0
+  call void @pyrite_alloc_stats(i64* %first)
+  %allocations.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 0
+  %allocations = load i64, i64* %allocations.address
+  %frees.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 1
+  %frees = load i64, i64* %frees.address
+  %reused.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 2
+  %reused = load i64, i64* %reused.address
+  %large.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 3
+  %large = load i64, i64* %large.address
+  %bytes.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 4
+  %bytes = load i64, i64* %bytes.address
+  %slabs.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 5
+  %slabs = load i64, i64* %slabs.address
+  %arena.allocations.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 6
+  %arena.allocations = load i64, i64* %arena.allocations.address
+  %arena.bytes.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 7
+  %arena.bytes = load i64, i64* %arena.bytes.address
+  %arena.chunks.address = getelementptr inbounds [9 x i64], [9 x i64]* %counters, i64 0, i64 8
+  %arena.chunks = load i64, i64* %arena.chunks.address
+  %format = getelementptr inbounds [156 x i8], [156 x i8]* @pyrite.alloc.report_format, i64 0, i64 0
+  %written = call i32 (i32, i8*, ...) @dprintf(i32 2, i8* %format, i64 %allocations, i64 %reused, i64 %large, i64 %frees, i64 %bytes, i64 %slabs, i64 %arena.allocations, i64 %arena.bytes, i64 %arena.chunks)
+  ret void
+}
+
+attributes #0 = { nounwind }
+attributes #1 = { alwaysinline nounwind }
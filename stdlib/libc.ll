@@ -1,4 +1,10 @@
 ; The following is a header that defines libc methods, and should be placed
-; at the top of the final LLVM output.
+; at the top of the LLVM output of stdlib/_internal.
 
-declare dso_local noalias align 16 i8* @malloc(i64) #2
+declare dso_local noalias align 16 i8* @malloc(i64)
+declare dso_local noalias align 16 i8* @calloc(i64, i64)
+declare dso_local void @free(i8*)
+declare dso_local void @abort()
+declare dso_local double @cos(double)
+declare dso_local i64 @strlen(i8*)
+declare dso_local i32 @memcmp(i8*, i8*, i64)